@@ -0,0 +1,7 @@
+"""
+Benchmarks of Mackup.
+
+Build synthetic homes with a catalog of applications of a given size, time the
+Mackup commands on them, and compare the results with a baseline. See
+`python -m benchmarks --help`.
+"""
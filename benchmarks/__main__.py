@@ -0,0 +1,113 @@
+"""Benchmarks of Mackup.
+
+Run with `python -m benchmarks`.
+
+Usage:
+  benchmarks run [options]
+  benchmarks compare [--threshold=<pct>] <baseline> <results>
+  benchmarks (-h | --help)
+
+Options:
+  -h --help             Show this screen.
+  --apps=<n>            Number of applications [default: 20].
+  --files=<n>           Number of configuration files per application
+                        [default: 10].
+  --depth=<n>           Number of folders above each configuration file
+                        [default: 2].
+  --size=<bytes>        Size of each configuration file [default: 4096].
+  --repeat=<n>          Number of times each benchmark is run [default: 5].
+  --only=<names>        Comma separated names of the benchmarks to run.
+  -o --output=<path>    Write the results to this JSON file.
+  --threshold=<pct>     Slowdown of the median duration reported as a
+                        regression, in percent [default: 10].
+
+Benchmarks:
+  appsdb, appsdb lazy cached: load the applications database.
+  list, backup, restore, link install, link, link uninstall: run the command
+  end to end, in a new Python process.
+
+compare exits with a non-zero status if any benchmark regressed.
+"""
+
+import json
+import sys
+from typing import Any
+
+from docopt import docopt
+
+from . import runner
+from .workspace import CatalogSize
+
+
+def _cmd_run(args: dict[str, Any]) -> None:
+    try:
+        catalog = CatalogSize(
+            apps=int(args["--apps"]),
+            files=int(args["--files"]),
+            depth=int(args["--depth"]),
+            size=int(args["--size"]),
+        )
+        repeat = int(args["--repeat"])
+    except ValueError as e:
+        sys.exit(f"Invalid option: {e}")
+
+    names = runner.get_benchmark_names()
+    if args["--only"]:
+        names = [name.strip() for name in args["--only"].split(",")]
+        for name in names:
+            if name not in runner.get_benchmark_names():
+                sys.exit(f"Unknown benchmark: {name}")
+
+    results = runner.run(
+        names,
+        catalog,
+        repeat,
+        progress=lambda name: print(f"Running {name} ...", file=sys.stderr),
+    )
+
+    for name, result in results["benchmarks"].items():
+        print(
+            f"{name:<20} min {result['min']:.3f}s  median {result['median']:.3f}s",
+            file=sys.stderr,
+        )
+
+    if args["--output"]:
+        with open(args["--output"], "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(results, indent=2))
+
+
+def _cmd_compare(args: dict[str, Any]) -> None:
+    try:
+        threshold = float(args["--threshold"]) / 100
+    except ValueError:
+        sys.exit("Option --threshold must be a number.")
+
+    try:
+        baseline = runner.load_results(args["<baseline>"])
+        results = runner.load_results(args["<results>"])
+    except (OSError, ValueError) as e:
+        sys.exit(str(e))
+
+    lines, regressions = runner.compare(baseline, results, threshold)
+    print(f"{'':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for line in lines:
+        print(line)
+
+    if regressions:
+        sys.exit(f"Regressions: {', '.join(regressions)}")
+
+
+def main() -> None:
+    """Main function."""
+    args: dict[str, Any] = docopt(__doc__)
+    if args["run"]:
+        _cmd_run(args)
+    elif args["compare"]:
+        _cmd_compare(args)
+
+
+if __name__ == "__main__":
+    main()
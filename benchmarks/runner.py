@@ -0,0 +1,254 @@
+"""
+Run the benchmarks, and compare their results.
+
+Each command is run end to end, in a new Python process, in a new workspace
+for each repetition. The setup commands a benchmark needs, like a backup before
+a restore, are run first and not timed.
+"""
+
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+import mackup
+from mackup.appsdb import ApplicationsDatabase
+from mackup.constants import get_version
+
+from .workspace import CatalogSize, Workspace
+
+# Version of the format of the results, bump it on incompatible changes
+RESULTS_FORMAT = 1
+
+# Run by the Python process of each timed command
+MACKUP_MAIN = "from mackup.main import main; main()"
+
+# Options given to each command: answer yes to every question, and allow
+# benchmarking in containers running as root
+MACKUP_OPTIONS = ("--force", "--root")
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """A Mackup command to time, and the commands to run before it."""
+
+    command: tuple[str, ...]
+    setup: tuple[tuple[str, ...], ...] = field(default=())
+
+
+# The end to end benchmarks, by name
+BENCHMARKS: dict[str, Benchmark] = {
+    "list": Benchmark(("list",)),
+    "backup": Benchmark(("backup",)),
+    "restore": Benchmark(("restore",), setup=(("backup",),)),
+    "link install": Benchmark(("link", "install")),
+    "link": Benchmark(("link",), setup=(("backup",),)),
+    "link uninstall": Benchmark(("link", "uninstall"), setup=(("link", "install"),)),
+}
+
+
+def _build_apps_db() -> None:
+    ApplicationsDatabase()
+
+
+def _build_lazy_cached_apps_db() -> None:
+    # Like the command line does, the cache being filled by the setup
+    ApplicationsDatabase(lazy=True, cache=True)
+
+
+# The benchmarks run in this process, by name
+IN_PROCESS_BENCHMARKS: dict[str, Callable[[], None]] = {
+    "appsdb": _build_apps_db,
+    "appsdb lazy cached": _build_lazy_cached_apps_db,
+}
+
+
+def get_benchmark_names() -> list[str]:
+    """
+    Return the names of every benchmark.
+
+    Returns:
+        list of str
+    """
+    return [*IN_PROCESS_BENCHMARKS, *BENCHMARKS]
+
+
+def run_mackup(workspace: Workspace, command: tuple[str, ...]) -> None:
+    """
+    Run a Mackup command in a workspace, in a new Python process.
+
+    Args:
+        workspace (Workspace)
+        command (tuple): Arguments given to mackup
+    """
+    env = workspace.get_env()
+    # Run the mackup package being benchmarked, even if not installed
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(mackup.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (src_dir, env.get("PYTHONPATH")) if path
+    )
+
+    process = subprocess.run(
+        [sys.executable, "-c", MACKUP_MAIN, *MACKUP_OPTIONS, *command],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"mackup {' '.join(command)} failed: {process.stderr.strip()}",
+        )
+
+
+@contextlib.contextmanager
+def _environ(env: dict[str, str]) -> Iterator[None]:
+    """Replace the environment of this process for a while."""
+    original_env = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(original_env)
+
+
+def time_benchmark(name: str, catalog: CatalogSize) -> float:
+    """
+    Time a benchmark once, in a new workspace.
+
+    Args:
+        name (str): Name of the benchmark
+        catalog (CatalogSize): Size of the catalog of the workspace
+
+    Returns:
+        (float): Duration in seconds
+    """
+    workspace = Workspace(catalog)
+    try:
+        if name in IN_PROCESS_BENCHMARKS:
+            function = IN_PROCESS_BENCHMARKS[name]
+            with _environ(workspace.get_env()):
+                # Fill the caches Mackup keeps from one run to another
+                function()
+                start = time.perf_counter()
+                function()
+                return time.perf_counter() - start
+
+        benchmark = BENCHMARKS[name]
+        for setup_command in benchmark.setup:
+            run_mackup(workspace, setup_command)
+        start = time.perf_counter()
+        run_mackup(workspace, benchmark.command)
+        return time.perf_counter() - start
+    finally:
+        workspace.remove()
+
+
+def run(
+    names: list[str],
+    catalog: CatalogSize,
+    repeat: int,
+    progress: Callable[[str], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Run benchmarks.
+
+    Args:
+        names (list): Names of the benchmarks to run
+        catalog (CatalogSize): Size of the catalog to benchmark with
+        repeat (int): Number of times each benchmark is run
+        progress (Callable): Called with the name of each benchmark started
+
+    Returns:
+        (dict): The results, ready to be written as JSON
+    """
+    benchmarks: dict[str, dict[str, Any]] = {}
+    for name in names:
+        if progress is not None:
+            progress(name)
+        times = [time_benchmark(name, catalog) for _ in range(repeat)]
+        benchmarks[name] = {
+            "times": times,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+        }
+
+    return {
+        "format": RESULTS_FORMAT,
+        "mackup_version": get_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "catalog": asdict(catalog),
+        "repeat": repeat,
+        "benchmarks": benchmarks,
+    }
+
+
+def load_results(path: str) -> dict[str, Any]:
+    """
+    Read results written by a previous run.
+
+    Args:
+        path (str): Path of the JSON file
+
+    Returns:
+        (dict): The results
+    """
+    with open(path, encoding="utf-8") as f:
+        results: dict[str, Any] = json.load(f)
+    if results.get("format") != RESULTS_FORMAT:
+        raise ValueError(f"Unsupported results format: {path}")
+    return results
+
+
+def compare(
+    baseline: dict[str, Any], results: dict[str, Any], threshold: float,
+) -> tuple[list[str], list[str]]:
+    """
+    Compare results with a baseline, on the median duration of each benchmark.
+
+    Args:
+        baseline (dict): Results of the reference run
+        results (dict): Results of the run to check
+        threshold (float): Slowdown tolerated, 0.1 for 10%
+
+    Returns:
+        (list, list): The report lines, and the names of the benchmarks that
+                      regressed
+    """
+    lines: list[str] = []
+    if baseline["catalog"] != results["catalog"]:
+        lines.append(
+            "Warning: the catalogs differ, "
+            f"{baseline['catalog']} != {results['catalog']}",
+        )
+
+    regressions: list[str] = []
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            lines.append(f"{name:<20} {'':>10} {result['median']:>9.3f}s  new")
+            continue
+
+        reference = baseline["benchmarks"][name]["median"]
+        change = result["median"] / reference - 1 if reference else 0.0
+        line = (
+            f"{name:<20} {reference:>9.3f}s {result['median']:>9.3f}s"
+            f" {change:>+8.1%}"
+        )
+        if change > threshold:
+            regressions.append(name)
+            line += "  REGRESSION"
+        lines.append(line)
+
+    return lines, regressions
@@ -0,0 +1,124 @@
+"""
+Synthetic homes for the benchmarks.
+
+A workspace is a temporary folder holding a home with a catalog of custom
+applications, their configuration files, a Mackup config using the
+`file_system` engine, and the storage folder it points to. Everything Mackup
+reads or writes during a benchmark stays in there.
+"""
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+# Prefix of the names of the generated applications
+APP_PREFIX = "bench-app-"
+
+
+@dataclass(frozen=True)
+class CatalogSize:
+    """Size of the generated catalog of applications."""
+
+    # Number of applications
+    apps: int = 20
+    # Number of configuration files per application
+    files: int = 10
+    # Number of folders between the home and each configuration file
+    depth: int = 2
+    # Size of each configuration file, in bytes
+    size: int = 4096
+
+    def get_app_names(self) -> list[str]:
+        """
+        Return the names of the generated applications.
+
+        Returns:
+            list of str
+        """
+        return [f"{APP_PREFIX}{i:04d}" for i in range(self.apps)]
+
+    def get_files(self, app_name: str) -> list[str]:
+        """
+        Return the configuration files of an application, relative to the home.
+
+        Args:
+            app_name (str)
+
+        Returns:
+            list of str
+        """
+        folder = os.path.join(
+            f".{app_name}", *(f"level-{level}" for level in range(self.depth)),
+        )
+        return [os.path.join(folder, f"file-{i:04d}") for i in range(self.files)]
+
+
+class Workspace:
+    """A temporary home, with its Mackup config and storage folder."""
+
+    def __init__(self, catalog: CatalogSize) -> None:
+        """
+        Create a Workspace instance, and everything in it.
+
+        Args:
+            catalog (CatalogSize): Size of the catalog to generate
+        """
+        self.root: str = tempfile.mkdtemp(prefix="mackup-bench-")
+        self.home: str = os.path.join(self.root, "home")
+        self.storage: str = os.path.join(self.root, "storage")
+        os.makedirs(self.home)
+        os.makedirs(self.storage)
+        self._write_catalog(catalog)
+        self._write_config(catalog)
+
+    def _write_catalog(self, catalog: CatalogSize) -> None:
+        """Write the application configs, and their configuration files."""
+        apps_dir = os.path.join(self.home, ".mackup")
+        os.makedirs(apps_dir)
+        content = os.urandom(catalog.size)
+
+        for app_name in catalog.get_app_names():
+            files = catalog.get_files(app_name)
+            with open(os.path.join(apps_dir, f"{app_name}.cfg"), "w") as f:
+                f.write(f"[application]\nname = {app_name}\n\n")
+                f.write("[configuration_files]\n")
+                f.writelines(f"{filename}\n" for filename in files)
+
+            for filename in files:
+                path = os.path.join(self.home, filename)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(content)
+
+    def _write_config(self, catalog: CatalogSize) -> None:
+        """Write the Mackup config, syncing the generated applications only."""
+        with open(os.path.join(self.home, ".mackup.cfg"), "w") as f:
+            f.write(
+                "[storage]\n"
+                "engine = file_system\n"
+                f"path = {self.storage}\n"
+                "directory = Mackup\n"
+                "\n"
+                "[applications_to_sync]\n",
+            )
+            f.writelines(f"{app_name}\n" for app_name in catalog.get_app_names())
+
+    def get_env(self) -> dict[str, str]:
+        """
+        Return the environment to run Mackup in the workspace.
+
+        Returns:
+            dict
+        """
+        env = {
+            name: value
+            for name, value in os.environ.items()
+            if not name.startswith("XDG_")
+        }
+        env["HOME"] = self.home
+        return env
+
+    def remove(self) -> None:
+        """Remove the workspace, and everything in it."""
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,46 @@
+"""Hatch build hook precompiling the index of the stock application configs."""
+
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any
+
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+
+
+class ApplicationsIndexBuildHook(BuildHookInterface):
+    """Generate the applications index shipped in the wheel."""
+
+    PLUGIN_NAME = "custom"
+
+    def initialize(self, version: str, build_data: dict[str, Any]) -> None:
+        """Write mackup/applications.json in a temp dir and ship it in the wheel."""
+        # Editable installs read the .cfg files straight from the source tree,
+        # so that local edits to an application config are picked up.
+        if version == "editable":
+            return
+
+        src_dir = os.path.join(self.root, "src")
+        sys.path.insert(0, src_dir)
+        try:
+            from mackup.appsdb import write_stock_index  # noqa: PLC0415
+            from mackup.constants import APPS_INDEX_FILE  # noqa: PLC0415
+        finally:
+            sys.path.remove(src_dir)
+
+        # Not in the source tree, where editable installs and the tests would
+        # pick up a stale index
+        self._index_dir = tempfile.mkdtemp(prefix="mackup-build-")
+        index_path = write_stock_index(
+            os.path.join(self._index_dir, APPS_INDEX_FILE),
+        )
+        build_data["force_include"][index_path] = f"mackup/{APPS_INDEX_FILE}"
+
+    def finalize(
+        self, version: str, build_data: dict[str, Any], artifact_path: str,
+    ) -> None:
+        """Remove the temp dir of the index."""
+        index_dir = getattr(self, "_index_dir", None)
+        if index_dir is not None:
+            shutil.rmtree(index_dir, ignore_errors=True)
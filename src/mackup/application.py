@@ -3,19 +3,45 @@ Application Profile.
 
 An Application Profile contains all the information about an application in
 Mackup. Name, files, ...
+
+Each action is planned, then the plan is executed, see plan.py.
 """
 
 import os
+from typing import TextIO
 
-from . import utils
+from . import stats, utils
 from .mackup import Mackup
+from .manifest import Manifest, ManifestEntry
+from .pathstate import PathState, PathStateCache
+from .plan import COPY, DELETE, LINK, MOVE, SKIP, SYNC, Operation, get_paths
+
+# For each action, whether it may delete or chmod the home file and the Mackup
+# file of the application
+ACTION_TOUCHED_FILES: dict[str, tuple[bool, bool]] = {
+    "copy_files_to_mackup_folder": (False, True),
+    "copy_files_from_mackup_folder": (True, False),
+    "link_install": (True, True),
+    "link": (True, True),
+    "link_uninstall": (True, False),
+}
 
 
 class ApplicationProfile:
     """Instantiate this class with application specific data."""
 
-    def __init__(
-        self, mackup: Mackup, files: set[str], dry_run: bool, verbose: bool,
+    def __init__(  # noqa: PLR0913
+        self,
+        mackup: Mackup,
+        files: set[str],
+        dry_run: bool,
+        verbose: bool,
+        output: TextIO | None = None,
+        *,
+        incremental: bool = False,
+        checksum: bool = False,
+        manifest: Manifest | None = None,
+        path_states: PathStateCache | None = None,
     ) -> None:
         """
         Create an ApplicationProfile instance.
@@ -23,6 +49,14 @@ class ApplicationProfile:
         Args:
             mackup (Mackup)
             files (list)
+            output (TextIO): Where to print messages, stdout by default
+            incremental (bool): Only back up the files that changed
+            checksum (bool): Compare the content of the files to tell if they
+                changed, instead of their size and modification time
+            manifest (Manifest): Manifest of the Mackup folder to keep up to
+                date, and to compare files with
+            path_states (PathStateCache): States of the paths read during the
+                run, a new one by default
         """
         assert isinstance(mackup, Mackup)
         assert isinstance(files, set)
@@ -31,6 +65,13 @@ class ApplicationProfile:
         self.files: list[str] = sorted(files)
         self.dry_run: bool = dry_run
         self.verbose: bool = verbose
+        self.output: TextIO | None = output
+        self.incremental: bool = incremental
+        self.checksum: bool = checksum
+        self.manifest: Manifest | None = manifest
+        self.path_states: PathStateCache = (
+            path_states if path_states is not None else PathStateCache()
+        )
 
     def get_filepaths(self, filename: str) -> tuple[str, str]:
         """
@@ -47,144 +88,460 @@ class ApplicationProfile:
             os.path.join(self.mackup.mackup_folder, filename),
         )
 
+    def get_states(self, filename: str) -> tuple[PathState, PathState]:
+        """
+        Get the states of the home and mackup filepaths for given file
+
+        Called once for each file an action considers, which is counted.
+
+        Args:
+            filename (str)
+
+        Returns:
+            home_state, mackup_state (PathState, PathState)
+        """
+        stats.add("config_files")
+        (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+        return (
+            self.path_states.get(home_filepath),
+            self.path_states.get(mackup_filepath),
+        )
+
+    def get_paths_to_clear(
+        self, action: str, operations: list[Operation],
+    ) -> list[str]:
+        """
+        Get the paths the plan of the given action deletes or chmods.
+
+        Their ACLs and immutable attributes can be cleared beforehand, in one
+        batch for the whole run. See utils.batched_attribute_clearing(). The
+        files skipped by the plan, such as those the user chose not to
+        replace, keep theirs.
+
+        Args:
+            action (str): Name of the ApplicationProfile method to run
+            operations (list): Its plan, with the questions answered
+
+        Returns:
+            list of str.
+        """
+        touches_home, touches_mackup = ACTION_TOUCHED_FILES[action]
+        changed_paths = get_paths(operations)
+        paths: list[str] = []
+        for filename in self.files:
+            (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+            if touches_home and home_filepath in changed_paths:
+                paths.append(home_filepath)
+            if touches_mackup and mackup_filepath in changed_paths:
+                paths.append(mackup_filepath)
+
+        return paths
+
+    def is_up_to_date(self, filename: str) -> bool:
+        """
+        Tell if a home file and its copy in the Mackup folder are the same.
+
+        The manifest is used if what it recorded still matches the copy, so
+        that the content of the Mackup folder is not read. Else both files are
+        compared, and the result is recorded in the manifest.
+
+        Args:
+            filename (str)
+
+        Returns:
+            (boolean): Up to date or not
+        """
+        (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+        if not self.path_states.get(home_filepath).exists:
+            return False
+        mackup_stat = self.path_states.get(mackup_filepath).stat
+        if mackup_stat is None:
+            return False
+
+        if self.manifest is not None and self.manifest.is_current(
+            filename, mackup_filepath, mackup_stat,
+        ):
+            synced = self.manifest.is_synced(filename, home_filepath, self.checksum)
+            if synced is not None:
+                return synced
+
+        synced = utils.is_synced(home_filepath, mackup_filepath, self.checksum)
+        if synced and not self.dry_run:
+            self._record_backup(filename)
+        return synced
+
+    def _record_backup(
+        self,
+        filename: str,
+        previous_entries: dict[str, ManifestEntry] | None = None,
+        synced_entries: dict[str, utils.SyncedEntry] | None = None,
+    ) -> None:
+        """
+        Record the copy of a file in the Mackup folder in the manifest.
+
+        The hashes of previous_entries, returned by _forget_backup() before the
+        file was copied, are reused for the files copied again unchanged.
+        synced_entries are what the copy wrote, see Manifest.record().
+        """
+        if self.manifest is not None:
+            self.manifest.record(
+                filename,
+                self.get_filepaths(filename)[1],
+                previous_entries,
+                synced_entries,
+            )
+
+    def _forget_backup(self, filename: str) -> dict[str, ManifestEntry]:
+        """Forget the copy of a file in the Mackup folder from the manifest."""
+        if self.manifest is None:
+            return {}
+        return self.manifest.forget(filename)
+
+    def _print_sync_result(self, result: utils.SyncResult) -> None:
+        """Print what has been copied, in verbose mode."""
+        if self.verbose:
+            print(
+                f"  {result.copied} copied, {result.skipped} unchanged,"
+                f" {result.removed} removed",
+                file=self.output,
+            )
+
+    def get_statuses(self) -> list[tuple[str, str]]:
+        """
+        Get the sync state of each config file, without changing anything.
+
+        Returns:
+            list of (filename, status), status being one of status.STATUSES.
+            The files on neither side are left out.
+        """
+        # Only imported when needed, so that the other commands don't import it
+        from . import status  # noqa: PLC0415
+
+        statuses: list[tuple[str, str]] = []
+        for filename in self.files:
+            stats.add("config_files")
+            file_status = status.get_status(
+                *self.get_filepaths(filename), checksum=self.checksum,
+            )
+            if file_status is not None:
+                statuses.append((filename, file_status))
+        return statuses
+
+    def plan(self, action: str) -> list[Operation]:
+        """
+        Plan an action, without changing anything or asking anything.
+
+        Args:
+            action (str): Name of the ApplicationProfile method to run
+
+        Returns:
+            list of Operation, on each config file in order
+        """
+        assert action in ACTION_TOUCHED_FILES
+        operations: list[Operation] = getattr(self, f"_plan_{action}")()
+        return operations
+
+    def execute(self, operations: list[Operation]) -> None:
+        """
+        Run the operations of a plan, printing their messages.
+
+        When a question is answered with no, the operations left on its
+        config file are skipped. In dry run mode, the messages are printed
+        but nothing is asked or done.
+
+        Args:
+            operations (list): Operations planned by plan()
+        """
+        declined_filename: str | None = None
+        for operation in operations:
+            if operation.filename == declined_filename:
+                continue
+            if operation.message is not None:
+                print(operation.message, file=self.output)
+            if operation.kind == SKIP or self.dry_run:
+                continue
+
+            if operation.question is not None and not utils.confirm(
+                operation.question,
+            ):
+                declined_filename = operation.filename
+                continue
+
+            self._run_operation(operation)
+
+    def _run_operation(self, operation: Operation) -> None:
+        """Run an operation, keeping the manifest and the path states current."""
+        source = operation.source
+        destination = operation.destination
+        assert destination is not None
+        to_mackup_folder: bool = (
+            destination == self.get_filepaths(operation.filename)[1]
+        )
+
+        try:
+            if operation.kind == DELETE:
+                utils.delete(destination)
+            elif operation.kind in (COPY, SYNC):
+                assert source is not None
+                forgotten = (
+                    self._forget_backup(operation.filename)
+                    if to_mackup_folder
+                    else {}
+                )
+                try:
+                    record_entries = to_mackup_folder and self.manifest is not None
+                    if operation.kind == SYNC:
+                        result = utils.sync(
+                            source,
+                            destination,
+                            self.checksum,
+                            record_entries=record_entries,
+                        )
+                    else:
+                        result = utils.copy(
+                            source, destination, record_entries=record_entries,
+                        )
+                    if to_mackup_folder:
+                        self._record_backup(
+                            operation.filename, forgotten, result.entries,
+                        )
+                    self._print_sync_result(result)
+                except PermissionError as e:
+                    print(
+                        f"Error: Unable to copy file from {source} to "
+                        f"{destination} due to permission issue: {e}",
+                        file=self.output,
+                    )
+            elif operation.kind == MOVE:
+                assert source is not None
+                forgotten = self._forget_backup(operation.filename)
+                utils.move(source, destination)
+                self._record_backup(operation.filename, forgotten)
+            elif operation.kind == LINK:
+                assert source is not None
+                utils.link(source, destination, set_modes=operation.set_modes)
+        finally:
+            self.path_states.invalidate(
+                *(path for path in (source, destination) if path is not None),
+            )
+
     def copy_files_to_mackup_folder(self) -> None:
+        """Backup the application config files to the Mackup folder."""
+        self.execute(self.plan("copy_files_to_mackup_folder"))
+
+    def copy_files_from_mackup_folder(self) -> None:
+        """Recover the application config files from the Mackup folder."""
+        self.execute(self.plan("copy_files_from_mackup_folder"))
+
+    def link_install(self) -> None:
+        """Create the application config file links."""
+        self.execute(self.plan("link_install"))
+
+    def link(self) -> None:
+        """Link the application config files."""
+        self.execute(self.plan("link"))
+
+    def link_uninstall(self) -> None:
+        """Removes links and copy config files from the remote folder locally."""
+        self.execute(self.plan("link_uninstall"))
+
+    def _plan_copy_files_to_mackup_folder(self) -> list[Operation]:
         """
-        Backup the application config files to the Mackup folder.
+        Plan the backup of the application config files to the Mackup folder.
 
         Algorithm:
             for config_file
                 if config_file exists and is a real file/folder
                     if home/file is a symlink pointing to mackup/file
                         skip (already backed up via link install)
+                    if incremental and mackup/file is up to date
+                        skip
                     if exists mackup/file
                         are you sure?
-                        if sure
+                        if sure and not incremental
                             rm mackup/file
-                    cp home/file mackup/file
+                    if incremental
+                        copy what changed from home/file to mackup/file
+                    else
+                        cp home/file mackup/file
         """
+        operations: list[Operation] = []
         for filename in self.files:
             (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+            (home_state, mackup_state) = self.get_states(filename)
 
             # If config_file exists and is a real file/folder
-            if (os.path.isfile(home_filepath) or os.path.isdir(home_filepath)):
-                # Check if home file is a symlink pointing to mackup file
-                # (already backed up via link install)
-                if (
-                    os.path.islink(home_filepath)
-                    and os.path.exists(mackup_filepath)
-                    and os.path.samefile(home_filepath, mackup_filepath)
-                ):
-                    if self.verbose:
-                        print(
+            if not (home_state.is_file or home_state.is_dir):
+                operations.append(
+                    Operation(SKIP, filename, reason="not in the home folder"),
+                )
+                continue
+
+            # Check if home file is a symlink pointing to mackup file
+            # (already backed up via link install)
+            if home_state.is_link and home_state.is_same_file(mackup_state):
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="already linked",
+                        message=self._verbose_message(
                             f"Skipping {home_filepath}\n"
                             f"  already linked to\n  {mackup_filepath}",
-                        )
-                    continue
-
-                if self.verbose:
-                    print(
-                        f"Backing up\n  {home_filepath}\n  to\n  {mackup_filepath} ...",
+                        ),
+                    ),
+                )
+                continue
+
+            # Don't rewrite what is already up to date
+            if self.incremental and self.is_up_to_date(filename):
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="up to date",
+                        message=self._verbose_message(
+                            f"Skipping {home_filepath}\n"
+                            f"  already up to date in\n  {mackup_filepath}",
+                        ),
+                    ),
+                )
+                continue
+
+            message: str | None = (
+                f"Backing up\n  {home_filepath}\n  to\n  {mackup_filepath} ..."
+                if self.verbose
+                else f"Backing up {filename} ..."
+            )
+            question: str | None = None
+            # If exists mackup/file, ask the user if he really wants to
+            # replace it
+            if mackup_state.lexists:
+                question = (
+                    f"A {mackup_state.file_type} named {mackup_filepath} already"
+                    " exists in the Mackup folder.\nAre you sure that you want to"
+                    " replace it? (use --force to skip this prompt)"
+                )
+                # If incremental, only the changes will be copied, else
+                # delete the file in Mackup
+                if not self.incremental:
+                    operations.append(
+                        Operation(
+                            DELETE,
+                            filename,
+                            destination=mackup_filepath,
+                            question=question,
+                            message=message,
+                        ),
                     )
-                else:
-                    print(f"Backing up {filename} ...")
-
-                if self.dry_run:
-                    continue
-
-                # If exists mackup/file
-                if os.path.lexists(mackup_filepath):
-                    # Name it right
-                    file_type: str
-                    if os.path.isfile(mackup_filepath):
-                        file_type = "file"
-                    elif os.path.isdir(mackup_filepath):
-                        file_type = "folder"
-                    elif os.path.islink(mackup_filepath):
-                        file_type = "link"
-                    else:
-                        raise ValueError(f"Unsupported file: {mackup_filepath}")
-                    # Ask the user if he really wants to replace it
-                    if utils.confirm(
-                        f"A {file_type} named {mackup_filepath} already exists in the"
-                        " Mackup folder.\nAre you sure that you want to"
-                        " replace it? (use --force to skip this prompt)",
-                    ):
-                        # If confirmed, delete the file in Mackup
-                        utils.delete(mackup_filepath)
-                    else:
-                        continue
+                    question = message = None
+
+            operations.append(
+                Operation(
+                    SYNC if self.incremental else COPY,
+                    filename,
+                    source=home_filepath,
+                    destination=mackup_filepath,
+                    question=question,
+                    message=message,
+                ),
+            )
 
-                # Copy the file
-                try:
-                    utils.copy(home_filepath, mackup_filepath)
-                except PermissionError as e:
-                    print(
-                        f"Error: Unable to copy file from {home_filepath} to "
-                        f"{mackup_filepath} due to permission issue: {e}",
-                    )
+        return operations
 
-    def copy_files_from_mackup_folder(self) -> None:
+    def _plan_copy_files_from_mackup_folder(self) -> list[Operation]:
         """
-        Recover the application config files from the Mackup folder.
+        Plan the recovery of the application config files.
 
         Algorithm:
             for config_file
                 if config_file exists in mackup and is a real file/folder
+                    if incremental and home/file is up to date
+                        skip
                     if exists home/file
                         are you sure?
-                        if sure
+                        if sure and not incremental
                             rm home/file
-                    cp mackup/file home/file
+                    if incremental
+                        copy what changed from mackup/file to home/file
+                    else
+                        cp mackup/file home/file
         """
+        operations: list[Operation] = []
         for filename in self.files:
             (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+            (home_state, mackup_state) = self.get_states(filename)
 
             # If config_file exists in mackup and is a real file/folder
-            if (os.path.isfile(mackup_filepath) or os.path.isdir(mackup_filepath)):
-                if self.verbose:
-                    print(
-                        f"Recovering\n  {mackup_filepath}\n  to\n  {home_filepath} ...",
+            if not (mackup_state.is_file or mackup_state.is_dir):
+                operations.append(
+                    Operation(SKIP, filename, reason="not in the Mackup folder"),
+                )
+                continue
+
+            # Don't rewrite what is already up to date
+            if (
+                self.incremental
+                and not home_state.is_link
+                and self.is_up_to_date(filename)
+            ):
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="up to date",
+                        message=self._verbose_message(
+                            f"Skipping {home_filepath}\n"
+                            f"  already up to date with\n  {mackup_filepath}",
+                        ),
+                    ),
+                )
+                continue
+
+            message: str | None = (
+                f"Recovering\n  {mackup_filepath}\n  to\n  {home_filepath} ..."
+                if self.verbose
+                else f"Recovering {filename} ..."
+            )
+            question: str | None = None
+            # If exists home/file, ask the user if he really wants to replace
+            # it
+            if home_state.lexists:
+                question = (
+                    f"A {home_state.file_type} named {home_filepath} already"
+                    " exists in your home folder.\nAre you sure that you want to"
+                    " replace it?"
+                )
+                # If incremental, only the changes will be copied, else
+                # delete the existing home file
+                if not self.incremental:
+                    operations.append(
+                        Operation(
+                            DELETE,
+                            filename,
+                            destination=home_filepath,
+                            question=question,
+                            message=message,
+                        ),
                     )
-                else:
-                    print(f"Recovering {filename} ...")
-
-                if self.dry_run:
-                    continue
-
-                # If exists home/file
-                if os.path.lexists(home_filepath):
-                    # Name it right
-                    if os.path.isfile(home_filepath):
-                        file_type = "file"
-                    elif os.path.isdir(home_filepath):
-                        file_type = "folder"
-                    elif os.path.islink(home_filepath):
-                        file_type = "link"
-                    else:
-                        raise ValueError(f"Unsupported file: {home_filepath}")
-                    # Ask the user if he really wants to replace it
-                    if utils.confirm(
-                        f"A {file_type} named {home_filepath} already exists in your"
-                        " home folder.\nAre you sure that you want to"
-                        " replace it?",
-                    ):
-                        # If confirmed, delete the existing home file
-                        utils.delete(home_filepath)
-                    else:
-                        continue
+                    question = message = None
+
+            operations.append(
+                Operation(
+                    SYNC if self.incremental else COPY,
+                    filename,
+                    source=mackup_filepath,
+                    destination=home_filepath,
+                    question=question,
+                    message=message,
+                ),
+            )
 
-                # Copy the file
-                try:
-                    utils.copy(mackup_filepath, home_filepath)
-                except PermissionError as e:
-                    print(
-                        f"Error: Unable to copy file from {mackup_filepath} to "
-                        f"{home_filepath} due to permission issue: {e}",
-                    )
+        return operations
 
-    def link_install(self) -> None:
+    def _plan_link_install(self) -> list[Operation]:
         """
-        Create the application config file links.
+        Plan the creation of the application config file links.
 
         Algorithm:
             if exists home/file
@@ -199,76 +556,91 @@ class ApplicationProfile:
                   mv home/file mackup/file
                   link mackup/file home/file
         """
+        operations: list[Operation] = []
         # For each file used by the application
         for filename in self.files:
             (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+            (home_state, mackup_state) = self.get_states(filename)
 
             # If the file exists and is not already a link pointing to Mackup
-            if (os.path.isfile(home_filepath) or os.path.isdir(home_filepath)) and not (
-                os.path.islink(home_filepath)
-                and (os.path.isfile(mackup_filepath) or os.path.isdir(mackup_filepath))
-                and os.path.samefile(home_filepath, mackup_filepath)
+            if (home_state.is_file or home_state.is_dir) and not (
+                home_state.is_link
+                and (mackup_state.is_file or mackup_state.is_dir)
+                and home_state.is_same_file(mackup_state)
             ):
-                if self.verbose:
-                    print(
-                        f"Backing up\n  {home_filepath}\n  to\n  {mackup_filepath} ...",
-                    )
-                else:
-                    print(f"Linking {filename} ...")
-
-                if self.dry_run:
-                    continue
-
-                # Check if we already have a backup
-                if os.path.exists(mackup_filepath):
-                    # Name it right
-                    if os.path.isfile(mackup_filepath):
-                        file_type = "file"
-                    elif os.path.isdir(mackup_filepath):
-                        file_type = "folder"
-                    elif os.path.islink(mackup_filepath):
-                        file_type = "link"
-                    else:
-                        raise ValueError(f"Unsupported file: {mackup_filepath}")
-
-                    # Ask the user if he really wants to replace it
-                    if utils.confirm(
-                        f"A {file_type} named {mackup_filepath} already exists in the"
-                        " backup.\nAre you sure that you want to"
-                        " replace it?",
-                    ):
-                        # Delete the file in Mackup
-                        utils.delete(mackup_filepath)
-                        # Copy the file
-                        utils.copy(home_filepath, mackup_filepath)
-                        # Delete the file in the home
-                        utils.delete(home_filepath)
-                        # Link the backuped file to its original place
-                        utils.link(mackup_filepath, home_filepath)
-                else:
-                    # Copy the file
-                    utils.copy(home_filepath, mackup_filepath)
-                    # Delete the file in the home
-                    utils.delete(home_filepath)
-                    # Link the backuped file to its original place
-                    utils.link(mackup_filepath, home_filepath)
-            elif self.verbose:
-                if os.path.exists(home_filepath):
-                    print(
-                        f"Doing nothing\n  {home_filepath}\n  "
-                        f"is already backed up to\n  {mackup_filepath}",
-                    )
-                elif os.path.islink(home_filepath):
-                    print(
-                        f"Doing nothing\n  {home_filepath}\n  "
-                        "is a broken link, you might want to fix it.",
-                    )
-                else:
-                    print(f"Doing nothing\n  {home_filepath}\n  does not exist")
-
-    def link(self) -> None:
+                operations += [
+                    # Move the file in Mackup, replacing the one there if the
+                    # user agrees
+                    Operation(
+                        MOVE,
+                        filename,
+                        source=home_filepath,
+                        destination=mackup_filepath,
+                        question=(
+                            f"A {mackup_state.file_type} named {mackup_filepath}"
+                            " already exists in the backup.\nAre you sure that"
+                            " you want to replace it?"
+                            if mackup_state.exists
+                            else None
+                        ),
+                        message=(
+                            f"Backing up\n  {home_filepath}\n  to\n"
+                            f"  {mackup_filepath} ..."
+                            if self.verbose
+                            else f"Linking {filename} ..."
+                        ),
+                    ),
+                    # Link the backuped file to its original place, the move
+                    # gave it the good mode already
+                    Operation(
+                        LINK,
+                        filename,
+                        source=mackup_filepath,
+                        destination=home_filepath,
+                        set_modes=False,
+                    ),
+                ]
+            elif home_state.exists:
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="already linked",
+                        message=self._verbose_message(
+                            f"Doing nothing\n  {home_filepath}\n  "
+                            f"is already backed up to\n  {mackup_filepath}",
+                        ),
+                    ),
+                )
+            elif home_state.is_link:
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="broken link",
+                        message=self._verbose_message(
+                            f"Doing nothing\n  {home_filepath}\n  "
+                            "is a broken link, you might want to fix it.",
+                        ),
+                    ),
+                )
+            else:
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="not in the home folder",
+                        message=self._verbose_message(
+                            f"Doing nothing\n  {home_filepath}\n  does not exist",
+                        ),
+                    ),
+                )
+
+        return operations
+
+    def _plan_link(self) -> list[Operation]:
         """
-        Link the application config files.
+        Plan the links of the application config files.
 
         Algorithm:
             if exists mackup/file
@@ -280,74 +652,89 @@ class ApplicationProfile:
               else
                 link mackup/file home/file
         """
+        operations: list[Operation] = []
         # For each file used by the application
         for filename in self.files:
             (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+            (home_state, mackup_state) = self.get_states(filename)
 
             # If the file exists and is not already pointing to the mackup file
             # and the folder makes sense on the current platform (Don't sync
             # any subfolder of ~/Library on GNU/Linux)
-            file_or_dir_exists: bool = os.path.isfile(mackup_filepath) or os.path.isdir(
-                mackup_filepath,
-            )
-            pointing_to_mackup: bool = (
-                os.path.islink(home_filepath)
-                and os.path.exists(mackup_filepath)
-                and os.path.samefile(mackup_filepath, home_filepath)
+            file_or_dir_exists: bool = mackup_state.is_file or mackup_state.is_dir
+            pointing_to_mackup: bool = home_state.is_link and home_state.is_same_file(
+                mackup_state,
             )
             supported: bool = utils.can_file_be_synced_on_current_platform(filename)
 
             if file_or_dir_exists and not pointing_to_mackup and supported:
-                if self.verbose:
-                    print(
-                        f"Restoring\n  linking {home_filepath}\n"
-                        f"  to      {mackup_filepath} ...",
-                    )
-                else:
-                    print(f"Restoring {filename} ...")
-
-                if self.dry_run:
-                    continue
-
+                message: str | None = (
+                    f"Restoring\n  linking {home_filepath}\n"
+                    f"  to      {mackup_filepath} ..."
+                    if self.verbose
+                    else f"Restoring {filename} ..."
+                )
                 # Check if there is already a file in the home folder
-                if os.path.exists(home_filepath):
-                    # Name it right
-                    if os.path.isfile(home_filepath):
-                        file_type = "file"
-                    elif os.path.isdir(home_filepath):
-                        file_type = "folder"
-                    elif os.path.islink(home_filepath):
-                        file_type = "link"
-                    else:
-                        raise ValueError(f"Unsupported file: {home_filepath}")
-
-                    if utils.confirm(
-                        f"You already have a {file_type} at {home_filepath}.\n"
-                        "Do you want to replace it with your backup?",
-                    ):
-                        utils.delete(home_filepath)
-                        utils.link(mackup_filepath, home_filepath)
-                else:
-                    utils.link(mackup_filepath, home_filepath)
-            elif self.verbose:
-                if os.path.exists(home_filepath):
-                    print(
-                        f"Doing nothing\n  {mackup_filepath}\n"
-                        f"  already linked by\n  {home_filepath}",
-                    )
-                elif os.path.islink(home_filepath):
-                    print(
-                        f"Doing nothing\n  {home_filepath}\n  "
-                        "is a broken link, you might want to fix it.",
-                    )
-                else:
-                    print(
-                        f"Doing nothing\n  {mackup_filepath}\n  does not exist",
+                if home_state.exists:
+                    operations.append(
+                        Operation(
+                            DELETE,
+                            filename,
+                            destination=home_filepath,
+                            question=(
+                                f"You already have a {home_state.file_type} at"
+                                f" {home_filepath}.\nDo you want to replace it with"
+                                " your backup?"
+                            ),
+                            message=message,
+                        ),
                     )
+                    message = None
+                operations.append(
+                    Operation(
+                        LINK,
+                        filename,
+                        source=mackup_filepath,
+                        destination=home_filepath,
+                        message=message,
+                    ),
+                )
+                continue
+
+            if not file_or_dir_exists:
+                reason = "not in the Mackup folder"
+            elif pointing_to_mackup:
+                reason = "already linked"
+            else:
+                reason = "not supported on this platform"
+
+            if home_state.exists:
+                message = (
+                    f"Doing nothing\n  {mackup_filepath}\n"
+                    f"  already linked by\n  {home_filepath}"
+                )
+            elif home_state.is_link:
+                reason = "broken link"
+                message = (
+                    f"Doing nothing\n  {home_filepath}\n  "
+                    "is a broken link, you might want to fix it."
+                )
+            else:
+                message = f"Doing nothing\n  {mackup_filepath}\n  does not exist"
+            operations.append(
+                Operation(
+                    SKIP,
+                    filename,
+                    reason=reason,
+                    message=self._verbose_message(message),
+                ),
+            )
 
-    def link_uninstall(self) -> None:
+        return operations
+
+    def _plan_link_uninstall(self) -> list[Operation]:
         """
-        Removes links and copy config files from the remote folder locally.
+        Plan the removal of the links, replaced by copies of the config files.
 
         Algorithm:
             for each file in config
@@ -356,40 +743,71 @@ class ApplicationProfile:
                         delete home/file
                     copy mackup/file home/file
         """
+        operations: list[Operation] = []
         # For each file used by the application
         for filename in self.files:
             (home_filepath, mackup_filepath) = self.get_filepaths(filename)
+            (home_state, mackup_state) = self.get_states(filename)
 
             # If the mackup file exists
-            if os.path.isfile(mackup_filepath) or os.path.isdir(mackup_filepath):
-                # Check if there is a corresponding file in the home folder
-                if os.path.exists(home_filepath):
-                    # If the home file is not a link or does not point to the
-                    # mackup file, display a warning and skip it.
-                    if not os.path.islink(home_filepath) or not os.path.samefile(
-                        home_filepath, mackup_filepath,
-                    ):
-                        print(
+            if not (mackup_state.is_file or mackup_state.is_dir):
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="not in the Mackup folder",
+                        message=self._verbose_message(
+                            f"Doing nothing, {mackup_filepath} does not exist",
+                        ),
+                    ),
+                )
+            # Check if there is a corresponding file in the home folder
+            elif not home_state.exists:
+                operations.append(
+                    Operation(SKIP, filename, reason="not in the home folder"),
+                )
+            # If the home file is not a link or does not point to the mackup
+            # file, display a warning and skip it.
+            elif not home_state.is_link or not home_state.is_same_file(
+                mackup_state,
+            ):
+                operations.append(
+                    Operation(
+                        SKIP,
+                        filename,
+                        reason="not linked to the Mackup folder",
+                        message=(
                             f'Warning: the file in your home "{home_filepath}" '
                             f"does not point to the original file in Mackup "
-                            f"{mackup_filepath}, skipping...",
-                        )
-                        continue
-                    if self.verbose:
-                        print(
-                            f"Reverting {mackup_filepath}\n at {home_filepath} ...",
-                        )
-                    else:
-                        print(f"Reverting {filename} ...")
-
-                    if self.dry_run:
-                        continue
-
-                    # If there is, delete it as we are gonna copy the Dropbox
-                    # one there
-                    utils.delete(home_filepath)
-
+                            f"{mackup_filepath}, skipping..."
+                        ),
+                    ),
+                )
+            else:
+                operations += [
+                    # Delete the link, as we are gonna copy the Dropbox file
+                    # there
+                    Operation(
+                        DELETE,
+                        filename,
+                        destination=home_filepath,
+                        message=(
+                            f"Reverting {mackup_filepath}\n at {home_filepath} ..."
+                            if self.verbose
+                            else f"Reverting {filename} ..."
+                        ),
+                    ),
                     # Copy the Dropbox file to the home folder
-                    utils.copy(mackup_filepath, home_filepath)
-            elif self.verbose:
-                print(f"Doing nothing, {mackup_filepath} does not exist")
+                    Operation(
+                        COPY,
+                        filename,
+                        source=mackup_filepath,
+                        destination=home_filepath,
+                    ),
+                ]
+
+        return operations
+
+    def _verbose_message(self, message: str) -> str | None:
+        """Return the message if in verbose mode, None else."""
+        return message if self.verbose else None
@@ -3,72 +3,188 @@ The applications database.
 
 The Applications Database provides an easy to use interface to load application
 data from the Mackup Database (files).
+
+The stock application definitions can be precompiled into a single index file
+shipped next to them, so that loading the database does not require parsing
+every stock .cfg file on each run. Custom application definitions are parsed
+from their .cfg files, and can be cached on disk until those files change.
 """
 
 import configparser
+import json
 import os
+from typing import Any, TypedDict
+
+from . import tracing
+from .constants import (
+    APPS_DIR,
+    APPS_INDEX_FILE,
+    APPS_INDEX_FORMAT,
+    CUSTOM_APPS_CACHE_FILE,
+    CUSTOM_APPS_DIR,
+    CUSTOM_APPS_DIR_XDG,
+)
+
 
-from .constants import APPS_DIR, CUSTOM_APPS_DIR, CUSTOM_APPS_DIR_XDG
+class AppDefinition(TypedDict):
+    """Raw content of an application .cfg file."""
+
+    name: str
+    configuration_files: list[str]
+    xdg_configuration_files: list[str]
 
 
 class ApplicationsDatabase:
     """Database containing all the configured applications."""
 
-    def __init__(self) -> None:
-        """Create a ApplicationsDatabase instance."""
+    def __init__(self, lazy: bool = False, cache: bool = False) -> None:
+        """
+        Create a ApplicationsDatabase instance.
+
+        Args:
+            lazy (bool): Only parse the config of an application the first
+                         time it is needed, instead of parsing them all now.
+            cache (bool): Reuse the custom application configs parsed by
+                          previous runs, see CustomAppsCache.
+        """
         # Build the dict that will contain the properties of each application
         self.apps: dict[str, dict[str, str | set[str]]] = {}
 
-        for config_file in ApplicationsDatabase.get_config_files():
-            config: configparser.ConfigParser = configparser.ConfigParser(
-                allow_no_value=True,
+        self._lazy: bool = lazy
+        self._cache: CustomAppsCache | None = CustomAppsCache() if cache else None
+
+        # The precompiled stock index, read the first time a stock app is loaded
+        self._stock_apps_dir: str = get_stock_apps_dir()
+        self._stock_index: dict[str, AppDefinition] | None = None
+
+        # The config file describing each application, indexed by app name
+        with tracing.span("ApplicationsDatabase", "catalog", lazy=lazy, cache=cache):
+            self._config_files: dict[str, os.DirEntry[str]] = (
+                self._find_config_files()
+            )
+            self._load_all()
+
+    @staticmethod
+    def _find_config_files() -> dict[str, os.DirEntry[str]]:
+        """Return the config file of each application, indexed by app name."""
+        config_files: dict[str, os.DirEntry[str]] = {}
+        for entry in ApplicationsDatabase._scan_config_files():
+            # The app name is the cfg filename with the extension
+            app_name: str = entry.name[: -len(".cfg")]
+            config_files[app_name] = entry
+
+        return config_files
+
+    def _load_all(self) -> None:
+        """Load every application not loaded yet, unless the database is lazy."""
+        if not self._lazy:
+            for app_name in list(self._config_files):
+                if app_name not in self.apps and not self._load(app_name):
+                    del self._config_files[app_name]
+
+            self.save_cache()
+            return
+
+        # Like the applications that can't be loaded, leave out the custom
+        # configs that can't be read, without parsing them
+        for app_name, entry in list(self._config_files.items()):
+            if not self._is_stock(entry) and not os.access(entry.path, os.R_OK):
+                del self._config_files[app_name]
+
+    def save_cache(self) -> None:
+        """
+        Persist the custom application configs parsed so far, if cached.
+
+        A lazy database parses them as they are needed, this is called once
+        they have been.
+        """
+        if self._cache is not None:
+            self._cache.save(
+                {
+                    entry.path
+                    for entry in self._config_files.values()
+                    if not self._is_stock(entry)
+                },
             )
 
-            # Needed to not lowercase the configuration_files in the ini files
-            config.optionxform = str  # type: ignore
-
-            if config.read(config_file):
-                # Get the filename without the directory name
-                filename: str = os.path.basename(config_file)
-                # The app name is the cfg filename with the extension
-                app_name: str = filename[: -len(".cfg")]
-
-                # Start building a dict for this app
-                self.apps[app_name] = {}
-
-                # Add the fancy name for the app, for display purpose
-                app_pretty_name: str = config.get("application", "name")
-                self.apps[app_name]["name"] = app_pretty_name
-
-                # Add the configuration files to sync
-                config_files: set[str] = set()
-                self.apps[app_name]["configuration_files"] = config_files
-                if config.has_section("configuration_files"):
-                    for path in config.options("configuration_files"):
-                        if path.startswith("/"):
-                            raise ValueError(
-                                f"Unsupported absolute path: {path}",
-                            )
-                        config_files.add(path)
-
-                # Add the XDG configuration files to sync
-                home: str = os.path.expanduser("~/")
-                failobj: str = f"{home}.config"
-                xdg_config_home: str = os.environ.get("XDG_CONFIG_HOME", failobj)
-                if not xdg_config_home.startswith(home):
-                    raise ValueError(
-                        f"$XDG_CONFIG_HOME: {xdg_config_home} must be somewhere "
-                        f"within your home directory: {home}",
-                    )
-                if config.has_section("xdg_configuration_files"):
-                    for path in config.options("xdg_configuration_files"):
-                        if path.startswith("/"):
-                            raise ValueError(
-                                f"Unsupported absolute path: {path}",
-                            )
-                        xdg_path = os.path.join(xdg_config_home, path)
-                        xdg_path = xdg_path.replace(home, "")
-                        config_files.add(xdg_path)
+    def _is_stock(self, entry: os.DirEntry[str]) -> bool:
+        """Return True if the given config file is a stock application config."""
+        return os.path.dirname(entry.path) == self._stock_apps_dir
+
+    @tracing.traced("catalog")
+    def reload_custom_apps(self) -> None:
+        """
+        Reload the custom applications.
+
+        Look again for custom application configs, e.g. after the Mackup config
+        has been restored. The stock applications already loaded are kept, only
+        the custom ones and the stock ones they now override (or stop
+        overriding) get loaded again.
+        """
+        config_files: dict[str, os.DirEntry[str]] = self._find_config_files()
+        for app_name in set(self._config_files) | set(config_files):
+            old_entry: os.DirEntry[str] | None = self._config_files.get(app_name)
+            new_entry: os.DirEntry[str] | None = config_files.get(app_name)
+            if (
+                old_entry is None
+                or new_entry is None
+                or old_entry.path != new_entry.path
+                or not self._is_stock(old_entry)
+            ):
+                self.apps.pop(app_name, None)
+
+        self._config_files = config_files
+        self._load_all()
+
+    def _load(self, app_name: str) -> bool:
+        """
+        Load the properties of an application in the database.
+
+        Args:
+            app_name (str)
+
+        Returns:
+            (bool) False if the config of the application can't be read
+        """
+        entry: os.DirEntry[str] = self._config_files[app_name]
+
+        # Stock apps come from the precompiled index when it knows them,
+        # custom apps from the cache of the previous runs, anything else is
+        # parsed from its .cfg file
+        definition: AppDefinition | None = None
+        if self._is_stock(entry):
+            if self._stock_index is None:
+                self._stock_index = load_stock_index()
+            definition = self._stock_index.get(app_name)
+        elif self._cache is not None:
+            definition = self._cache.get(entry)
+
+        if definition is None:
+            definition = parse_app_config(entry.path)
+            if (
+                definition is not None
+                and self._cache is not None
+                and not self._is_stock(entry)
+            ):
+                self._cache.put(entry, definition)
+
+        if definition is None:
+            return False
+
+        self.apps[app_name] = {
+            # Add the fancy name for the app, for display purpose
+            "name": definition["name"],
+            # Add the configuration files to sync
+            "configuration_files": get_app_files(definition),
+        }
+        return True
+
+    def _get_app(self, name: str) -> dict[str, str | set[str]]:
+        """Return the properties of an application, loading them if needed."""
+        if name not in self.apps and not self._load(name):
+            self._config_files.pop(name, None)
+            raise KeyError(name)
+        return self.apps[name]
 
     @staticmethod
     def get_config_files() -> set[str]:
@@ -86,10 +202,21 @@ class ApplicationsDatabase:
         Returns:
             set of strings.
         """
+        return {entry.path for entry in ApplicationsDatabase._scan_config_files()}
+
+    @staticmethod
+    def _scan_config_files() -> list[os.DirEntry[str]]:
+        """
+        Return the directory entries of the application configuration files.
+
+        See get_config_files(). Each directory is only read once, and the
+        entries can be used to stat the files cheaply.
+
+        Returns:
+            list of os.DirEntry.
+        """
         # Configure the config parser
-        apps_dir: str = os.path.join(
-            os.path.dirname(os.path.realpath(__file__)), APPS_DIR,
-        )
+        apps_dir: str = get_stock_apps_dir()
 
         # Legacy custom apps directory: ~/.mackup/
         legacy_custom_apps_dir: str = os.path.join(os.environ["HOME"], CUSTOM_APPS_DIR)
@@ -101,7 +228,7 @@ class ApplicationsDatabase:
         xdg_custom_apps_dir: str = os.path.join(xdg_config_home, CUSTOM_APPS_DIR_XDG)
 
         # List of stock application config files
-        config_files: set[str] = set()
+        config_files: list[os.DirEntry[str]] = []
 
         # Temp list of user added app config file names
         custom_files: set[str] = set()
@@ -109,24 +236,29 @@ class ApplicationsDatabase:
         # Get the list of custom application config files from legacy directory first
         # (legacy takes priority over XDG)
         if os.path.isdir(legacy_custom_apps_dir):
-            for filename in os.listdir(legacy_custom_apps_dir):
-                if filename.endswith(".cfg"):
-                    config_files.add(os.path.join(legacy_custom_apps_dir, filename))
-                    custom_files.add(filename)
+            with os.scandir(legacy_custom_apps_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".cfg"):
+                        config_files.append(entry)
+                        custom_files.add(entry.name)
 
         # Get custom application config files from XDG directory
         # (only if not already in legacy directory)
         if os.path.isdir(xdg_custom_apps_dir):
-            for filename in os.listdir(xdg_custom_apps_dir):
-                if filename.endswith(".cfg") and filename not in custom_files:
-                    config_files.add(os.path.join(xdg_custom_apps_dir, filename))
-                    custom_files.add(filename)
+            with os.scandir(xdg_custom_apps_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".cfg") and entry.name not in custom_files:
+                        config_files.append(entry)
+                        custom_files.add(entry.name)
 
         # Add the default provided app config files, but only if those are not
         # customized, as we don't want to overwrite custom app config.
-        for filename in os.listdir(apps_dir):
-            if filename.endswith(".cfg") and filename not in custom_files:
-                config_files.add(os.path.join(apps_dir, filename))
+        with os.scandir(apps_dir) as entries:
+            config_files.extend(
+                entry
+                for entry in entries
+                if entry.name.endswith(".cfg") and entry.name not in custom_files
+            )
 
         return config_files
 
@@ -140,7 +272,7 @@ class ApplicationsDatabase:
         Returns:
             str
         """
-        value = self.apps[name]["name"]
+        value = self._get_app(name)["name"]
         assert isinstance(value, str)
         return value
 
@@ -154,7 +286,7 @@ class ApplicationsDatabase:
         Returns:
             set of str.
         """
-        value = self.apps[name]["configuration_files"]
+        value = self._get_app(name)["configuration_files"]
         assert isinstance(value, set)
         return value
 
@@ -168,11 +300,7 @@ class ApplicationsDatabase:
         Returns:
             set of str.
         """
-        app_names: set[str] = set()
-        for name in self.apps:
-            app_names.add(name)
-
-        return app_names
+        return set(self._config_files)
 
     def get_pretty_app_names(self) -> set[str]:
         """
@@ -186,3 +314,276 @@ class ApplicationsDatabase:
             pretty_app_names.add(self.get_name(app_name))
 
         return pretty_app_names
+
+
+class CustomAppsCache:
+    """
+    On-disk cache of the parsed custom application configs.
+
+    Parsed configs are indexed by the path of their .cfg file, and are only
+    reused while the size and modification time of that file are unchanged.
+    The cache file can be deleted at any time.
+    """
+
+    def __init__(self) -> None:
+        """Create a CustomAppsCache instance, loading the cache file if any."""
+        self.path: str = get_custom_apps_cache_path()
+        self._entries: dict[str, dict[str, Any]] = self._read()
+        self._dirty: bool = False
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        """Read the cache file, ignoring it if missing, unreadable or outdated."""
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(cache, dict) or cache.get("format") != APPS_INDEX_FORMAT:
+            return {}
+
+        entries: dict[str, dict[str, Any]] = cache.get("entries", {})
+        return entries
+
+    def get(self, entry: os.DirEntry[str]) -> AppDefinition | None:
+        """
+        Return the cached config of an application, if still valid.
+
+        Args:
+            entry (os.DirEntry): The .cfg file of the application
+
+        Returns:
+            AppDefinition, or None if not cached or modified since.
+        """
+        cached: dict[str, Any] | None = self._entries.get(entry.path)
+        if cached is None:
+            return None
+
+        try:
+            stat_result: os.stat_result = entry.stat()
+        except OSError:
+            return None
+
+        if (
+            cached.get("size") != stat_result.st_size
+            or cached.get("mtime_ns") != stat_result.st_mtime_ns
+        ):
+            return None
+
+        definition: AppDefinition = cached["definition"]
+        return definition
+
+    def put(self, entry: os.DirEntry[str], definition: AppDefinition) -> None:
+        """
+        Cache the config of an application.
+
+        Args:
+            entry (os.DirEntry): The .cfg file of the application
+            definition (AppDefinition): Its parsed content
+        """
+        try:
+            stat_result: os.stat_result = entry.stat()
+        except OSError:
+            return
+
+        self._entries[entry.path] = {
+            "size": stat_result.st_size,
+            "mtime_ns": stat_result.st_mtime_ns,
+            "definition": definition,
+        }
+        self._dirty = True
+
+    def save(self, paths: set[str]) -> None:
+        """
+        Write the cache file if it changed.
+
+        Args:
+            paths (set): The .cfg files to keep in the cache, the others are
+                         forgotten.
+        """
+        for path in set(self._entries) - paths:
+            del self._entries[path]
+            self._dirty = True
+
+        if not self._dirty:
+            return
+
+        # Write to a temp file first, so that a reader never sees a partially
+        # written cache
+        tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(
+                    {"format": APPS_INDEX_FORMAT, "entries": self._entries},
+                    cache_file,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The cache is only an optimization
+            return
+
+        self._dirty = False
+
+
+def get_custom_apps_cache_path() -> str:
+    """
+    Return the path of the cache of the custom application configs.
+
+    It lives in $XDG_CACHE_HOME, ~/.cache by default.
+
+    Returns:
+        str
+    """
+    xdg_cache_home: str = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.environ["HOME"], ".cache"),
+    )
+    return os.path.join(xdg_cache_home, CUSTOM_APPS_CACHE_FILE)
+
+
+def get_stock_apps_dir() -> str:
+    """
+    Return the directory containing the stock application configs.
+
+    Returns:
+        str
+    """
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), APPS_DIR)
+
+
+def get_stock_index_path() -> str:
+    """
+    Return the path of the precompiled index of the stock application configs.
+
+    Returns:
+        str
+    """
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), APPS_INDEX_FILE)
+
+
+@tracing.traced("catalog")
+def parse_app_config(config_file: str) -> AppDefinition | None:
+    """
+    Parse an application .cfg file.
+
+    Args:
+        config_file (str): Absolute path to the .cfg file
+
+    Returns:
+        AppDefinition, or None if the file can't be read.
+    """
+    config: configparser.ConfigParser = configparser.ConfigParser(
+        allow_no_value=True,
+    )
+
+    # Needed to not lowercase the configuration_files in the ini files
+    config.optionxform = str  # type: ignore
+
+    if not config.read(config_file):
+        return None
+
+    return {
+        "name": config.get("application", "name"),
+        "configuration_files": _read_paths(config, "configuration_files"),
+        "xdg_configuration_files": _read_paths(config, "xdg_configuration_files"),
+    }
+
+
+def _read_paths(config: configparser.ConfigParser, section: str) -> list[str]:
+    """Return the relative paths listed in a section of an application config."""
+    paths: list[str] = []
+    if config.has_section(section):
+        for path in config.options(section):
+            if path.startswith("/"):
+                raise ValueError(f"Unsupported absolute path: {path}")
+            paths.append(path)
+
+    return paths
+
+
+def get_app_files(definition: AppDefinition) -> set[str]:
+    """
+    Return the files to sync for an application, relative to the home folder.
+
+    The XDG configuration files are resolved against $XDG_CONFIG_HOME.
+
+    Args:
+        definition (AppDefinition)
+
+    Returns:
+        set of str.
+    """
+    config_files: set[str] = set(definition["configuration_files"])
+
+    # Add the XDG configuration files to sync
+    home: str = os.path.expanduser("~/")
+    failobj: str = f"{home}.config"
+    xdg_config_home: str = os.environ.get("XDG_CONFIG_HOME", failobj)
+    if not xdg_config_home.startswith(home):
+        raise ValueError(
+            f"$XDG_CONFIG_HOME: {xdg_config_home} must be somewhere "
+            f"within your home directory: {home}",
+        )
+    for path in definition["xdg_configuration_files"]:
+        xdg_path = os.path.join(xdg_config_home, path)
+        xdg_path = xdg_path.replace(home, "")
+        config_files.add(xdg_path)
+
+    return config_files
+
+
+@tracing.traced("catalog")
+def load_stock_index() -> dict[str, AppDefinition]:
+    """
+    Load the precompiled index of the stock application configs.
+
+    A missing, unreadable or outdated index is ignored, in which case the stock
+    configs get parsed from their .cfg files.
+
+    Returns:
+        dict of AppDefinition, indexed by application name.
+    """
+    try:
+        with open(get_stock_index_path(), encoding="utf-8") as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(index, dict) or index.get("format") != APPS_INDEX_FORMAT:
+        return {}
+
+    applications: dict[str, AppDefinition] = index.get("applications", {})
+    return applications
+
+
+def write_stock_index(index_path: str | None = None) -> str:
+    """
+    Parse every stock application config and write the precompiled index.
+
+    Args:
+        index_path (str): Where to write the index, get_stock_index_path() by
+                          default
+
+    Returns:
+        (str) Path to the written index
+    """
+    apps_dir: str = get_stock_apps_dir()
+    applications: dict[str, AppDefinition] = {}
+    for filename in sorted(os.listdir(apps_dir)):
+        if filename.endswith(".cfg"):
+            definition = parse_app_config(os.path.join(apps_dir, filename))
+            if definition is not None:
+                applications[filename[: -len(".cfg")]] = definition
+
+    if index_path is None:
+        index_path = get_stock_index_path()
+    with open(index_path, "w", encoding="utf-8") as index_file:
+        json.dump(
+            {"format": APPS_INDEX_FORMAT, "applications": applications},
+            index_file,
+            separators=(",", ":"),
+            sort_keys=True,
+        )
+
+    return index_path
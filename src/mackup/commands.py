@@ -0,0 +1,580 @@
+"""
+Commands of the command line.
+
+Each command of the command line is run here, once main parsed and checked
+the options. This module is only imported then, so that `mackup --help` and
+`mackup --version` don't need to import everything.
+"""
+
+import io
+import sys
+from dataclasses import dataclass
+from typing import Any, TextIO
+
+from . import plan, stats, tracing, trash, utils
+from .application import ApplicationProfile
+from .appsdb import ApplicationsDatabase
+from .constants import MACKUP_APP_NAME, get_version
+from .hashindex import HashIndex
+from .mackup import Mackup
+from .main import bold, header
+from .manifest import Manifest
+from .pathstate import PathStateCache
+from .plan import Operation, Plan
+from .trash import Trash
+
+
+@dataclass
+class _Context:
+    """Shared state threaded through the command handlers."""
+
+    config_file: str | None
+    mckp: Mackup
+    app_db: ApplicationsDatabase
+    dry_run: bool
+    verbose: bool
+    jobs: int = 1
+    incremental: bool = False
+    checksum: bool = False
+    # The plans of the run, if they are written
+    plan: Plan | None = None
+
+
+def _print_app_header(
+    app_name: str, verbose: bool, output: TextIO | None = None,
+) -> None:
+    if verbose:
+        header_str = header("---")
+        print(f"\n{header_str} {bold(app_name)} {header_str}", file=output)
+
+
+def _resolve_apps(app_name: str | None, ctx: _Context) -> set[str]:
+    """Resolve which apps a per-app command should act on.
+
+    If an application is named, error out when it is not a supported app
+    (like the `show` command) and otherwise act on exactly that app,
+    overriding the config's applications_to_sync / applications_to_ignore
+    lists. If no application is named, fall back to every configured
+    application.
+    """
+    if app_name:
+        if app_name not in ctx.app_db.get_app_names():
+            sys.exit(f"Unsupported application: {app_name}")
+        return {app_name}
+    return ctx.mckp.get_apps_to_backup()
+
+
+def _run_action(ctx: _Context, app_names: set[str], action: str) -> None:
+    """Run an ApplicationProfile method over each app, in sorted order."""
+    manifest = Manifest(ctx.mckp.mackup_folder)
+    path_states = PathStateCache()
+    apps: list[tuple[str, ApplicationProfile]] = [
+        (
+            app_name,
+            ApplicationProfile(
+                ctx.mckp,
+                ctx.app_db.get_files(app_name),
+                ctx.dry_run,
+                ctx.verbose,
+                incremental=ctx.incremental,
+                checksum=ctx.checksum,
+                manifest=manifest,
+                path_states=path_states,
+            ),
+        )
+        for app_name in sorted(app_names)
+    ]
+
+    # Plan the action on every app, and ask about every file to replace,
+    # before changing anything
+    plans = _confirm_plans(
+        ctx, [app_name for app_name, _ in apps], _plan_action(ctx, apps, action),
+    )
+
+    with utils.batched_attribute_clearing(
+        _get_paths_to_clear(ctx, apps, plans, action),
+    ):
+        if ctx.jobs > 1:
+            _run_action_concurrently(ctx, apps, plans, action)
+        else:
+            for (app_name, app), operations in zip(apps, plans, strict=True):
+                _print_app_header(app_name, ctx.verbose)
+                _run_app_action(app_name, app, action, operations)
+
+
+def _get_paths_to_clear(
+    ctx: _Context,
+    apps: list[tuple[str, ApplicationProfile]],
+    plans: list[list[Operation]],
+    action: str,
+) -> list[str]:
+    """
+    Return the paths whose attributes the plans need cleared.
+
+    Their ACLs and immutable attributes are cleared at once, instead of file by
+    file, see utils.batched_attribute_clearing().
+    """
+    paths_to_clear: list[str] = []
+    if not ctx.dry_run:
+        for (_, app), operations in zip(apps, plans, strict=True):
+            paths_to_clear.extend(app.get_paths_to_clear(action, operations))
+    return paths_to_clear
+
+
+def _plan_action(
+    ctx: _Context, apps: list[tuple[str, ApplicationProfile]], action: str,
+) -> list[list[Operation]]:
+    """Plan an ApplicationProfile method for each app, ctx.jobs apps at a time."""
+    if ctx.jobs == 1:
+        return [_plan_app_action(ctx, app_name, app, action) for app_name, app in apps]
+
+    # Only imported when needed, as it is slow to import
+    import concurrent.futures  # noqa: PLC0415
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ctx.jobs) as executor:
+        return list(
+            executor.map(
+                lambda item: _plan_app_action(ctx, item[0], item[1], action), apps,
+            ),
+        )
+
+
+def _plan_app_action(
+    ctx: _Context, app_name: str, app: ApplicationProfile, action: str,
+) -> list[Operation]:
+    """Plan an ApplicationProfile method, and keep the plan if it is written."""
+    with (
+        tracing.span(f"plan {action} {app_name}", "app", app=app_name, action=action),
+        stats.application(app_name),
+    ):
+        operations = app.plan(action)
+    if ctx.plan is not None:
+        ctx.plan.add(app_name, action, operations)
+    return operations
+
+
+def _confirm_plans(
+    ctx: _Context, app_names: list[str], plans: list[list[Operation]],
+) -> list[list[Operation]]:
+    """
+    Ask about every file the plans replace at once, before running them.
+
+    The files are listed by app, and the user replaces all of them, none of
+    them, or selects them one by one.
+
+    Returns:
+        The plans, with their questions answered
+    """
+    conflicts: list[tuple[str, Operation]] = [
+        (app_name, operation)
+        for app_name, operations in zip(app_names, plans, strict=True)
+        for operation in operations
+        if operation.question is not None
+    ]
+    if not conflicts or ctx.dry_run:
+        return plans
+
+    # One question is enough, and --force and --force-no answer all of them
+    replace_all: bool | None = None
+    if len(conflicts) > 1 and not (utils.FORCE_YES or utils.FORCE_NO):
+        print(f"{len(conflicts)} files would be replaced:")
+        current_app_name: str | None = None
+        for app_name, operation in conflicts:
+            if app_name != current_app_name:
+                print(f"  {bold(app_name)}")
+                current_app_name = app_name
+            print(f"    {operation.destination}")
+        replace_all = utils.confirm_all("Do you want to replace them?")
+
+    answers: dict[Operation, bool] = {}
+    for app_name, operation in conflicts:
+        # Counted for the app of the file, as if asked while running it
+        with stats.application(app_name):
+            if replace_all is None:
+                answers[operation] = utils.confirm(str(operation.question))
+            else:
+                stats.add("confirmations")
+                answers[operation] = replace_all
+    return [plan.answer_questions(operations, answers) for operations in plans]
+
+
+def _run_single_app_action(
+    ctx: _Context, app_name: str, app: ApplicationProfile, action: str,
+) -> None:
+    """Plan an ApplicationProfile method, confirm its plan, and execute it."""
+    plans = _confirm_plans(
+        ctx, [app_name], [_plan_app_action(ctx, app_name, app, action)],
+    )
+    with utils.batched_attribute_clearing(
+        _get_paths_to_clear(ctx, [(app_name, app)], plans, action),
+    ):
+        _run_app_action(app_name, app, action, plans[0])
+
+
+def _run_app_action(
+    app_name: str, app: ApplicationProfile, action: str, operations: list[Operation],
+) -> None:
+    """Execute the plan of an ApplicationProfile method, then save what it recorded."""
+    # Only the home files go to the trash, the Mackup folder is a copy of them
+    if utils.TRASH is not None:
+        utils.TRASH.ignore_folder(app.mackup.mackup_folder)
+
+    with (
+        tracing.span(f"{action} {app_name}", "app", app=app_name, action=action),
+        stats.application(app_name),
+    ):
+        app.execute(operations)
+        if app.manifest is not None:
+            app.manifest.save()
+
+
+def _run_action_concurrently(
+    ctx: _Context,
+    apps: list[tuple[str, ApplicationProfile]],
+    plans: list[list[Operation]],
+    action: str,
+) -> None:
+    """
+    Execute the plans of an ApplicationProfile method, ctx.jobs apps at a time.
+
+    The output of each app is buffered, and printed as soon as the apps before
+    it are done, so that it is the same as when running them one by one.
+    """
+
+    def run(app_name: str, app: ApplicationProfile, operations: list[Operation]) -> str:
+        app.output = io.StringIO()
+        _print_app_header(app_name, ctx.verbose, app.output)
+        _run_app_action(app_name, app, action, operations)
+        return app.output.getvalue()
+
+    # Only imported when needed, as it is slow to import
+    import concurrent.futures  # noqa: PLC0415
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ctx.jobs) as executor:
+        futures = [
+            executor.submit(run, app_name, app, operations)
+            for (app_name, app), operations in zip(apps, plans, strict=True)
+        ]
+        try:
+            for future in futures:
+                print(future.result(), end="")
+        except BaseException:
+            # Don't start the remaining apps if one of them failed
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _cmd_list(app_db: ApplicationsDatabase) -> None:
+    output: str = "Supported applications:\n"
+    for app_name in sorted(app_db.get_app_names()):
+        output += f" - {app_name}\n"
+    output += "\n"
+    output += (
+        f"{len(app_db.get_app_names())} applications supported in Mackup"
+        f" v{get_version()}"
+    )
+    print(output)
+
+
+def _cmd_show(args: dict[str, Any], app_db: ApplicationsDatabase) -> None:
+    requested_app_name: str = args["<application>"]
+
+    # Make sure the app exists
+    if requested_app_name not in app_db.get_app_names():
+        sys.exit(f"Unsupported application: {requested_app_name}")
+    print(f"Name: {app_db.get_name(requested_app_name)}")
+    print("Configuration files:")
+    for file in app_db.get_files(requested_app_name):
+        print(f" - {file}")
+
+
+def _cmd_status(args: dict[str, Any], ctx: _Context) -> None:
+    # Only imported when needed, so that the other commands don't import it
+    from . import status  # noqa: PLC0415
+
+    app_names = _resolve_apps(args["<application>"], ctx)
+    ctx.mckp.check_for_usable_environment()
+
+    def scan(app_name: str) -> list[tuple[str, str]]:
+        app = ApplicationProfile(
+            ctx.mckp,
+            ctx.app_db.get_files(app_name),
+            dry_run=True,
+            verbose=ctx.verbose,
+            checksum=ctx.checksum,
+        )
+        with (
+            tracing.span(f"status {app_name}", "app", app=app_name),
+            stats.application(app_name),
+        ):
+            return app.get_statuses()
+
+    # Only reading, so scan the apps concurrently even without --jobs
+    import concurrent.futures  # noqa: PLC0415
+
+    sorted_app_names = sorted(app_names)
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=ctx.jobs if ctx.jobs > 1 else None,
+    ) as executor:
+        app_statuses = list(executor.map(scan, sorted_app_names))
+
+    counts: dict[str, int] = dict.fromkeys(status.STATUSES, 0)
+    for app_name, statuses in zip(sorted_app_names, app_statuses, strict=True):
+        for filename, file_status in statuses:
+            counts[file_status] += 1
+            print(f"{file_status:<19}{app_name:<24} {filename}")
+
+    print(
+        ", ".join(f"{count} {file_status}" for file_status, count in counts.items()),
+    )
+
+
+def _cmd_diff(args: dict[str, Any], ctx: _Context) -> None:
+    # Only imported when needed, so that the other commands don't import it
+    from . import diff  # noqa: PLC0415
+
+    app_names = _resolve_apps(args["<application>"], ctx)
+    ctx.mckp.check_for_usable_environment()
+
+    for app_name in sorted(app_names):
+        app = ApplicationProfile(
+            ctx.mckp, ctx.app_db.get_files(app_name), dry_run=True, verbose=False,
+        )
+        with (
+            tracing.span(f"diff {app_name}", "app", app=app_name),
+            stats.application(app_name),
+        ):
+            for filename in app.files:
+                stats.add("config_files")
+                sys.stdout.writelines(
+                    diff.diff(*app.get_filepaths(filename), checksum=ctx.checksum),
+                )
+
+
+def _cmd_backup(args: dict[str, Any], ctx: _Context) -> None:
+    # Resolve and validate the target apps before the env check, so an
+    # unknown application name fails cleanly without creating the Mackup
+    # folder or prompting first.
+    app_names = _resolve_apps(args["<application>"], ctx)
+    ctx.mckp.check_for_usable_backup_env()
+
+    # Create a backup of the files of each application
+    _run_action(ctx, app_names, "copy_files_to_mackup_folder")
+
+
+def _cmd_restore(args: dict[str, Any], ctx: _Context) -> None:
+    app_names = _resolve_apps(args["<application>"], ctx)
+    ctx.mckp.check_for_usable_restore_env()
+
+    # Recover a backup of the files of each application
+    _run_action(ctx, app_names, "copy_files_from_mackup_folder")
+
+
+def _cmd_link_install(args: dict[str, Any], ctx: _Context) -> None:
+    app_names = _resolve_apps(args["<application>"], ctx)
+    # Check the env where the command is being run
+    ctx.mckp.check_for_usable_backup_env()
+
+    # Create a link for each application
+    _run_action(ctx, app_names, "link_install")
+
+
+def _cmd_link_uninstall(args: dict[str, Any], ctx: _Context) -> None:
+    # Validate any named application before the env check, so an unknown
+    # name fails cleanly before any prompt or side effect.
+    named_apps = (
+        _resolve_apps(args["<application>"], ctx) if args["<application>"] else None
+    )
+
+    # Check the env where the command is being run
+    ctx.mckp.check_for_usable_restore_env()
+
+    if named_apps is not None:
+        # Unlink only the named application, leaving the rest of Mackup
+        # (and the Mackup config itself) in place. No global confirmation
+        # is needed since the user explicitly scoped the uninstall.
+        _run_action(ctx, named_apps, "link_uninstall")
+
+    elif ctx.dry_run or (
+        utils.confirm(
+            "You are going to uninstall Mackup.\n"
+            "Every configuration file, setting and dotfile"
+            " managed by Mackup will be unlinked and copied back"
+            " to their original place, in your home folder.\n"
+            "Are you sure?",
+        )
+    ):
+        # Uninstall the apps except Mackup, which we'll uninstall last, to
+        # keep the settings as long as possible
+        app_names = ctx.mckp.get_apps_to_backup()
+        app_names.discard(MACKUP_APP_NAME)
+
+        _run_action(ctx, app_names, "link_uninstall")
+
+        # Restore the Mackup config before any other config, as we might
+        # need it to know about custom settings
+        mackup_app = ApplicationProfile(
+            ctx.mckp, ctx.app_db.get_files(MACKUP_APP_NAME), ctx.dry_run, ctx.verbose,
+        )
+        _run_single_app_action(ctx, MACKUP_APP_NAME, mackup_app, "link_uninstall")
+
+        # Delete the Mackup folder in Dropbox
+        # Don't delete this as there might be other Macs that aren't
+        # uninstalled yet
+        # delete(mckp.mackup_folder)
+
+        print(
+            "\n"
+            "All your files have been put back into place. You can now"
+            " safely uninstall Mackup.\n"
+            "\n"
+            "Thanks for using Mackup!",
+        )
+
+
+def _cmd_link(args: dict[str, Any], ctx: _Context) -> None:
+    # Validate any named application before the env check.
+    named_apps = (
+        _resolve_apps(args["<application>"], ctx) if args["<application>"] else None
+    )
+
+    # Check the env where the command is being run
+    ctx.mckp.check_for_usable_restore_env()
+
+    if named_apps is not None:
+        # Link only the named application. No need to restore the Mackup
+        # config first, as the app set is fixed and config-independent here.
+        _run_action(ctx, named_apps, "link")
+        return
+
+    # Restore the Mackup config before any other config, as we might
+    # need it to know about custom settings
+    mackup_app = ApplicationProfile(
+        ctx.mckp, ctx.app_db.get_files(MACKUP_APP_NAME), ctx.dry_run, ctx.verbose,
+    )
+    _print_app_header(MACKUP_APP_NAME, ctx.verbose)
+    _run_single_app_action(ctx, MACKUP_APP_NAME, mackup_app, "link")
+
+    # Reload the Mackup config and the custom apps, as the Mackup config
+    # might have changed them
+    ctx.app_db.reload_custom_apps()
+    ctx.mckp = Mackup(ctx.config_file, ctx.app_db)
+
+    # Restore the rest of the app configs, using the restored Mackup config
+    app_names = ctx.mckp.get_apps_to_backup()
+    # Mackup has already been done
+    app_names.discard(MACKUP_APP_NAME)
+
+    _run_action(ctx, app_names, "link")
+
+
+def _cmd_undo(ctx: _Context) -> None:
+    runs = [run for run in trash.get_runs() if run.get_paths()]
+    if not runs:
+        sys.exit("Nothing to undo.")
+
+    # Put back what the last run replaced or deleted
+    last_run = runs[-1]
+    for path in reversed(last_run.get_paths()):
+        print(f"Restoring {path} ...")
+
+    if ctx.dry_run:
+        return
+
+    # What is in the way goes to the trash, so that undo can be undone
+    if utils.TRASH is None:
+        utils.TRASH = Trash.new_run()
+    last_run.restore(utils.TRASH)
+
+
+def _cmd_purge(ctx: _Context) -> None:
+    runs = trash.get_runs()
+    for run in runs:
+        if ctx.verbose:
+            print(f"Removing {run.path} ...")
+    if not ctx.dry_run:
+        trash.purge(0)
+    print(f"{len(runs)} runs removed from the trash.")
+
+
+# Commands that can delete files in the home
+_DELETING_COMMANDS: tuple[str, ...] = ("backup", "restore", "link", "undo")
+
+
+def run_command(args: dict[str, Any], jobs: int) -> None:
+    """Run the command given on the command line."""
+    config_file: str | None = args.get("--config-file")
+    # A single apps db is shared by everything this run does
+    app_db = ApplicationsDatabase(lazy=True, cache=True)
+    ctx = _Context(
+        config_file=config_file,
+        mckp=Mackup(config_file, app_db),
+        app_db=app_db,
+        dry_run=args["--dry-run"],
+        verbose=args["--verbose"],
+        jobs=jobs,
+        incremental=args["--incremental"] or args["--checksum"],
+        checksum=args["--checksum"],
+        plan=Plan() if args["--plan"] else None,
+    )
+
+    # If we want to answer mackup with "yes" for each question
+    if args["--force"]:
+        utils.FORCE_YES = True
+
+    # If we want to answer mackup with "no" for each question
+    if args["--force-no"]:
+        utils.FORCE_NO = True
+
+    # Allow mackup to be run as root
+    if args["--root"]:
+        utils.CAN_RUN_AS_ROOT = True
+
+    # Keep what this run deletes in the home, so that it can be undone
+    if not (args["--dry-run"] or args["--no-trash"]) and any(
+        args[command] for command in _DELETING_COMMANDS
+    ):
+        utils.TRASH = Trash.new_run()
+
+    # Only hash the files that changed since the last run
+    utils.HASH_INDEX = HashIndex()
+
+    if args["list"]:
+        # The catalog doesn't need the storage
+        ctx.mckp.check_for_superuser()
+        _cmd_list(ctx.app_db)
+    elif args["show"]:
+        # The catalog doesn't need the storage
+        ctx.mckp.check_for_superuser()
+        _cmd_show(args, ctx.app_db)
+    elif args["status"]:
+        _cmd_status(args, ctx)
+    elif args["diff"]:
+        _cmd_diff(args, ctx)
+    elif args["backup"]:
+        _cmd_backup(args, ctx)
+    elif args["restore"]:
+        _cmd_restore(args, ctx)
+    elif args["link"] and args["install"]:
+        _cmd_link_install(args, ctx)
+    elif args["link"] and args["uninstall"]:
+        _cmd_link_uninstall(args, ctx)
+    elif args["link"]:
+        _cmd_link(args, ctx)
+    elif args["undo"]:
+        ctx.mckp.check_for_usable_environment()
+        _cmd_undo(ctx)
+    elif args["purge"]:
+        ctx.mckp.check_for_usable_environment()
+        _cmd_purge(ctx)
+
+    # Only keep the last runs in the trash
+    if utils.TRASH is not None:
+        trash.purge()
+
+    ctx.app_db.save_cache()
+    utils.HASH_INDEX.save()
+
+    if ctx.plan is not None:
+        ctx.plan.save(args["--plan"])
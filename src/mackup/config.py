@@ -5,6 +5,7 @@ import os
 import os.path
 from pathlib import Path
 
+from . import tracing
 from .constants import (
     CUSTOM_APPS_DIR,
     CUSTOM_APPS_DIR_XDG,
@@ -36,26 +37,31 @@ class Config:
         """
         assert isinstance(filename, str) or filename is None
 
-        # Initialize the parser
-        self._parser = self._setup_parser(filename)
+        with tracing.span("Config", "config", filename=filename):
+            # Initialize the parser
+            self._parser = self._setup_parser(filename)
 
-        # Do we have an old config file?
-        self._warn_on_old_config()
+            # Do we have an old config file?
+            self._warn_on_old_config()
 
-        # Get the storage engine
-        self._engine = self._parse_engine()
+            # Get the storage engine
+            self._engine = self._parse_engine()
 
-        # Get the path where the Mackup folder is
-        self._path = self._parse_path()
+            # Get the path where the Mackup folder is. Finding the folder of a
+            # storage provider reads its files, so it's only done when needed.
+            # The path of the file_system engine is in the config, check it now.
+            self._path: str | None = None
+            if self._engine == ENGINE_FS:
+                self._path = self._parse_path()
 
-        # Get the directory replacing 'Mackup', if any
-        self._directory = self._parse_directory()
+            # Get the directory replacing 'Mackup', if any
+            self._directory = self._parse_directory()
 
-        # Get the list of apps to ignore
-        self._apps_to_ignore = self._parse_apps_to_ignore()
+            # Get the list of apps to ignore
+            self._apps_to_ignore = self._parse_apps_to_ignore()
 
-        # Get the list of apps to allow
-        self._apps_to_sync = self._parse_apps_to_sync()
+            # Get the list of apps to allow
+            self._apps_to_sync = self._parse_apps_to_sync()
 
     @property
     def engine(self) -> str:
@@ -80,7 +86,10 @@ class Config:
         Returns:
             str
         """
-        return str(self._path)
+        if self._path is None:
+            with tracing.span("storage path", "config", engine=self.engine):
+                self._path = self._parse_path()
+        return self._path
 
     @property
     def directory(self) -> str:
@@ -1,7 +1,5 @@
 """Constants used in Mackup."""
 
-from importlib.metadata import PackageNotFoundError, version
-
 # Support platforms
 PLATFORM_DARWIN: str = "Darwin"
 PLATFORM_LINUX: str = "Linux"
@@ -9,6 +7,12 @@ PLATFORM_LINUX: str = "Linux"
 # Directory containing the application configs
 APPS_DIR: str = "applications"
 
+# Precompiled index of the stock application configs, generated at build time
+APPS_INDEX_FILE: str = "applications.json"
+
+# Version of the format of APPS_INDEX_FILE, bump it on incompatible changes
+APPS_INDEX_FORMAT: int = 1
+
 # Mackup application name
 MACKUP_APP_NAME: str = "mackup"
 
@@ -18,17 +22,29 @@ MACKUP_BACKUP_PATH: str = "Mackup"
 # Mackup config file
 MACKUP_CONFIG_FILE: str = ".mackup.cfg"
 
+# Manifest of the files copied in the Mackup folder, stored in that folder
+MANIFEST_FILE: str = ".mackup_manifest.json"
+
+# Version of the format of MANIFEST_FILE, bump it on incompatible changes
+MANIFEST_FORMAT: int = 1
+
 
 def get_version() -> str:
     """Return package version, or a safe fallback when metadata is unavailable."""
+    # Reading the package metadata is slow, only do it when the version is used
+    from importlib.metadata import PackageNotFoundError, version  # noqa: PLC0415
+
     try:
         return version(MACKUP_APP_NAME)
     except PackageNotFoundError:
         return "unknown"
 
 
-# Current version
-VERSION: str = get_version()
+def __getattr__(name: str) -> str:
+    """Look up the current version, VERSION, when first used."""
+    if name == "VERSION":
+        return get_version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Directory that can contains user defined app configs
 CUSTOM_APPS_DIR: str = ".mackup"
@@ -36,6 +52,21 @@ CUSTOM_APPS_DIR: str = ".mackup"
 # XDG-compliant directory for user defined app configs (relative to XDG_CONFIG_HOME)
 CUSTOM_APPS_DIR_XDG: str = "mackup/applications"
 
+# Cache of the parsed user defined app configs (relative to XDG_CACHE_HOME)
+CUSTOM_APPS_CACHE_FILE: str = "mackup/custom_applications.json"
+
+# Index of the hashes of the files (relative to XDG_CACHE_HOME)
+HASH_INDEX_FILE: str = "mackup/hash_index"
+
+# Version of the format of HASH_INDEX_FILE, bump it on incompatible changes
+HASH_INDEX_FORMAT: int = 1
+
+# Trash of the deleted files and folders (relative to XDG_DATA_HOME)
+TRASH_DIR: str = "mackup/trash"
+
+# Number of runs kept in the trash
+TRASH_RUNS_TO_KEEP: int = 5
+
 # Supported engines
 ENGINE_DROPBOX: str = "dropbox"
 ENGINE_FS: str = "file_system"
@@ -0,0 +1,144 @@
+"""
+Differences between the configuration files and their copies.
+
+`mackup diff` shows how the files in the home differ from their copies in the
+Mackup folder, before a restore replaces them. Files are first compared on
+their size and modification time, then chunk by chunk, so that they are never
+read whole. Small text files that differ are shown as unified diffs, others
+are only listed.
+"""
+
+import difflib
+import os
+import stat
+from collections.abc import Iterator
+
+from . import stats, status
+
+# Files bigger than this are only listed, in bytes
+MAX_TEXT_DIFF_SIZE = 256 * 1024
+
+# Number of bytes compared at a time
+COMPARE_CHUNK_SIZE = 64 * 1024
+
+
+def _list_files(path: str) -> dict[str, str]:
+    """Return the files of a file or folder, by path relative to it."""
+    if not os.path.isdir(path):
+        return {"": path}
+
+    files: dict[str, str] = {}
+    for folder, _, filenames in os.walk(path):
+        stats.add("folders_visited")
+        for filename in filenames:
+            file_path = os.path.join(folder, filename)
+            # Skip the broken links, there is nothing to compare
+            if os.path.exists(file_path):
+                files[os.path.relpath(file_path, path)] = file_path
+    return files
+
+
+def is_same_content(path_a: str, path_b: str, checksum: bool = False) -> bool:
+    """
+    Tell if two files have the same content.
+
+    Files of different sizes differ. Unless checksum is True, files of the
+    same size and modification time are the same. Else, they are read chunk by
+    chunk until they differ.
+
+    Args:
+        path_a (str)
+        path_b (str)
+        checksum (bool): Always compare the content of the files
+
+    Returns:
+        (boolean)
+    """
+    stat_a = os.stat(path_a)
+    stat_b = os.stat(path_b)
+    stats.add("stat_calls", 2)
+    if stat_a.st_size != stat_b.st_size:
+        return False
+    if not checksum and stat_a.st_mtime_ns == stat_b.st_mtime_ns:
+        return True
+    if not (stat.S_ISREG(stat_a.st_mode) and stat.S_ISREG(stat_b.st_mode)):
+        return False
+
+    stats.add("files_visited", 2)
+    with open(path_a, "rb") as file_a, open(path_b, "rb") as file_b:
+        while True:
+            chunk_a = file_a.read(COMPARE_CHUNK_SIZE)
+            if chunk_a != file_b.read(COMPARE_CHUNK_SIZE):
+                return False
+            if not chunk_a:
+                return True
+
+
+def _read_text(path: str) -> list[str] | None:
+    """Return the lines of a small text file, or None for other files."""
+    if os.path.getsize(path) > MAX_TEXT_DIFF_SIZE:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\0" in data:
+        return None
+    try:
+        return data.decode("utf-8").splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return None
+
+
+def _diff_files(mackup_path: str, home_path: str) -> Iterator[str]:
+    """Yield the lines showing how two files that differ differ."""
+    mackup_lines = _read_text(mackup_path)
+    home_lines = _read_text(home_path)
+    if mackup_lines is None or home_lines is None:
+        yield (
+            f"Files {mackup_path} ({os.path.getsize(mackup_path)} bytes) and"
+            f" {home_path} ({os.path.getsize(home_path)} bytes) differ\n"
+        )
+        return
+
+    for line in difflib.unified_diff(
+        mackup_lines, home_lines, fromfile=mackup_path, tofile=home_path,
+    ):
+        yield line if line.endswith("\n") else line + "\n\\ No newline at end of file\n"
+
+
+def diff(home_path: str, mackup_path: str, checksum: bool = False) -> Iterator[str]:
+    """
+    Yield the lines showing how a configuration file differs from its copy.
+
+    Nothing is yielded if they are the same, or if the home file is a link to
+    the copy.
+
+    Args:
+        home_path (str): Path of the file or folder in the home
+        mackup_path (str): Path of its copy in the Mackup folder
+        checksum (bool): Always compare the content of the files
+
+    Yields:
+        (str): Lines, ending with a newline
+    """
+    file_status = status.get_status(home_path, mackup_path, checksum)
+    if file_status in (None, status.LINKED, status.SYNCED):
+        return
+    if file_status == status.BROKEN_LINK:
+        yield f"Broken link: {home_path}\n"
+        return
+    if file_status == status.MISSING_IN_HOME:
+        yield f"Only in the Mackup folder: {mackup_path}\n"
+        return
+    if file_status == status.MISSING_IN_STORAGE:
+        yield f"Only in the home: {home_path}\n"
+        return
+
+    mackup_files = _list_files(mackup_path)
+    home_files = _list_files(home_path)
+    for name in sorted(mackup_files.keys() | home_files.keys()):
+        if name not in home_files:
+            yield f"Only in the Mackup folder: {mackup_files[name]}\n"
+        elif name not in mackup_files:
+            yield f"Only in the home: {home_files[name]}\n"
+        elif not is_same_content(mackup_files[name], home_files[name], checksum):
+            yield from _diff_files(mackup_files[name], home_files[name])
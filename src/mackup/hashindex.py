@@ -0,0 +1,224 @@
+"""
+Persistent index of the hashes of the files.
+
+Comparing files on their content needs their hashes, and hashing big
+configuration folders on every run is slow. Like the index of git, the hash
+index remembers the SHA-256 of each file hashed, with the device, inode, size,
+modification time and change time of the file when it was hashed. A file is
+only hashed again when one of them changed.
+
+The index is kept in $XDG_CACHE_HOME, ~/.cache by default, in a compact binary
+file: a header, one fixed size record per file, then the paths of the files
+separated by NUL bytes. It is loaded in a dict, indexed by path, and can be
+deleted at any time.
+"""
+
+import hashlib
+import os
+import struct
+import threading
+import time
+
+from . import stats
+from .constants import HASH_INDEX_FILE, HASH_INDEX_FORMAT
+
+# Magic bytes at the start of the index file
+MAGIC = b"MKHI"
+
+# Header: magic, format, number of records, size of the paths in bytes
+HEADER = struct.Struct("<4sIII")
+
+# Record of a file: device, inode, size, modification and change times in ns,
+# and SHA-256 digest
+RECORD = struct.Struct("<QQQqq32s")
+
+# Number of bytes read at a time when hashing a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# A file changed less than this before it is hashed may change again without
+# its times changing, as they have a limited precision. Its hash is not kept.
+RACY_WINDOW_NS = 2_000_000_000
+
+# Past this number of files, the files not used by a run are forgotten
+MAX_ENTRIES = 1_000_000
+
+# What is recorded for a file: device, inode, size, mtime_ns, ctime_ns, digest
+Entry = tuple[int, int, int, int, int, bytes]
+
+
+def hash_file(path: str) -> bytes:
+    """
+    Compute the SHA-256 digest of the content of a file.
+
+    Args:
+        path (str): File to read
+
+    Returns:
+        (bytes): Digest
+    """
+    stats.add("files_hashed")
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.digest()
+
+
+class HashIndex:
+    """
+    Index of the hashes of the files, kept from one run to another.
+
+    The index file is only read when first needed. It can be used by
+    applications processed concurrently.
+    """
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Create a HashIndex instance.
+
+        Args:
+            path (str): Path of the index file, get_hash_index_path() by
+                        default
+        """
+        self.path: str = path if path is not None else get_hash_index_path()
+        self._entries: dict[str, Entry] | None = None
+        self._used: set[str] = set()
+        self._dirty: bool = False
+        self._lock = threading.Lock()
+
+    def _get_entries(self) -> dict[str, Entry]:
+        """Return the entries, reading the index file the first time."""
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> dict[str, Entry]:
+        """Read the index file, ignoring it if missing, unreadable or outdated."""
+        try:
+            with open(self.path, "rb") as index_file:
+                data = index_file.read()
+        except OSError:
+            return {}
+
+        if len(data) < HEADER.size:
+            return {}
+        magic, index_format, count, paths_size = HEADER.unpack_from(data)
+        records_end = HEADER.size + count * RECORD.size
+        if (
+            magic != MAGIC
+            or index_format != HASH_INDEX_FORMAT
+            or len(data) != records_end + paths_size
+        ):
+            return {}
+
+        if count == 0:
+            return {}
+        paths = data[records_end:].decode("utf-8", "surrogateescape").split("\0")
+        if len(paths) != count:
+            return {}
+        records = RECORD.iter_unpack(data[HEADER.size : records_end])
+        return dict(zip(paths, records, strict=True))
+
+    def __contains__(self, path: object) -> bool:
+        """Tell if the hash of a file is in the index."""
+        with self._lock:
+            return path in self._get_entries()
+
+    def __len__(self) -> int:
+        """Return the number of files in the index."""
+        with self._lock:
+            return len(self._get_entries())
+
+    def get_hash(self, path: str, stat_result: os.stat_result | None = None) -> str:
+        """
+        Return the SHA-256 of a file, only hashing it if it changed.
+
+        Args:
+            path (str): Absolute path of the file
+            stat_result (os.stat_result): os.stat() of the file, if known
+
+        Returns:
+            (str): Hexadecimal digest
+        """
+        if stat_result is None:
+            stat_result = os.stat(path)
+            stats.add("stat_calls")
+        key = (
+            stat_result.st_dev,
+            stat_result.st_ino,
+            stat_result.st_size,
+            stat_result.st_mtime_ns,
+            stat_result.st_ctime_ns,
+        )
+
+        with self._lock:
+            entry = self._get_entries().get(path)
+            self._used.add(path)
+        if entry is not None and entry[:5] == key:
+            return entry[5].hex()
+
+        start_ns = time.time_ns()
+        digest = hash_file(path)
+        # Don't keep the hash of a racily clean file, see RACY_WINDOW_NS
+        if (
+            max(stat_result.st_mtime_ns, stat_result.st_ctime_ns)
+            <= start_ns - RACY_WINDOW_NS
+        ):
+            with self._lock:
+                self._get_entries()[path] = (*key, digest)
+                self._dirty = True
+
+        return digest.hex()
+
+    def save(self) -> None:
+        """Write the index file if it changed."""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+
+            if len(self._entries) > MAX_ENTRIES:
+                self._entries = {
+                    path: entry
+                    for path, entry in self._entries.items()
+                    if path in self._used
+                }
+
+            paths = "\0".join(self._entries).encode("utf-8", "surrogateescape")
+            count = len(self._entries)
+            data = b"".join(
+                [
+                    HEADER.pack(MAGIC, HASH_INDEX_FORMAT, count, len(paths)),
+                    *(RECORD.pack(*entry) for entry in self._entries.values()),
+                    paths,
+                ],
+            )
+
+            # Write to a temp file first, so that a reader never sees a
+            # partially written index
+            tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp_path, "wb") as index_file:
+                    index_file.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                # The index is only an optimization
+                return
+
+            self._dirty = False
+
+
+def get_hash_index_path() -> str:
+    """
+    Return the path of the hash index.
+
+    It lives in $XDG_CACHE_HOME, ~/.cache by default.
+
+    Returns:
+        str
+    """
+    xdg_cache_home: str = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.environ["HOME"], ".cache"),
+    )
+    return os.path.join(xdg_cache_home, HASH_INDEX_FILE)
@@ -15,15 +15,36 @@ from . import appsdb, config, utils
 class Mackup:
     """Main Mackup class."""
 
-    def __init__(self, config_file: str | None = None) -> None:
-        """Mackup Constructor."""
+    def __init__(
+        self,
+        config_file: str | None = None,
+        app_db: appsdb.ApplicationsDatabase | None = None,
+    ) -> None:
+        """
+        Mackup Constructor.
+
+        Args:
+            config_file (str): Optional path to the Mackup config file
+            app_db (ApplicationsDatabase): Optional database to reuse, instead
+                                           of loading a new one when needed
+        """
         self._config: config.Config = config.Config(config_file)
+        self._app_db: appsdb.ApplicationsDatabase | None = app_db
 
-        self.mackup_folder: str = self._config.fullpath
+    @property
+    def mackup_folder(self) -> str:
+        """
+        Full path to the Mackup folder, in the storage.
 
-    def check_for_usable_environment(self) -> None:
-        """Check if the current env is usable and has everything's required."""
+        The storage is only looked up the first time it is used.
 
+        Returns:
+            str
+        """
+        return self._config.fullpath
+
+    def check_for_superuser(self) -> None:
+        """Check if the current user can run Mackup."""
         # Allow only explicit superuser usage
         if os.geteuid() == 0 and not utils.CAN_RUN_AS_ROOT:
             utils.error(
@@ -32,6 +53,10 @@ class Mackup:
                 " Run mackup --help for guidance.",
             )
 
+    def check_for_usable_environment(self) -> None:
+        """Check if the current env is usable and has everything's required."""
+        self.check_for_superuser()
+
         # Do we have a folder set to save Mackup content into?
         if not os.path.isdir(self._config.path):
             utils.error(
@@ -82,12 +107,16 @@ class Mackup:
         Returns:
             (set) List of application names to back up
         """
-        # Instantiate the app db
-        app_db: appsdb.ApplicationsDatabase = appsdb.ApplicationsDatabase()
+        # Instantiate the app db if none was given, only the app names are
+        # needed here
+        if self._app_db is None:
+            self._app_db = appsdb.ApplicationsDatabase(lazy=True)
 
         # If a list of apps to sync is specify, we only allow those
         # Or we allow every supported app by default
-        apps_to_backup: set[str] = self._config.apps_to_sync or app_db.get_app_names()
+        apps_to_backup: set[str] = (
+            self._config.apps_to_sync or self._app_db.get_app_names()
+        )
 
         # Remove the specified apps to ignore
         for app_name in self._config.apps_to_ignore:
@@ -0,0 +1,343 @@
+"""
+Manifest of the Mackup folder.
+
+The manifest records the type, mode, size, modification time and content hash
+of every file and folder Mackup copied in the Mackup folder. It lets later runs
+tell if a file changed without reading the Mackup folder, where every access
+may trigger a download from the storage provider.
+"""
+
+import json
+import os
+import stat
+import threading
+from collections.abc import Iterator
+from typing import Any, TypedDict
+
+from . import stats, utils
+from .constants import MANIFEST_FILE, MANIFEST_FORMAT
+
+
+class ManifestEntry(TypedDict):
+    """A file or folder recorded in the manifest."""
+
+    type: str
+    mode: int
+    size: int
+    mtime_ns: int
+    sha256: str | None
+
+
+class Manifest:
+    """
+    Manifest of the files and folders copied in the Mackup folder.
+
+    Entries are indexed by their path relative to the Mackup folder, which is
+    also their path relative to the home. The manifest file is only read when
+    first needed, and can be deleted at any time.
+
+    It can be used by applications processed concurrently.
+    """
+
+    def __init__(self, mackup_folder: str) -> None:
+        """
+        Create a Manifest instance.
+
+        Args:
+            mackup_folder (str): Path of the Mackup folder
+        """
+        self.path: str = os.path.join(mackup_folder, MANIFEST_FILE)
+        self._entries: dict[str, ManifestEntry] | None = None
+        self._dirty: bool = False
+        self._lock = threading.Lock()
+
+    def _get_entries(self) -> dict[str, ManifestEntry]:
+        """Return the entries, reading the manifest file the first time."""
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> dict[str, ManifestEntry]:
+        """Read the manifest file, ignoring it if missing, unreadable or outdated."""
+        try:
+            with open(self.path, encoding="utf-8") as manifest_file:
+                manifest: Any = json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(manifest, dict) or manifest.get("format") != MANIFEST_FORMAT:
+            return {}
+
+        entries: dict[str, ManifestEntry] = manifest.get("entries", {})
+        return entries
+
+    def get(self, filename: str) -> ManifestEntry | None:
+        """
+        Return the recorded entry of a file or folder.
+
+        Args:
+            filename (str): Path relative to the Mackup folder
+
+        Returns:
+            ManifestEntry, or None if not recorded.
+        """
+        with self._lock:
+            return self._get_entries().get(filename)
+
+    def record(
+        self,
+        filename: str,
+        path: str,
+        previous_entries: dict[str, ManifestEntry] | None = None,
+        synced_entries: dict[str, utils.SyncedEntry] | None = None,
+    ) -> None:
+        """
+        Record a file or folder, and everything in it.
+
+        Files whose size and modification time did not change since they were
+        last recorded are not hashed again.
+
+        Args:
+            filename (str): Path relative to the Mackup folder
+            path (str): Absolute path of the file or folder to record
+            previous_entries (dict): Entries of filename returned by forget(),
+                                     when it was forgotten while being copied
+            synced_entries (dict): What utils.sync() or utils.copy() wrote at
+                                   path, so that it is not read again
+        """
+        with self._lock:
+            previous_entries = {
+                **(previous_entries or {}),
+                **_subtree(self._get_entries(), filename),
+            }
+
+        if synced_entries is None:
+            synced_entries = {
+                entry_path: _to_synced_entry(stat_result)
+                for _, entry_path, stat_result in _scan(filename, path)
+            }
+
+        new_entries: dict[str, ManifestEntry] = {}
+        for entry_path, synced_entry in synced_entries.items():
+            # The entries are below path
+            name = filename + entry_path[len(path) :]
+            new_entries[name] = _make_entry(
+                entry_path, synced_entry, previous_entries.get(name),
+            )
+
+        with self._lock:
+            entries = self._get_entries()
+            _remove(entries, filename)
+            entries.update(new_entries)
+            self._dirty = True
+
+    def forget(self, filename: str) -> dict[str, ManifestEntry]:
+        """
+        Forget a file or folder, and everything in it.
+
+        Args:
+            filename (str): Path relative to the Mackup folder
+
+        Returns:
+            dict: The entries forgotten, by path relative to the Mackup folder
+        """
+        with self._lock:
+            forgotten = _remove(self._get_entries(), filename)
+            if forgotten:
+                self._dirty = True
+        return forgotten
+
+    def is_current(
+        self, filename: str, path: str, stat_result: os.stat_result,
+    ) -> bool:
+        """
+        Tell if what is recorded for filename still describes its copy.
+
+        The copy may have been removed or changed since it was recorded, by
+        hand, on another machine or by another version of Mackup. Each file
+        and folder of the copy is compared on its size and modification time,
+        without reading its content.
+
+        Args:
+            filename (str): Path relative to the Mackup folder
+            path (str): Absolute path of the copy
+            stat_result (os.stat_result): os.stat() of the copy
+
+        Returns:
+            (boolean)
+        """
+        return self._compare(filename, path, False, stat_result) is True
+
+    def is_synced(
+        self, filename: str, path: str, checksum: bool = False,
+    ) -> bool | None:
+        """
+        Tell if a file or folder matches what is recorded for filename.
+
+        Files are compared on their size and modification time, or on their
+        content if checksum is True. Only the file or folder at path is read.
+
+        Args:
+            filename (str): Path relative to the Mackup folder
+            path (str): Absolute path of the file or folder to compare
+            checksum (bool): Compare the content of the files
+
+        Returns:
+            (boolean): Whether they match, or None if filename is not recorded
+        """
+        return self._compare(filename, path, checksum)
+
+    def _compare(
+        self,
+        filename: str,
+        path: str,
+        checksum: bool,
+        stat_result: os.stat_result | None = None,
+    ) -> bool | None:
+        """See is_synced(), stat_result being os.stat() of path if known."""
+        with self._lock:
+            entries = self._get_entries()
+            if filename not in entries:
+                return None
+            recorded = _subtree(entries, filename)
+
+        for name, entry_path, entry_stat in _scan(filename, path, stat_result):
+            entry = recorded.pop(name, None)
+            if entry is None or not _matches(entry, entry_path, entry_stat, checksum):
+                return False
+
+        # Anything left has been removed since
+        return not recorded
+
+    def save(self) -> None:
+        """Write the manifest file if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+
+            # Write to a temp file first, so that a reader never sees a
+            # partially written manifest
+            tmp_path: str = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+                    json.dump(
+                        {"format": MANIFEST_FORMAT, "entries": self._entries},
+                        manifest_file,
+                        separators=(",", ":"),
+                        sort_keys=True,
+                    )
+                os.replace(tmp_path, self.path)
+            except OSError:
+                # The manifest is only an optimization
+                return
+
+            self._dirty = False
+
+
+def _scan(
+    filename: str, path: str, stat_result: os.stat_result | None = None,
+) -> Iterator[tuple[str, str, os.stat_result]]:
+    """
+    Walk a file or folder like utils.copy() does.
+
+    Links are followed, and broken links are skipped.
+
+    Args:
+        filename (str): Path relative to the Mackup folder
+        path (str): Absolute path of the file or folder
+        stat_result (os.stat_result): os.stat() of path, if known
+
+    Yields:
+        (name, path, stat) of each file and folder, name being relative to the
+        Mackup folder.
+    """
+    if stat_result is None:
+        stats.add("stat_calls")
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return
+
+    yield filename, path, stat_result
+    if stat.S_ISDIR(stat_result.st_mode):
+        with os.scandir(path) as entries:
+            for entry in entries:
+                yield from _scan(os.path.join(filename, entry.name), entry.path)
+
+
+def _to_synced_entry(stat_result: os.stat_result) -> utils.SyncedEntry:
+    """Describe a file or folder read with os.stat() like utils.sync() does."""
+    if not stat.S_ISREG(stat_result.st_mode):
+        return utils.SyncedEntry(True, stat.S_IMODE(stat_result.st_mode), 0, 0)
+    return utils.SyncedEntry(
+        False,
+        stat.S_IMODE(stat_result.st_mode),
+        stat_result.st_size,
+        stat_result.st_mtime_ns,
+    )
+
+
+def _make_entry(
+    path: str, synced_entry: utils.SyncedEntry, previous: ManifestEntry | None,
+) -> ManifestEntry:
+    if synced_entry.is_dir:
+        return {
+            "type": "folder",
+            "mode": synced_entry.mode,
+            "size": 0,
+            "mtime_ns": 0,
+            "sha256": None,
+        }
+
+    # Reuse the hash of an unchanged file
+    if (
+        previous is not None
+        and previous["type"] == "file"
+        and previous["size"] == synced_entry.size
+        and previous["mtime_ns"] == synced_entry.mtime_ns
+    ):
+        sha256 = previous["sha256"]
+    else:
+        sha256 = utils.file_hash(path)
+
+    return {
+        "type": "file",
+        "mode": synced_entry.mode,
+        "size": synced_entry.size,
+        "mtime_ns": synced_entry.mtime_ns,
+        "sha256": sha256,
+    }
+
+
+def _matches(
+    entry: ManifestEntry, path: str, stat_result: os.stat_result, checksum: bool,
+) -> bool:
+    if not stat.S_ISREG(stat_result.st_mode):
+        return entry["type"] == "folder" and stat.S_ISDIR(stat_result.st_mode)
+    if entry["type"] != "file" or entry["size"] != stat_result.st_size:
+        return False
+    if checksum:
+        return entry["sha256"] == utils.file_hash(path)
+    return entry["mtime_ns"] == stat_result.st_mtime_ns
+
+
+def _subtree(
+    entries: dict[str, ManifestEntry], filename: str,
+) -> dict[str, ManifestEntry]:
+    """Return the entries of a file or folder and of everything in it."""
+    prefix = filename + os.sep
+    return {
+        name: entry
+        for name, entry in entries.items()
+        if name == filename or name.startswith(prefix)
+    }
+
+
+def _remove(
+    entries: dict[str, ManifestEntry], filename: str,
+) -> dict[str, ManifestEntry]:
+    """Remove a file or folder and everything in it, returning what was."""
+    removed = _subtree(entries, filename)
+    for name in removed:
+        del entries[name]
+    return removed
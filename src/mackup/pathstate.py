@@ -0,0 +1,161 @@
+"""
+State of the paths Mackup works on.
+
+Deciding what to do with a file takes many questions about the home path and
+the Mackup path: does it exist, is it a file, a folder, a link, do both point to
+the same file... Answered with os.path, each of them is a system call, which is
+slow on a folder synced by a storage provider. The state of a path is read once
+instead, with an lstat and, for links only, a stat, and kept until Mackup
+changes the path.
+"""
+
+import os
+import stat
+import threading
+from dataclasses import dataclass
+
+from . import stats
+
+
+@dataclass(frozen=True)
+class PathState:
+    """What Mackup needs to know about a path."""
+
+    path: str
+    # os.lstat() of the path, None if nothing is there
+    lstat: os.stat_result | None
+    # os.stat() of the path, None if nothing is there or it is a broken link
+    stat: os.stat_result | None
+
+    @classmethod
+    def read(cls, path: str) -> "PathState":
+        """
+        Read the state of a path.
+
+        Args:
+            path (str)
+
+        Returns:
+            PathState
+        """
+        stats.add("stat_calls")
+        try:
+            lstat_result = os.lstat(path)
+        except OSError:
+            return cls(path, None, None)
+
+        # Only a link needs a second system call
+        if not stat.S_ISLNK(lstat_result.st_mode):
+            return cls(path, lstat_result, lstat_result)
+        stats.add("stat_calls")
+        try:
+            return cls(path, lstat_result, os.stat(path))
+        except OSError:
+            return cls(path, lstat_result, None)
+
+    @property
+    def lexists(self) -> bool:
+        """Something is there, like os.path.lexists()."""
+        return self.lstat is not None
+
+    @property
+    def exists(self) -> bool:
+        """Something is there, links being followed, like os.path.exists()."""
+        return self.stat is not None
+
+    @property
+    def is_link(self) -> bool:
+        """It is a link, like os.path.islink()."""
+        return self.lstat is not None and stat.S_ISLNK(self.lstat.st_mode)
+
+    @property
+    def is_file(self) -> bool:
+        """It is a file, links being followed, like os.path.isfile()."""
+        return self.stat is not None and stat.S_ISREG(self.stat.st_mode)
+
+    @property
+    def is_dir(self) -> bool:
+        """It is a folder, links being followed, like os.path.isdir()."""
+        return self.stat is not None and stat.S_ISDIR(self.stat.st_mode)
+
+    @property
+    def file_type(self) -> str:
+        """
+        Name the type of what is there, for the user.
+
+        Returns:
+            (str): "file", "folder" or "link"
+        """
+        if self.is_file:
+            return "file"
+        if self.is_dir:
+            return "folder"
+        if self.is_link:
+            return "link"
+        raise ValueError(f"Unsupported file: {self.path}")
+
+    def is_same_file(self, other: "PathState") -> bool:
+        """
+        Tell if both paths point to the same file, like os.path.samefile().
+
+        Args:
+            other (PathState)
+
+        Returns:
+            (boolean): False if any of them does not exist
+        """
+        return (
+            self.stat is not None
+            and other.stat is not None
+            and self.stat.st_dev == other.stat.st_dev
+            and self.stat.st_ino == other.stat.st_ino
+        )
+
+
+class PathStateCache:
+    """
+    States of the paths read during a run.
+
+    The state of a path must be invalidated when Mackup changes it. It can be
+    used by applications processed concurrently.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty PathStateCache instance."""
+        self._states: dict[str, PathState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> PathState:
+        """
+        Return the state of a path, reading it the first time.
+
+        Args:
+            path (str)
+
+        Returns:
+            PathState
+        """
+        with self._lock:
+            state = self._states.get(path)
+        if state is None:
+            state = PathState.read(path)
+            with self._lock:
+                self._states[path] = state
+        return state
+
+    def invalidate(self, *paths: str) -> None:
+        """
+        Forget the state of paths, and of everything in them.
+
+        Args:
+            paths (str): Paths that have been changed
+        """
+        with self._lock:
+            for path in paths:
+                prefix = os.path.join(path, "")
+                for cached_path in [
+                    cached_path
+                    for cached_path in self._states
+                    if cached_path == path or cached_path.startswith(prefix)
+                ]:
+                    del self._states[cached_path]
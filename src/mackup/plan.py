@@ -0,0 +1,172 @@
+"""
+Plans of the actions run on the applications.
+
+An action is run on an application in two steps. ApplicationProfile first
+plans it: it reads the state of each configuration file and decides what to
+do with it. Nothing is changed, and nothing is asked. Then the plan is
+executed, asking the questions it holds.
+
+A plan is a list of operations on the configuration files of an application.
+With --dry-run, the plan is printed instead of being executed. With --plan,
+the plans of a run are written in a JSON file.
+"""
+
+import dataclasses
+import json
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+# Kinds of operations
+# Copy the source to the destination
+COPY = "copy"
+# Copy what changed from the source to the destination
+SYNC = "sync"
+# Move the source to the destination
+MOVE = "move"
+# Link the destination to the source
+LINK = "link"
+# Delete the destination
+DELETE = "delete"
+# Do nothing, see the reason
+SKIP = "skip"
+
+# Version of the format of the plan files, bump it on incompatible changes
+PLAN_FORMAT = 1
+
+
+@dataclass(frozen=True)
+class Operation:
+    """An operation planned on a configuration file of an application."""
+
+    # One of the kinds above
+    kind: str
+    # Path of the configuration file, relative to the home
+    filename: str
+    source: str | None = None
+    destination: str | None = None
+    # Why nothing is done, for SKIP
+    reason: str | None = None
+    # Asked before running the operations of the file, which are all skipped
+    # if the answer is no
+    question: str | None = None
+    # Printed before running the operation
+    message: str | None = None
+    # For LINK, whether the modes of the source are set
+    set_modes: bool = True
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Return the operation, ready to be written as JSON.
+
+        Returns:
+            dict
+        """
+        data: dict[str, Any] = {"kind": self.kind, "filename": self.filename}
+        for name in ("source", "destination", "reason", "question"):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.kind == LINK:
+            data["set_modes"] = self.set_modes
+        return data
+
+
+def get_paths(operations: Iterable[Operation]) -> set[str]:
+    """
+    Return the paths the operations change.
+
+    Args:
+        operations (iterable): Operations of a plan
+
+    Returns:
+        set of str
+    """
+    paths: set[str] = set()
+    for operation in operations:
+        if operation.kind != SKIP:
+            for path in (operation.source, operation.destination):
+                if path is not None:
+                    paths.add(path)
+    return paths
+
+
+def answer_questions(
+    operations: list[Operation], answers: dict[Operation, bool],
+) -> list[Operation]:
+    """
+    Return the operations, with their questions answered in advance.
+
+    The operations whose question has been answered yes are kept, without
+    their question. The operations on a file whose question has been answered
+    no are replaced by a SKIP.
+
+    Args:
+        operations (list): Operations of a plan
+        answers (dict): Answer to the question of each operation that has one
+
+    Returns:
+        list of Operation, with no question
+    """
+    declined_filenames: set[str] = {
+        operation.filename
+        for operation in operations
+        if operation.question is not None and not answers[operation]
+    }
+    answered: list[Operation] = []
+    for operation in operations:
+        if operation.filename in declined_filenames:
+            if operation.question is not None:
+                answered.append(
+                    Operation(SKIP, operation.filename, reason="not replaced"),
+                )
+        elif operation.question is not None:
+            answered.append(dataclasses.replace(operation, question=None))
+        else:
+            answered.append(operation)
+    return answered
+
+
+class Plan:
+    """
+    Plans of the actions of a run, for each application.
+
+    It can be used by applications processed concurrently.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty Plan instance."""
+        self._actions: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, app_name: str, action: str, operations: list[Operation]) -> None:
+        """
+        Add the plan of an action on an application.
+
+        Args:
+            app_name (str)
+            action (str): Name of the ApplicationProfile method planned
+            operations (list): The operations planned
+        """
+        with self._lock:
+            self._actions.append(
+                {
+                    "application": app_name,
+                    "action": action,
+                    "operations": [operation.to_dict() for operation in operations],
+                },
+            )
+
+    def save(self, path: str) -> None:
+        """
+        Write the plans as JSON.
+
+        Args:
+            path (str): Path of the JSON file
+        """
+        with self._lock:
+            data = {"format": PLAN_FORMAT, "actions": list(self._actions)}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
@@ -0,0 +1,163 @@
+"""
+Statistics of a run.
+
+When enabled with `mackup --stats json`, the primitives in utils, the path
+states and the loops of the application profiles count what they do. The
+counts are kept per application, and printed as JSON on stderr when the run
+ends, so that they can be fed to a metrics system.
+
+When statistics are disabled, counting costs a function call and a test.
+"""
+
+import contextlib
+import json
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from typing import Any, TextIO
+
+# Every counter, reported even when zero
+COUNTERS: tuple[str, ...] = (
+    # Configuration files considered by an action
+    "config_files",
+    # Files and folders walked while copying, see utils.sync()
+    "files_visited",
+    "folders_visited",
+    # Bytes of the files copied
+    "bytes_copied",
+    # Files hashed, when their hash was not in the hash index
+    "files_hashed",
+    # Files, folders and links deleted or put in the trash
+    "entries_deleted",
+    # Links created
+    "links_created",
+    # Questions asked, even if answered by --force or --force-no
+    "confirmations",
+    # Calls to stat() and lstat()
+    "stat_calls",
+    # Processes spawned
+    "subprocesses",
+)
+
+
+class Stats:
+    """
+    Counters of a run, per application.
+
+    What is done while an application is processed, see application(), is
+    counted for that application. It can be used by applications processed
+    concurrently.
+    """
+
+    def __init__(self) -> None:
+        """Create a Stats instance, starting the clock of the run."""
+        self._start: float = time.perf_counter()
+        self._counters: dict[str | None, Counter[str]] = {None: Counter()}
+        self._wall_times: dict[str, float] = {}
+        self._current = threading.local()
+        self._lock = threading.Lock()
+
+    def add(self, counter: str, count: int = 1) -> None:
+        """
+        Add to a counter of the application being processed.
+
+        Args:
+            counter (str): One of COUNTERS
+            count (int): What to add
+        """
+        app_name: str | None = getattr(self._current, "app_name", None)
+        with self._lock:
+            self._counters[app_name][counter] += count
+
+    @contextlib.contextmanager
+    def application(self, app_name: str) -> Iterator[None]:
+        """
+        Count what is done in the with block for an application.
+
+        Args:
+            app_name (str)
+        """
+        with self._lock:
+            self._counters.setdefault(app_name, Counter())
+        self._current.app_name = app_name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current.app_name = None
+            with self._lock:
+                self._wall_times[app_name] = (
+                    self._wall_times.get(app_name, 0.0)
+                    + time.perf_counter()
+                    - start
+                )
+
+    def get_report(self) -> dict[str, Any]:
+        """
+        Return the counters, per application and in total.
+
+        Returns:
+            dict, ready to be written as JSON
+        """
+        with self._lock:
+            total: Counter[str] = Counter()
+            applications: dict[str, dict[str, Any]] = {}
+            for app_name, counters in self._counters.items():
+                total.update(counters)
+                if app_name is not None:
+                    applications[app_name] = {
+                        **{counter: counters[counter] for counter in COUNTERS},
+                        "wall_time": round(self._wall_times.get(app_name, 0.0), 6),
+                    }
+
+        return {
+            "total": {
+                **{counter: total[counter] for counter in COUNTERS},
+                "wall_time": round(time.perf_counter() - self._start, 6),
+            },
+            "applications": dict(sorted(applications.items())),
+        }
+
+    def print_report(self, output: TextIO) -> None:
+        """
+        Print the counters as JSON.
+
+        Args:
+            output (TextIO): Where to print them
+        """
+        print(json.dumps(self.get_report(), indent=2), file=output)
+
+
+# Statistics of the current run, if enabled
+STATS: Stats | None = None
+
+
+def add(counter: str, count: int = 1) -> None:
+    """
+    Add to a counter of the application being processed, if enabled.
+
+    Args:
+        counter (str): One of COUNTERS
+        count (int): What to add
+    """
+    stats = STATS
+    if stats is not None:
+        stats.add(counter, count)
+
+
+@contextlib.contextmanager
+def application(app_name: str) -> Iterator[None]:
+    """
+    Count what is done in the with block for an application, if enabled.
+
+    Args:
+        app_name (str)
+    """
+    stats = STATS
+    if stats is None:
+        yield
+        return
+
+    with stats.application(app_name):
+        yield
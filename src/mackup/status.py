@@ -0,0 +1,102 @@
+"""
+Sync state of the configuration files.
+
+`mackup status` tells, for each configuration file of the applications, if it
+is linked to the Mackup folder, copied and in sync, and so on. Nothing is
+changed. Each side is read with a single lstat, and a link is compared with
+the Mackup path it should point to with a readlink. The content of the files
+is only read when both sides are real files or folders, to compare them, or
+when a file and its copy have the same size but not the same modification
+time.
+"""
+
+import os
+import stat
+
+from . import stats, utils
+
+# Statuses of a configuration file
+# The home file is a link to the Mackup file
+LINKED = "linked"
+# The home file is a copy of the Mackup file
+SYNCED = "synced"
+# The home file and the Mackup file differ
+DIVERGED = "diverged"
+# Only the Mackup file exists
+MISSING_IN_HOME = "missing in home"
+# Only the home file exists
+MISSING_IN_STORAGE = "missing in storage"
+# The home file is a link to nothing
+BROKEN_LINK = "broken link"
+
+# Every status, in the order they are summed up
+STATUSES: tuple[str, ...] = (
+    LINKED,
+    SYNCED,
+    DIVERGED,
+    MISSING_IN_HOME,
+    MISSING_IN_STORAGE,
+    BROKEN_LINK,
+)
+
+
+def _lstat(path: str) -> os.stat_result | None:
+    """Return the lstat of a path, or None if nothing is there or it can't be read."""
+    stats.add("stat_calls")
+    try:
+        return os.lstat(path)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return None
+
+
+def _exists(path: str) -> bool:
+    """Tell if a link points to something."""
+    stats.add("stat_calls")
+    return os.path.exists(path)
+
+
+def get_status(home_path: str, mackup_path: str, checksum: bool = False) -> str | None:
+    """
+    Tell the sync state of a configuration file.
+
+    Args:
+        home_path (str): Path of the file in the home
+        mackup_path (str): Path of its copy in the Mackup folder
+        checksum (bool): Compare the content of the files, instead of their
+                         size and modification time
+
+    Returns:
+        (str): One of STATUSES, or None if the file is on neither side
+    """
+    home_lstat = _lstat(home_path)
+    mackup_lstat = _lstat(mackup_path)
+
+    if home_lstat is not None and stat.S_ISLNK(home_lstat.st_mode):
+        target = os.path.join(os.path.dirname(home_path), os.readlink(home_path))
+        if os.path.normpath(target) == os.path.normpath(mackup_path):
+            return LINKED if mackup_lstat is not None else BROKEN_LINK
+        # A link to somewhere else is compared like a file, if it leads
+        # somewhere
+        if not _exists(home_path):
+            return BROKEN_LINK
+
+    if home_lstat is None:
+        return MISSING_IN_HOME if mackup_lstat is not None else None
+    if mackup_lstat is None:
+        return MISSING_IN_STORAGE
+
+    # Storage providers don't always keep the modification time of the files,
+    # so a file of the same size is compared chunk by chunk before telling
+    if utils.is_synced(home_path, mackup_path, checksum, prune=True) or (
+        not checksum and _is_same_file_content(home_path, mackup_path)
+    ):
+        return SYNCED
+    return DIVERGED
+
+
+def _is_same_file_content(home_path: str, mackup_path: str) -> bool:
+    """Tell if two files have the same content, whatever their modification time."""
+    # Imported here, as diff imports this module
+    from . import diff  # noqa: PLC0415
+
+    return diff.is_same_content(home_path, mackup_path, checksum=True)
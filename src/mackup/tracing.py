@@ -0,0 +1,157 @@
+"""
+Tracing of where Mackup spends its time.
+
+When enabled with `mackup --trace <file>`, timed spans are recorded around the
+config resolution, the loading of the applications, each action run for an
+application, each file operation and each spawned process. They are written in
+the Chrome trace event format, which Perfetto (https://ui.perfetto.dev) and
+chrome://tracing can open.
+
+When tracing is disabled, a span costs a function call and a test.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import Any, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class Tracer:
+    """
+    Recorder of the spans of a run.
+
+    It can be used by applications processed concurrently.
+    """
+
+    def __init__(self) -> None:
+        """Create a Tracer instance, starting the clock of the run."""
+        self._start_ns: int = time.perf_counter_ns()
+        self._events: list[dict[str, Any]] = []
+        self._thread_ids: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _get_thread_id(self) -> int:
+        """Return a small id for the current thread, naming it the first time."""
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._thread_ids:
+                self._thread_ids[ident] = len(self._thread_ids)
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": os.getpid(),
+                        "tid": self._thread_ids[ident],
+                        "args": {"name": threading.current_thread().name},
+                    },
+                )
+            return self._thread_ids[ident]
+
+    def add_span(
+        self, name: str, category: str, start_ns: int, args: dict[str, Any],
+    ) -> None:
+        """
+        Record a span that ended now.
+
+        Args:
+            name (str): What has been done
+            category (str): Kind of the span, e.g. "app" or "utils"
+            start_ns (int): time.perf_counter_ns() when it started
+            args (dict): Details shown with the span
+        """
+        end_ns = time.perf_counter_ns()
+        event: dict[str, Any] = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_ns - self._start_ns) / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": self._get_thread_id(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._events.append(event)
+
+    def save(self, path: str) -> None:
+        """
+        Write the recorded spans as a Chrome trace event file.
+
+        Args:
+            path (str): Path of the JSON file
+        """
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# Tracer of the current run, if tracing is enabled
+TRACER: Tracer | None = None
+
+
+@contextlib.contextmanager
+def span(name: str, category: str, **args: Any) -> Iterator[None]:
+    """
+    Record how long the code in the with block takes.
+
+    Args:
+        name (str): What is being done
+        category (str): Kind of the span, e.g. "app" or "utils"
+        args: Details shown with the span, converted to str
+    """
+    tracer = TRACER
+    if tracer is None:
+        yield
+        return
+
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        tracer.add_span(
+            name, category, start_ns, {key: str(value) for key, value in args.items()},
+        )
+
+
+def traced(category: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Record a span for each call of the decorated function.
+
+    The span is named after the function, and shows its positional arguments
+    that are strings, like paths.
+
+    Args:
+        category (str): Kind of the spans, e.g. "utils"
+
+    Returns:
+        The decorator
+    """
+
+    def decorator(function: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if TRACER is None:
+                return function(*args, **kwargs)
+            with span(
+                function.__name__,
+                category,
+                **{
+                    f"arg{i}": arg
+                    for i, arg in enumerate(args)
+                    if isinstance(arg, str)
+                },
+            ):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
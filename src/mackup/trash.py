@@ -0,0 +1,228 @@
+"""
+Trash of the files and folders deleted by Mackup.
+
+Instead of being removed, the files and folders Mackup deletes or replaces in
+the home are renamed into a trash folder, one per run, so that `mackup undo`
+can put them back. Renaming is atomic and as fast for a big folder as for a
+file. The copies in the Mackup folder are not kept, as each backup would
+otherwise keep a copy of every application. The oldest runs are removed from
+the trash after each run that can delete files, and `mackup purge` empties it.
+"""
+
+import errno
+import json
+import os
+import stat
+import threading
+import time
+
+from .constants import TRASH_DIR, TRASH_RUNS_TO_KEEP
+
+# Name of the file listing the content of a run in the trash, one JSON object
+# per line, appended to as files are put in the trash
+INDEX_FILE = "index.jsonl"
+
+# Mode of the trash and of its runs, as they keep the files of the user
+FOLDER_MODE = stat.S_IRWXU
+
+
+class Trash:
+    """
+    Files and folders deleted during a run.
+
+    Each of them is renamed into the run folder, which is only created when
+    the first one is put there. It can be used by applications processed
+    concurrently.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Create a Trash instance.
+
+        Args:
+            path (str): Folder of the run in the trash
+        """
+        self.path: str = path
+        self._entries: list[dict[str, str]] = self._read()
+        # Folders whose content is not put in the trash, see ignore_folder()
+        self._ignored_folders: set[str] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def new_run(cls) -> "Trash":
+        """
+        Return the trash of a new run.
+
+        Returns:
+            Trash
+        """
+        # Runs are sorted by name
+        now = time.time()
+        name = (
+            time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+            + f".{int(now % 1 * 1_000_000):06d}Z-{os.getpid()}"
+        )
+        return cls(os.path.join(get_trash_dir(), name))
+
+    def _read(self) -> list[dict[str, str]]:
+        """Read the index of the run, if any."""
+        entries: list[dict[str, str]] = []
+        try:
+            with open(os.path.join(self.path, INDEX_FILE), encoding="utf-8") as f:
+                entries.extend(json.loads(line) for line in f)
+        except OSError:
+            return []
+        except ValueError:
+            # The run has been interrupted while writing the last line
+            pass
+        return entries
+
+    def _append(self, entry: dict[str, str]) -> None:
+        """Add an entry to the index of the run."""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        with open(index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._entries.append(entry)
+
+    def ignore_folder(self, path: str) -> None:
+        """
+        Don't put what is in a folder in the trash, it is removed instead.
+
+        Args:
+            path (str): Absolute path of the folder
+        """
+        with self._lock:
+            self._ignored_folders.add(os.path.abspath(path))
+
+    def _is_ignored(self, path: str) -> bool:
+        """Tell if a path is in an ignored folder."""
+        return any(
+            path == folder or path.startswith(folder + os.sep)
+            for folder in self._ignored_folders
+        )
+
+    def get_paths(self) -> list[str]:
+        """
+        Return the original paths of what is in the trash of the run.
+
+        Returns:
+            list of str, in the order they have been put in the trash.
+        """
+        return [entry["path"] for entry in self._entries]
+
+    def put(self, path: str) -> bool:
+        """
+        Move a file or folder into the trash.
+
+        Args:
+            path (str): Absolute path of the file or folder
+
+        Returns:
+            (boolean): False if it is not put in the trash, when it is in an
+                       ignored folder or on another file system
+        """
+        path = os.path.abspath(path)
+        if not os.path.lexists(path):
+            return False
+
+        with self._lock:
+            if self._is_ignored(path):
+                return False
+            self._make_folder()
+            name = str(len(self._entries))
+            try:
+                os.rename(path, os.path.join(self.path, name))
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    return False
+                raise
+
+            self._append({"path": path, "name": name})
+
+        return True
+
+    def _make_folder(self) -> None:
+        """Create the folder of the run, and the trash, if needed."""
+        if os.path.isdir(self.path):
+            return
+        os.makedirs(os.path.dirname(self.path), mode=FOLDER_MODE, exist_ok=True)
+        os.makedirs(self.path, mode=FOLDER_MODE, exist_ok=True)
+
+    def restore(self, trash: "Trash") -> list[str]:
+        """
+        Put back everything in the trash of the run, in its original place.
+
+        What is in the way is put in another trash, so that it can be put back
+        too.
+
+        Args:
+            trash (Trash): Where to put what is in the way
+
+        Returns:
+            list of str: The paths put back
+        """
+        restored: list[str] = []
+        for entry in reversed(self._entries):
+            path = entry["path"]
+            if os.path.lexists(path) and not trash.put(path):
+                # Can't happen, as path is on the file system of the trash
+                raise OSError(errno.EXDEV, "Can't put in the trash", path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.rename(os.path.join(self.path, entry["name"]), path)
+            restored.append(path)
+
+        # Only imported when needed, as it is slow to import
+        import shutil  # noqa: PLC0415
+
+        shutil.rmtree(self.path)
+        self._entries = []
+        return restored
+
+
+def get_trash_dir() -> str:
+    """
+    Return the path of the trash.
+
+    It lives in $XDG_DATA_HOME, ~/.local/share by default.
+
+    Returns:
+        str
+    """
+    xdg_data_home: str = os.environ.get(
+        "XDG_DATA_HOME", os.path.join(os.environ["HOME"], ".local", "share"),
+    )
+    return os.path.join(xdg_data_home, TRASH_DIR)
+
+
+def get_runs() -> list[Trash]:
+    """
+    Return the runs in the trash.
+
+    Returns:
+        list of Trash, the oldest first.
+    """
+    trash_dir = get_trash_dir()
+    try:
+        names = sorted(os.listdir(trash_dir))
+    except FileNotFoundError:
+        return []
+    return [Trash(os.path.join(trash_dir, name)) for name in names]
+
+
+def purge(runs_to_keep: int = TRASH_RUNS_TO_KEEP) -> int:
+    """
+    Remove the oldest runs from the trash.
+
+    Args:
+        runs_to_keep (int): Number of runs to keep, 0 to empty the trash
+
+    Returns:
+        (int): Number of runs removed
+    """
+    runs = get_runs()
+    runs_to_remove = runs[: max(len(runs) - runs_to_keep, 0)]
+    import shutil  # noqa: PLC0415
+
+    for run in runs_to_remove:
+        shutil.rmtree(run.path)
+    return len(runs_to_remove)
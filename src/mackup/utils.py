@@ -1,17 +1,22 @@
 """System static utilities being used by the modules."""
 
-import base64
-import binascii
+import contextlib
+import errno
+import fcntl
+import io
 import os
 import platform
-import shutil
-import sqlite3
 import stat
-import subprocess
+import struct
 import sys
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
 from typing import NoReturn
 
-from . import constants
+from . import constants, stats, tracing
+from .hashindex import HashIndex, hash_file
+from .trash import Trash
 
 # Flag that controls how user confirmation works.
 # If True, the user wants to say "yes" to everything.
@@ -22,6 +27,14 @@ FORCE_NO: bool = False
 # Flag that control if mackup can be run as root
 CAN_RUN_AS_ROOT: bool = False
 
+# Where deleted files and folders are put, so that they can be restored. If
+# None, they are removed.
+TRASH: Trash | None = None
+
+# Where the hashes of the files are kept from one run to another. If None,
+# files are hashed each time.
+HASH_INDEX: HashIndex | None = None
+
 
 def confirm(question: str) -> bool:
     """
@@ -33,47 +46,180 @@ def confirm(question: str) -> bool:
     Returns:
         (boolean): Confirmed or not
     """
+    stats.add("confirmations")
     if FORCE_YES:
         return True
     if FORCE_NO:
         return False
 
-    while True:
-        answer: str = input(question + " <Yes|No> ").lower()
+    # Applications processed concurrently ask their questions one at a time
+    with _CONFIRM_LOCK:
+        while True:
+            answer: str = input(question + " <Yes|No> ").lower()
 
-        if answer in {"yes", "y"}:
-            confirmed: bool = True
-            break
-        if answer in {"no", "n"}:
-            confirmed = False
-            break
+            if answer in {"yes", "y"}:
+                confirmed: bool = True
+                break
+            if answer in {"no", "n"}:
+                confirmed = False
+                break
 
     return confirmed
 
 
+def confirm_all(question: str) -> bool | None:
+    """
+    Ask the user if he really wants several things to happen, all at once.
+
+    Args:
+        question(str): What can happen
+
+    Returns:
+        (boolean): Confirmed for all of them or not, or None if the user wants
+                   to be asked for each of them
+    """
+    stats.add("confirmations")
+    if FORCE_YES:
+        return True
+    if FORCE_NO:
+        return False
+
+    with _CONFIRM_LOCK:
+        while True:
+            answer: str = input(question + " <Yes|No|Select> ").lower()
+
+            if answer in {"yes", "y"}:
+                return True
+            if answer in {"no", "n"}:
+                return False
+            if answer in {"select", "s"}:
+                return None
+
+
+_CONFIRM_LOCK = threading.Lock()
+
+
+@tracing.traced("utils")
 def delete(filepath: str) -> None:
     """
     Delete the given file, directory or link.
 
-    It Should support undelete later on.
+    If there is a TRASH, it is moved there instead, unless it is on another
+    file system.
 
     Args:
         filepath (str): Absolute full path to a file. e.g. /path/to/file
     """
-    # Some files have ACLs, let's remove them recursively
-    remove_acl(filepath)
+    stats.add("entries_deleted")
 
-    # Some files have immutable attributes, let's remove them recursively
-    remove_immutable_attribute(filepath)
+    # Some files have ACLs or immutable attributes, let's remove them
+    # recursively
+    clear_attributes([filepath])
+
+    # Keep it in the trash, so that it can be put back
+    if TRASH is not None and TRASH.put(filepath):
+        return
 
     # Finally remove the files and folders
     if os.path.isfile(filepath) or os.path.islink(filepath):
         os.remove(filepath)
     elif os.path.isdir(filepath):
+        # Only imported when needed, as it is slow to import
+        import shutil  # noqa: PLC0415
+
         shutil.rmtree(filepath)
 
 
-def copy(src: str, dst: str) -> None:
+@tracing.traced("utils")
+def move(src: str, dst: str) -> None:
+    """
+    Move a file or a folder from src to dst, replacing dst if it exists.
+
+    Same rules as copy() for src and dst, and dst ends up the same as with
+    copy() then delete(). On the same file system, the move is an atomic
+    rename. Otherwise, or if src is or contains links, which copy() follows,
+    src is copied then deleted.
+
+    Args:
+        src (str): Source file or folder
+        dst (str): Destination file or folder
+    """
+    assert isinstance(src, str)
+    assert os.path.exists(src)
+    assert isinstance(dst, str)
+
+    # Create the path to the dst file if it does not exist
+    abs_path = os.path.dirname(os.path.abspath(dst))
+    if not os.path.isdir(abs_path):
+        os.makedirs(abs_path, exist_ok=True)
+    # copy() would merge src into what is left of dst
+    if os.path.lexists(dst):
+        delete(dst)
+
+    if not os.path.islink(src) and not _contains_links(src):
+        # Some files have ACLs or immutable attributes, which would follow them
+        clear_attributes([src])
+        try:
+            os.rename(src, dst)
+        except OSError as e:
+            # src and dst are not on the same file system
+            if e.errno != errno.EXDEV:
+                raise
+        else:
+            chmod(dst)
+            return
+
+    copy(src, dst)
+    delete(src)
+
+
+def _contains_links(path: str) -> bool:
+    """Tell if there is any link in a folder, recursively."""
+    if not os.path.isdir(path):
+        return False
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_symlink():
+                return True
+            if entry.is_dir() and _contains_links(entry.path):
+                return True
+
+    return False
+
+
+@dataclass(frozen=True)
+class SyncedEntry:
+    """A file or folder of dst, as sync() left it."""
+
+    is_dir: bool
+    mode: int
+    # 0 for folders
+    size: int
+    # 0 for folders, whose modification time changes as they are filled
+    mtime_ns: int
+
+
+@dataclass
+class SyncResult:
+    """Number of files and folders handled by sync()."""
+
+    copied: int = 0
+    skipped: int = 0
+    removed: int = 0
+    # Number of files copied with each strategy, see copy_file()
+    strategies: dict[str, int] = field(default_factory=dict, compare=False)
+    # What dst is made of, by path, if asked for
+    entries: dict[str, SyncedEntry] | None = field(default=None, compare=False)
+
+    @property
+    def changed(self) -> int:
+        """Number of files and folders copied or removed."""
+        return self.copied + self.removed
+
+
+@tracing.traced("utils")
+def copy(src: str, dst: str, record_entries: bool = False) -> SyncResult:
     """
     Copy a file or a folder (recursively) from src to dst.
 
@@ -87,10 +233,66 @@ def copy(src: str, dst: str) -> None:
     But not: copy('/path/to/src_file', 'path/to/')
     or copy('/path/to/src_folder/', '/path/to/dst_folder')
 
+    Files already in dst are replaced, and files in dst but not in src are
+    kept. See sync() to only copy what changed.
+
     Args:
         src (str): Source file or folder
         dst (str): Destination file or folder
+        record_entries (bool): Return the files and folders written in dst
+
+    Returns:
+        (SyncResult): What has been copied
     """
+    return _walk(
+        src,
+        dst,
+        _SyncWalk(checksum=False, prune=False, dry_run=False),
+        record_entries,
+    )
+
+
+@tracing.traced("utils")
+def sync(
+    src: str,
+    dst: str,
+    checksum: bool = False,
+    prune: bool = True,
+    record_entries: bool = False,
+) -> SyncResult:
+    """
+    Make dst a copy of the src file or folder, only rewriting what changed.
+
+    Both trees are walked side by side. Files are compared on their size and
+    modification time, or on their content if checksum is True. Copied files
+    keep the modification time of their source, so that they compare equal on
+    the next run. Copied files get the 0600 mode, and folders 0700.
+
+    Same rules as copy() for src and dst.
+
+    Args:
+        src (str): Source file or folder
+        dst (str): Destination file or folder
+        checksum (bool): Compare the content of the files
+        prune (bool): Remove the files and folders of dst not in src
+        record_entries (bool): Return the files and folders of dst, so that
+                               they don't need to be read again
+
+    Returns:
+        (SyncResult): What has been copied, skipped and removed
+    """
+    return _walk(
+        src,
+        dst,
+        _SyncWalk(checksum, prune, dry_run=False, skip_unchanged=True),
+        record_entries,
+    )
+
+
+def _walk(
+    src: str, dst: str, walk: "_SyncWalk", record_entries: bool,
+) -> SyncResult:
+    """Run a walk from src to dst, see copy() and sync()."""
     assert isinstance(src, str)
     assert os.path.exists(src)
     assert isinstance(dst, str)
@@ -98,26 +300,315 @@ def copy(src: str, dst: str) -> None:
     # Create the path to the dst file if it does not exist
     abs_path = os.path.dirname(os.path.abspath(dst))
     if not os.path.isdir(abs_path):
-        os.makedirs(abs_path)
+        os.makedirs(abs_path, exist_ok=True)
 
-    # We need to copy a single file
-    if os.path.isfile(src):
-        # Copy the src file to dst
-        shutil.copy(src, dst)
+    if record_entries:
+        walk.result.entries = {}
+    walk.sync(src, dst)
+    return walk.result
 
-    # We need to copy a whole folder
-    elif os.path.isdir(src):
-        shutil.copytree(src, dst, dirs_exist_ok=True, copy_function=shutil.copy)
 
-    # What the heck is this?
-    else:
-        raise ValueError(f"Unsupported file: {src}")
+def is_synced(
+    src: str, dst: str, checksum: bool = False, prune: bool = True,
+) -> bool:
+    """
+    Tell if dst is already a copy of the src file or folder.
+
+    Args:
+        src (str): Source file or folder
+        dst (str): Destination file or folder
+        checksum (bool): Compare the content of the files
+        prune (bool): Whether files and folders of dst not in src count
+
+    Returns:
+        (boolean): True if sync(src, dst) would not change anything
+    """
+    assert isinstance(src, str)
+    assert os.path.exists(src)
+    assert isinstance(dst, str)
+
+    walk = _SyncWalk(checksum, prune, dry_run=True, skip_unchanged=True)
+    walk.sync(src, dst)
+    return not walk.result.changed
+
+
+def file_hash(path: str, stat_result: os.stat_result | None = None) -> str:
+    """
+    Compute the SHA-256 digest of the content of a file.
+
+    If there is a HASH_INDEX, the file is only read if it changed since it was
+    last hashed.
+
+    Args:
+        path (str): File to read
+        stat_result (os.stat_result): os.stat() of the file, if known
+
+    Returns:
+        (str): Hexadecimal digest
+    """
+    hash_index = HASH_INDEX
+    if hash_index is not None:
+        return hash_index.get_hash(path, stat_result)
+
+    return hash_file(path).hex()
+
+# Modes given to the files and folders copied by Mackup
+FILE_MODE = stat.S_IRUSR | stat.S_IWUSR
+FOLDER_MODE = stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR
+
+
+class _SyncWalk:
+    """
+    Walk of src and dst side by side, syncing dst with src. See sync().
+
+    If dry_run is True, nothing is written and the walk stops at the first
+    change found. Unless skip_unchanged is True, every file is copied.
+    """
 
-    # Set the good mode to the file or folder recursively
-    chmod(dst)
+    def __init__(
+        self,
+        checksum: bool,
+        prune: bool,
+        dry_run: bool,
+        skip_unchanged: bool = False,
+    ) -> None:
+        self.checksum: bool = checksum
+        self.prune: bool = prune
+        self.dry_run: bool = dry_run
+        self.skip_unchanged: bool = skip_unchanged
+        self.result: SyncResult = SyncResult()
+
+    def sync(self, src: str, dst: str) -> None:
+        # Like shutil.copytree(), follow the links found in src
+        src_stat = os.stat(src)
+        try:
+            dst_stat: os.stat_result | None = os.lstat(dst)
+        except FileNotFoundError:
+            dst_stat = None
+        stats.add("stat_calls", 2)
+
+        if stat.S_ISDIR(src_stat.st_mode):
+            stats.add("folders_visited")
+            self._sync_folder(src, dst, dst_stat)
+            return
+
+        stats.add("files_visited")
+
+        if not stat.S_ISREG(src_stat.st_mode):
+            raise ValueError(f"Unsupported file: {src}")
+
+        if (
+            self.skip_unchanged
+            and dst_stat is not None
+            and _is_same_file(src, src_stat, dst, dst_stat, self.checksum)
+        ):
+            if not self.dry_run:
+                _set_mode(dst, dst_stat, FILE_MODE)
+            self._record(dst, dst_stat)
+            self.result.skipped += 1
+            return
+
+        if not self.dry_run:
+            if dst_stat is not None and not stat.S_ISREG(dst_stat.st_mode):
+                delete(dst)
+                dst_stat = None
+            strategy = copy_file(src, dst, FILE_MODE)
+            stats.add("bytes_copied", src_stat.st_size)
+            self.result.strategies[strategy] = (
+                self.result.strategies.get(strategy, 0) + 1
+            )
+            # Existing files keep their mode
+            if dst_stat is not None:
+                _set_mode(dst, dst_stat, FILE_MODE)
+            elif FILE_MODE & _UMASK:
+                os.chmod(dst, FILE_MODE)
+            os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+            self._record(dst, src_stat)
+        self.result.copied += 1
+
+    def _record(self, dst: str, stat_result: os.stat_result | None) -> None:
+        """Record what dst is, a file like stat_result or else a folder."""
+        entries = self.result.entries
+        if entries is None:
+            return
+        if stat_result is None:
+            entries[dst] = SyncedEntry(True, FOLDER_MODE, 0, 0)
+        else:
+            entries[dst] = SyncedEntry(
+                False, FILE_MODE, stat_result.st_size, stat_result.st_mtime_ns,
+            )
 
+    def _sync_folder(
+        self, src: str, dst: str, dst_stat: os.stat_result | None,
+    ) -> None:
+        stale_names: set[str] = set()
+        if dst_stat is not None and stat.S_ISDIR(dst_stat.st_mode):
+            if not self.dry_run:
+                _set_mode(dst, dst_stat, FOLDER_MODE)
+            if self.prune:
+                stale_names.update(os.listdir(dst))
+            self.result.skipped += 1
+        else:
+            self.result.copied += 1
+            if self.dry_run:
+                return
+            if dst_stat is not None:
+                delete(dst)
+            _mkdir(dst, FOLDER_MODE)
+        self._record(dst, None)
+
+        with os.scandir(src) as entries:
+            for entry in entries:
+                # Skip the broken links, there is nothing to copy
+                if entry.is_symlink() and not os.path.exists(entry.path):
+                    continue
+                stale_names.discard(entry.name)
+                self.sync(entry.path, os.path.join(dst, entry.name))
+                if self.dry_run and self.result.changed:
+                    return
+
+        for name in stale_names:
+            self.result.removed += 1
+            if self.dry_run:
+                return
+            delete(os.path.join(dst, name))
+
+
+def copy_file(src: str, dst: str, mode: int = 0o666) -> str:
+    """
+    Copy the content of the src file to dst, the fastest way available.
+
+    On Linux, the copy is done by the kernel, trying in order:
+      - a reflink clone (FICLONE), sharing the data blocks on btrfs or XFS
+      - os.copy_file_range(), which may also clone the data
+      - os.sendfile()
+    Else, or if none of them is supported, shutil.copyfile() is used.
+
+    Args:
+        src (str): Source file
+        dst (str): Destination file, replaced if it exists
+        mode (int): Mode of dst if it is created, like for os.open()
 
-def link(target: str, link_to: str) -> None:
+    Returns:
+        (str): Strategy used, "reflink", "copy_file_range", "sendfile" or
+               "shutil"
+    """
+    with open(src, "rb") as src_file, _open_for_writing(dst, mode) as dst_file:
+        if platform.system() == constants.PLATFORM_LINUX:
+            strategy = _copy_file_in_kernel(src_file.fileno(), dst_file.fileno())
+            if strategy is not None:
+                return strategy
+
+    # dst now exists with the right mode, which shutil keeps
+    import shutil  # noqa: PLC0415
+
+    shutil.copyfile(src, dst)
+    return "shutil"
+
+
+# Errors telling that a way of copying a file is not supported for a given
+# pair of files
+UNSUPPORTED_COPY_ERRNOS: frozenset[int] = frozenset(
+    {
+        errno.EINVAL,
+        errno.ENOSYS,
+        errno.ENOTSUP,
+        errno.EOPNOTSUPP,
+        errno.ENOTTY,
+        errno.EXDEV,
+    },
+)
+
+# Number of bytes copied at a time by the kernel
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# ioctl(2) request cloning a file on Linux, see ioctl_ficlone(2). It is encoded
+# as _IOW(0x94, 9, int), using the asm-generic encoding.
+FICLONE: int = (1 << 30) | (struct.calcsize("i") << 16) | (0x94 << 8) | 9
+
+
+def _open_for_writing(path: str, mode: int) -> io.BufferedWriter:
+    """Open a file for writing like open(path, "wb"), creating it with mode."""
+    return open(path, "wb", opener=lambda p, flags: os.open(p, flags, mode))
+
+
+def _copy_file_in_kernel(src_fd: int, dst_fd: int) -> str | None:
+    """Copy a file without reading it in userspace, see copy_file()."""
+    for strategy, copy_data in _get_kernel_copies():
+        try:
+            copy_data(src_fd, dst_fd)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_COPY_ERRNOS:
+                raise
+            # Start over with the next strategy
+            os.lseek(src_fd, 0, os.SEEK_SET)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+            os.ftruncate(dst_fd, 0)
+            continue
+        return strategy
+
+    return None
+
+
+def _mkdir(path: str, mode: int) -> None:
+    """Create a folder with the given mode, whatever the umask."""
+    os.mkdir(path, mode)
+    if mode & _UMASK:
+        os.chmod(path, mode)
+
+
+def _get_umask() -> int:
+    # The umask can only be read by changing it, do it once, when imported
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK: int = _get_umask()
+
+
+def _get_kernel_copies() -> list[tuple[str, Callable[[int, int], None]]]:
+    """Return the ways to copy a file in the kernel, fastest first."""
+    kernel_copies: list[tuple[str, Callable[[int, int], None]]] = []
+    if _can_ioctl_clone():
+        kernel_copies.append(("reflink", _reflink))
+    if hasattr(os, "copy_file_range"):
+        kernel_copies.append(("copy_file_range", _copy_file_range))
+    kernel_copies.append(("sendfile", _sendfile))
+    return kernel_copies
+
+
+def _reflink(src_fd: int, dst_fd: int) -> None:
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd: int, dst_fd: int) -> None:
+    while os.copy_file_range(src_fd, dst_fd, COPY_CHUNK_SIZE):
+        pass
+
+
+def _sendfile(src_fd: int, dst_fd: int) -> None:
+    offset = 0
+    while sent := os.sendfile(dst_fd, src_fd, offset, COPY_CHUNK_SIZE):
+        offset += sent
+
+
+def _is_same_file(
+    src: str,
+    src_stat: os.stat_result,
+    dst: str,
+    dst_stat: os.stat_result,
+    checksum: bool,
+) -> bool:
+    if not stat.S_ISREG(dst_stat.st_mode) or src_stat.st_size != dst_stat.st_size:
+        return False
+    if checksum:
+        return file_hash(src, src_stat) == file_hash(dst, dst_stat)
+    return src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+
+@tracing.traced("utils")
+def link(target: str, link_to: str, set_modes: bool = True) -> None:
     """
     Create a link to a target file or a folder.
 
@@ -133,6 +624,8 @@ def link(target: str, link_to: str) -> None:
     Args:
         target (str): file or folder the link will point to
         link_to (str): Link to create
+        set_modes (bool): Set the mode of the target recursively, see chmod().
+                          Not needed if the target has just been copied.
     """
     assert isinstance(target, str)
     assert os.path.exists(target)
@@ -141,20 +634,24 @@ def link(target: str, link_to: str) -> None:
     # Create the path to the link if it does not exist
     abs_path = os.path.dirname(os.path.abspath(link_to))
     if not os.path.isdir(abs_path):
-        os.makedirs(abs_path)
+        os.makedirs(abs_path, exist_ok=True)
 
     # Make sure the file or folder recursively has the good mode
-    chmod(target)
+    if set_modes:
+        chmod(target)
 
     # Create the link to target
     os.symlink(target, link_to)
+    stats.add("links_created")
 
 
+@tracing.traced("utils")
 def chmod(target: str) -> None:
     """
     Recursively set the chmod for files to 0600 and 0700 for folders.
 
-    It's ok unless we need something more specific.
+    It's ok unless we need something more specific. Entries which already have
+    the good mode are left untouched.
 
     Args:
         target (str): Root file or folder
@@ -162,40 +659,54 @@ def chmod(target: str) -> None:
     assert isinstance(target, str)
     assert os.path.exists(target)
 
-    file_mode = stat.S_IRUSR | stat.S_IWUSR
-    folder_mode = stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR
-
     # Remove the immutable attribute recursively if there is one
-    remove_immutable_attribute(target)
-
-    if os.path.isfile(target):
-        os.chmod(target, file_mode)
-
-    elif os.path.isdir(target):
-        # chmod the root item
-        os.chmod(target, folder_mode)
-
-        # chmod recursively in the folder it it's one
-        for root, dirs, files in os.walk(target):
-            for cur_dir in dirs:
-                os.chmod(os.path.join(root, cur_dir), folder_mode)
-            for cur_file in files:
-                fullpath = os.path.join(root, cur_file)
-                try:
-                    os.chmod(fullpath, file_mode)
-                except FileNotFoundError:
-                    # A broken symlink (e.g. a link restored before its
-                    # target) is listed by os.walk but can't be followed by
-                    # os.chmod. Skip it instead of crashing; re-raise for
-                    # real missing regular files.
-                    if os.path.islink(fullpath):
-                        continue
-                    raise
+    if not _are_attributes_cleared(target):
+        remove_immutable_attribute(target)
+
+    target_stat = os.stat(target)
+    stats.add("stat_calls")
+    if stat.S_ISREG(target_stat.st_mode):
+        _set_mode(target, target_stat, FILE_MODE)
+
+    elif stat.S_ISDIR(target_stat.st_mode):
+        # chmod the root item, then recursively in the folder
+        _set_mode(target, target_stat, FOLDER_MODE)
+        _chmod_tree(target)
 
     else:
         raise ValueError(f"Unsupported file type: {target}")
 
 
+def _chmod_tree(path: str) -> None:
+    """Set the mode of everything in a folder, see chmod()."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            stats.add("stat_calls")
+            try:
+                entry_stat = entry.stat()
+            except FileNotFoundError:
+                # A broken symlink (e.g. a link restored before its target)
+                # can't be followed. Skip it instead of crashing; re-raise for
+                # real missing regular files.
+                if entry.is_symlink():
+                    continue
+                raise
+
+            if stat.S_ISDIR(entry_stat.st_mode):
+                _set_mode(entry.path, entry_stat, FOLDER_MODE)
+                # Like os.walk(), don't follow the links to folders
+                if not entry.is_symlink():
+                    _chmod_tree(entry.path)
+            else:
+                _set_mode(entry.path, entry_stat, FILE_MODE)
+
+
+def _set_mode(path: str, stat_result: os.stat_result, mode: int) -> None:
+    """Set the mode of a file or folder, unless it already has it."""
+    if stat.S_IMODE(stat_result.st_mode) != mode:
+        os.chmod(path, mode)
+
+
 def error(message: str) -> NoReturn:
     """
     Throw an error with the given message and immediately quit.
@@ -215,6 +726,9 @@ def get_dropbox_folder_location() -> str:
     Returns:
         (str) Full path to the current Dropbox folder
     """
+    import base64  # noqa: PLC0415
+    import binascii  # noqa: PLC0415
+
     host_db_path = os.path.join(os.environ["HOME"], ".dropbox/host.db")
     min_host_db_fields = 2
     try:
@@ -242,6 +756,8 @@ def get_google_drive_folder_location() -> str:
     Returns:
         (str) Full path to the current Google Drive folder
     """
+    import sqlite3  # noqa: PLC0415
+
     gdrive_db_path = "Library/Application Support/Google/Drive/sync_config.db"
     yosemite_gdrive_db_path = (
         "Library/Application Support/Google/Drive/user_default/sync_config.db"
@@ -314,7 +830,13 @@ def is_process_running(process_name: str) -> bool:
 
     # On systems with pgrep, check if the given process is running
     if os.path.isfile("/usr/bin/pgrep"):
-        with open(os.devnull, "wb") as dev_null:
+        import subprocess  # noqa: PLC0415
+
+        with (
+            open(os.devnull, "wb") as dev_null,
+            tracing.span("pgrep", "subprocess", process_name=process_name),
+        ):
+            stats.add("subprocesses")
             returncode: int = subprocess.call(
                 ["/usr/bin/pgrep", process_name], stdout=dev_null,
             )
@@ -323,47 +845,289 @@ def is_process_running(process_name: str) -> bool:
     return is_running
 
 
-def remove_acl(path: str) -> None:
+def clear_attributes(paths: Iterable[str]) -> None:
     """
-    Remove the ACL of the file or folder located on the given path.
+    Remove the ACLs and the immutable attribute of many paths at once.
 
-    Also remove the ACL of any file and folder below the given one,
-    recursively.
+    Each path is handled recursively, and paths that don't exist are ignored.
+    External tools, when needed, are run once for the whole batch instead of
+    once per path.
+
+    Until the end of the current batched_attribute_clearing() context, paths
+    already cleared, and every path below them, are not cleared again by
+    delete() and chmod().
 
     Args:
-        path (str): Path to the file or folder to remove the ACL for,
-                    recursively.
+        paths (iterable): Paths to the files and folders to clear
     """
+    paths_to_clear: list[str] = [
+        path
+        for path in dict.fromkeys(paths)
+        if not _are_attributes_cleared(path) and os.path.lexists(path)
+    ]
+    if not paths_to_clear:
+        return
+
     # Some files have ACLs, let's remove them recursively
-    if platform.system() == constants.PLATFORM_DARWIN and os.path.isfile("/bin/chmod"):
-        subprocess.call(["/bin/chmod", "-R", "-N", path])
-    elif (platform.system() == constants.PLATFORM_LINUX) and os.path.isfile(
-        "/bin/setfacl",
-    ):
-        subprocess.call(["/bin/setfacl", "-R", "-b", path])
+    remove_acl(*paths_to_clear)
+
+    # Some files have immutable attributes, let's remove them recursively
+    remove_immutable_attribute(*paths_to_clear)
+
+    if _CLEARED_PATHS is not None:
+        _CLEARED_PATHS.update(paths_to_clear)
+
+
+@contextlib.contextmanager
+def batched_attribute_clearing(paths: Iterable[str]) -> Iterator[None]:
+    """
+    Clear the attributes of every path a run will touch, in one batch.
+
+    See clear_attributes(). Within the context, delete() and chmod() skip the
+    paths that have been cleared.
+
+    Args:
+        paths (iterable): Paths to the files and folders to clear
+    """
+    global _CLEARED_PATHS  # noqa: PLW0603
+    _CLEARED_PATHS = set()
+    try:
+        clear_attributes(paths)
+        yield
+    finally:
+        _CLEARED_PATHS = None
+
+
+# Paths whose attributes have been cleared in the current batch, if any
+_CLEARED_PATHS: set[str] | None = None
+
+
+def _are_attributes_cleared(path: str) -> bool:
+    """Return True if the path, or a folder above it, has already been cleared."""
+    if not _CLEARED_PATHS:
+        return False
+
+    while True:
+        if path in _CLEARED_PATHS:
+            return True
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+
 
+def remove_acl(*paths: str) -> None:
+    """
+    Remove the ACL of the files or folders located on the given paths.
 
-def remove_immutable_attribute(path: str) -> None:
+    Also remove the ACL of any file and folder below the given ones,
+    recursively.
+
+    Args:
+        paths (str): Paths to the files or folders to remove the ACL for,
+                     recursively.
+    """
+    # Some files have ACLs, let's remove them recursively
+    if platform.system() == constants.PLATFORM_DARWIN and os.path.isfile("/bin/chmod"):
+        _call_batched(["/bin/chmod", "-R", "-N"], paths)
+    elif platform.system() == constants.PLATFORM_LINUX:
+        if hasattr(os, "listxattr"):
+            # Like setfacl, follow the given paths if they're links, but not
+            # the links found below them
+            for path in paths:
+                for entry_path in _walk_tree(os.path.realpath(path)):
+                    _remove_posix_acl(entry_path)
+        elif os.path.isfile("/bin/setfacl"):
+            _call_batched(["/bin/setfacl", "-R", "-b"], paths)
+
+
+def remove_immutable_attribute(*paths: str) -> None:
     """
-    Remove the immutable attribute of the given path.
+    Remove the immutable attribute of the given paths.
 
-    Remove the immutable attribute of the file or folder located on the given
-    path. Also remove the immutable attribute of any file and folder below the
-    given one, recursively.
+    Remove the immutable attribute of the files or folders located on the
+    given paths. Also remove the immutable attribute of any file and folder
+    below the given ones, recursively.
 
     Args:
-        path (str): Path to the file or folder to remove the immutable
-                    attribute for, recursively.
+        paths (str): Paths to the files or folders to remove the immutable
+                     attribute for, recursively.
     """
     # Some files have ACLs, let's remove them recursively
     if (platform.system() == constants.PLATFORM_DARWIN) and os.path.isfile(
         "/usr/bin/chflags",
     ):
-        subprocess.call(["/usr/bin/chflags", "-R", "nouchg", path])
-    elif platform.system() == constants.PLATFORM_LINUX and os.path.isfile(
-        "/usr/bin/chattr",
+        _call_batched(["/usr/bin/chflags", "-R", "nouchg"], paths)
+    elif platform.system() == constants.PLATFORM_LINUX:
+        if _can_ioctl_inode_flags():
+            for path in paths:
+                for entry_path in _walk_tree(path):
+                    _remove_immutable_flag(entry_path)
+        elif os.path.isfile("/usr/bin/chattr"):
+            _call_batched(["/usr/bin/chattr", "-R", "-f", "-i"], paths)
+
+
+def _call_batched(command: list[str], paths: Sequence[str]) -> None:
+    """
+    Run a command on many paths, with as few processes as possible.
+
+    Like xargs, the paths are appended to the command, and split across
+    several runs only when they don't fit in a single command line.
+
+    Args:
+        command (list): The command and its options
+        paths (list): The paths to give to the command
+    """
+    # Stay well below the system limit, which also accounts for the env
+    try:
+        max_size: int = os.sysconf("SC_ARG_MAX") // 2
+    except (OSError, ValueError):
+        max_size = 128 * 1024
+
+    def arg_size(arg: str) -> int:
+        # The arg, its NUL terminator and its pointer in argv
+        return len(os.fsencode(arg)) + 1 + struct.calcsize("P")
+
+    command_size: int = sum(arg_size(arg) for arg in command)
+    batch: list[str] = []
+    batch_size: int = command_size
+    for path in paths:
+        if batch and batch_size + arg_size(path) > max_size:
+            _call([*command, *batch])
+            batch, batch_size = [], command_size
+        batch.append(path)
+        batch_size += arg_size(path)
+
+    if batch:
+        _call([*command, *batch])
+
+
+def _call(command: list[str]) -> int:
+    """Run a command, and return its exit code."""
+    # Only imported when needed, as it is slow to import
+    import subprocess  # noqa: PLC0415
+
+    stats.add("subprocesses")
+    with tracing.span(
+        os.path.basename(command[0]), "subprocess", command=" ".join(command),
     ):
-        subprocess.call(["/usr/bin/chattr", "-R", "-f", "-i", path])
+        return subprocess.call(command)
+
+
+# Extended attributes storing the POSIX ACLs on Linux, see acl(5)
+POSIX_ACL_XATTRS: tuple[str, ...] = (
+    "system.posix_acl_access",
+    "system.posix_acl_default",
+)
+
+# ioctl(2) requests reading and writing the inode flags on Linux, see
+# ioctl_iflags(2). They are encoded as _IOR('f', 1, long) and
+# _IOW('f', 2, long), using the asm-generic encoding, but the kernel reads and
+# writes an int, like chattr(1) does.
+FS_IOC_GETFLAGS: int = (2 << 30) | (struct.calcsize("l") << 16) | (ord("f") << 8) | 1
+FS_IOC_SETFLAGS: int = (1 << 30) | (struct.calcsize("l") << 16) | (ord("f") << 8) | 2
+
+# The immutable inode flag, see chattr(1)
+FS_IMMUTABLE_FL: int = 0x00000010
+
+# Architectures not using the asm-generic ioctl encoding, for which we rely on
+# chattr and regular copies instead
+NON_GENERIC_IOCTL_MACHINES: tuple[str, ...] = (
+    "alpha",
+    "mips",
+    "parisc",
+    "ppc",
+    "sparc",
+)
+
+
+def _can_ioctl_inode_flags() -> bool:
+    """Return True if the inode flags can be changed without running chattr."""
+    return not os.uname().machine.startswith(NON_GENERIC_IOCTL_MACHINES)
+
+
+def _can_ioctl_clone() -> bool:
+    """Return True if files can be cloned with the FICLONE ioctl."""
+    return not os.uname().machine.startswith(NON_GENERIC_IOCTL_MACHINES)
+
+
+def _walk_tree(path: str) -> Iterator[str]:
+    """
+    Yield the given path and, if it's a folder, every path below it.
+
+    Links are yielded but never followed.
+
+    Args:
+        path (str): Root file or folder
+    """
+    yield path
+
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        # Not a folder, or a folder we can't read
+        return
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_tree(entry.path)
+        else:
+            yield entry.path
+
+
+def _remove_posix_acl(path: str) -> None:
+    """
+    Remove the POSIX ACL of a single file or folder, if it has one.
+
+    Args:
+        path (str): Path to the file or folder
+    """
+    try:
+        xattrs = os.listxattr(path, follow_symlinks=False)
+    except OSError:
+        # Missing file, or file system without extended attributes
+        return
+
+    for xattr in POSIX_ACL_XATTRS:
+        if xattr in xattrs:
+            with contextlib.suppress(OSError):
+                os.removexattr(path, xattr, follow_symlinks=False)
+
+
+def _remove_immutable_flag(path: str) -> None:
+    """
+    Remove the immutable flag of a single file or folder, if it has one.
+
+    Args:
+        path (str): Path to the file or folder
+    """
+    # Only regular files and folders have inode flags
+    try:
+        mode = os.lstat(path).st_mode
+    except OSError:
+        return
+    if not (stat.S_ISREG(mode) or stat.S_ISDIR(mode)):
+        return
+
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK | os.O_NOFOLLOW)
+    except OSError:
+        return
+
+    try:
+        buffer = bytearray(struct.calcsize("i"))
+        fcntl.ioctl(fd, FS_IOC_GETFLAGS, buffer)
+        flags = struct.unpack("i", buffer)[0]
+        if flags & FS_IMMUTABLE_FL:
+            fcntl.ioctl(
+                fd, FS_IOC_SETFLAGS, struct.pack("i", flags & ~FS_IMMUTABLE_FL),
+            )
+    except OSError:
+        # File system without inode flags, or not allowed to change them,
+        # chattr -f would silently fail too
+        pass
+    finally:
+        os.close(fd)
 
 
 def can_file_be_synced_on_current_platform(path: str) -> bool:
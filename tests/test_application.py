@@ -6,8 +6,10 @@ import unittest
 from io import StringIO
 from unittest.mock import Mock, patch
 
+from mackup import plan
 from mackup.application import ApplicationProfile
 from mackup.mackup import Mackup
+from mackup.manifest import Manifest
 
 
 class TestApplicationProfile(unittest.TestCase):
@@ -372,6 +374,167 @@ class TestApplicationProfile(unittest.TestCase):
         with open(mackup_filepath) as f:
             assert f.read() == "existing backup"
 
+    def test_copy_files_to_mackup_folder_incremental(self):
+        """Test incremental backup only asks about and copies what changed."""
+        app_profile = ApplicationProfile(
+            mackup=self.mock_mackup,
+            files=self.test_files,
+            dry_run=False,
+            verbose=False,
+            incremental=True,
+        )
+        home_folder = os.path.join(self.temp_home, ".testfolder")
+        os.makedirs(home_folder)
+        for name in ("a", "b"):
+            with open(os.path.join(home_folder, name), "w") as f:
+                f.write(name)
+        mackup_folder = os.path.join(self.mock_mackup.mackup_folder, ".testfolder")
+
+        with patch("mackup.application.utils.confirm") as mock_confirm:
+            app_profile.copy_files_to_mackup_folder()
+            mock_confirm.assert_not_called()
+        assert sorted(os.listdir(mackup_folder)) == ["a", "b"]
+
+        # Nothing changed, nothing to ask about or copy
+        with patch("mackup.application.utils.confirm") as mock_confirm, \
+             patch("mackup.application.utils.sync") as mock_sync:
+            app_profile.copy_files_to_mackup_folder()
+            mock_confirm.assert_not_called()
+            mock_sync.assert_not_called()
+
+        # Only the changes are copied, the folder is not replaced
+        os.remove(os.path.join(home_folder, "b"))
+        mackup_a_inode = os.stat(os.path.join(mackup_folder, "a")).st_ino
+        with patch(
+            "mackup.application.utils.confirm", return_value=True,
+        ) as mock_confirm:
+            app_profile.copy_files_to_mackup_folder()
+            mock_confirm.assert_called_once()
+        assert os.listdir(mackup_folder) == ["a"]
+        assert os.stat(os.path.join(mackup_folder, "a")).st_ino == mackup_a_inode
+
+    def test_incremental_backup_and_restore_use_the_manifest(self):
+        """Test the manifest tells what is up to date, without reading Mackup."""
+        manifest = Manifest(self.mock_mackup.mackup_folder)
+        app_profile = ApplicationProfile(
+            mackup=self.mock_mackup,
+            files=self.test_files,
+            dry_run=False,
+            verbose=False,
+            incremental=True,
+            manifest=manifest,
+        )
+        home_filepath = os.path.join(self.temp_home, ".testfile")
+        with open(home_filepath, "w") as f:
+            f.write("home content")
+
+        app_profile.copy_files_to_mackup_folder()
+        assert manifest.get(".testfile")["size"] == len("home content")
+
+        with patch("mackup.application.utils.is_synced") as mock_is_synced, \
+             patch("mackup.application.utils.sync") as mock_sync:
+            app_profile.copy_files_to_mackup_folder()
+            app_profile.copy_files_from_mackup_folder()
+            mock_is_synced.assert_not_called()
+            mock_sync.assert_not_called()
+
+        # A declined replacement is not recorded
+        with open(home_filepath, "w") as f:
+            f.write("new home content")
+        with patch("mackup.application.utils.confirm", return_value=False):
+            app_profile.copy_files_to_mackup_folder()
+        assert manifest.get(".testfile")["size"] == len("home content")
+
+    def test_incremental_backup_and_restore_check_the_manifest(self):
+        """Test a manifest that no longer matches the copy is not trusted."""
+        manifest = Manifest(self.mock_mackup.mackup_folder)
+        home_filepath = os.path.join(self.temp_home, ".testfile")
+        mackup_filepath = os.path.join(self.mock_mackup.mackup_folder, ".testfile")
+        with open(home_filepath, "w") as f:
+            f.write("home content")
+
+        def new_profile():
+            # Each run reads the paths again
+            return ApplicationProfile(
+                mackup=self.mock_mackup,
+                files=self.test_files,
+                dry_run=False,
+                verbose=False,
+                incremental=True,
+                manifest=manifest,
+            )
+
+        new_profile().copy_files_to_mackup_folder()
+
+        # The copy is gone, it is copied again
+        os.remove(mackup_filepath)
+        new_profile().copy_files_to_mackup_folder()
+        with open(mackup_filepath) as f:
+            assert f.read() == "home content"
+
+        # The copy changed, it is restored
+        with open(mackup_filepath, "w") as f:
+            f.write("content from another machine")
+        with patch("mackup.application.utils.confirm", return_value=True):
+            new_profile().copy_files_from_mackup_folder()
+        with open(home_filepath) as f:
+            assert f.read() == "content from another machine"
+
+    def test_incremental_backup_checks_the_manifest_of_folders(self):
+        """Test every file of a folder is checked against the manifest."""
+        manifest = Manifest(self.mock_mackup.mackup_folder)
+        home_folder = os.path.join(self.temp_home, ".testfolder")
+        os.makedirs(os.path.join(home_folder, "sub"))
+        for name in ("b", os.path.join("sub", "a")):
+            with open(os.path.join(home_folder, name), "w") as f:
+                f.write(name)
+        mackup_folder = os.path.join(self.mock_mackup.mackup_folder, ".testfolder")
+
+        def new_profile():
+            # Each run reads the paths again
+            return ApplicationProfile(
+                mackup=self.mock_mackup,
+                files=self.test_files,
+                dry_run=False,
+                verbose=False,
+                incremental=True,
+                manifest=manifest,
+            )
+
+        new_profile().copy_files_to_mackup_folder()
+
+        # A file of the copy is gone, it is copied again
+        os.remove(os.path.join(mackup_folder, "sub", "a"))
+        with patch("mackup.application.utils.confirm", return_value=True):
+            new_profile().copy_files_to_mackup_folder()
+        assert os.path.isfile(os.path.join(mackup_folder, "sub", "a"))
+
+        # A file of the copy changed, it is restored
+        with open(os.path.join(mackup_folder, "b"), "w") as f:
+            f.write("content from another machine")
+        with patch("mackup.application.utils.confirm", return_value=True):
+            new_profile().copy_files_from_mackup_folder()
+        with open(os.path.join(home_folder, "b")) as f:
+            assert f.read() == "content from another machine"
+
+    def test_copy_files_to_mackup_folder_verbose_reports_copied_files(self):
+        """Test verbose backup tells what has been copied."""
+        app_profile = ApplicationProfile(
+            mackup=self.mock_mackup,
+            files=self.test_files,
+            dry_run=False,
+            verbose=True,
+            output=StringIO(),
+        )
+        home_folder = os.path.join(self.temp_home, ".testfolder")
+        os.makedirs(home_folder)
+        with open(os.path.join(home_folder, "file"), "w") as f:
+            f.write("content")
+
+        app_profile.copy_files_to_mackup_folder()
+
+        assert "  2 copied, 0 unchanged, 0 removed\n" in app_profile.output.getvalue()
+
     def test_copy_files_from_mackup_folder_decline_replace_skips_copy(self):
         """Test restore does not overwrite when user declines replacement."""
         test_file = ".testfile"
@@ -507,7 +670,9 @@ class TestApplicationProfile(unittest.TestCase):
 
             # Verify that delete and copy WERE called (normal operation)
             mock_delete.assert_called_once_with(home_filepath)
-            mock_copy.assert_called_once_with(mackup_filepath, home_filepath)
+            mock_copy.assert_called_once_with(
+                mackup_filepath, home_filepath, record_entries=False,
+            )
 
             # Verify that the reverting message was printed (not warning)
             output = captured_output.getvalue()
@@ -645,12 +810,128 @@ class TestApplicationProfile(unittest.TestCase):
             sys.stdout = sys.__stdout__
 
             # Verify that copy WAS called (should backup symlinks to other locations)
-            mock_copy.assert_called_once_with(home_filepath, mackup_filepath)
+            mock_copy.assert_called_once_with(
+                home_filepath, mackup_filepath, record_entries=False,
+            )
 
             # Verify that the backing up message was printed
             output = captured_output.getvalue()
             assert "Backing up" in output
 
+    def test_decisions_read_each_path_once(self):
+        """Test each action reads the state of the home and Mackup paths once."""
+        for filename in self.test_files:
+            for folder in (self.temp_home, self.mock_mackup.mackup_folder):
+                with open(os.path.join(folder, filename), "w") as f:
+                    f.write("content")
+
+        actions = (
+            "copy_files_to_mackup_folder",
+            "copy_files_from_mackup_folder",
+            "link_install",
+            "link",
+            "link_uninstall",
+        )
+        for action in actions:
+            app_profile = ApplicationProfile(
+                mackup=self.mock_mackup,
+                files=self.test_files,
+                dry_run=False,
+                verbose=True,
+                output=StringIO(),
+            )
+            with patch("mackup.application.utils") as mock_utils, \
+                 patch("os.lstat", wraps=os.lstat) as mock_lstat, \
+                 patch("os.stat", wraps=os.stat) as mock_stat:
+                mock_utils.confirm.return_value = False
+                getattr(app_profile, action)()
+
+            assert mock_lstat.call_count == 2 * len(self.test_files), action
+            mock_stat.assert_not_called()
+
+    def test_get_paths_to_clear(self):
+        """Only the side(s) of the files the plan changes get cleared."""
+        home_path = os.path.join(self.temp_home, ".testfile")
+        mackup_path = os.path.join(self.mock_mackup.mackup_folder, ".testfile")
+        with open(home_path, "w") as f:
+            f.write("home content")
+
+        # .testfolder is on neither side, nothing is done with it
+        operations = self.app_profile.plan("copy_files_to_mackup_folder")
+        assert self.app_profile.get_paths_to_clear(
+            "copy_files_to_mackup_folder", operations,
+        ) == [mackup_path]
+
+        # Restoring .testfile, which has no copy, changes nothing
+        operations = self.app_profile.plan("copy_files_from_mackup_folder")
+        assert self.app_profile.get_paths_to_clear(
+            "copy_files_from_mackup_folder", operations,
+        ) == []
+
+        with open(mackup_path, "w") as f:
+            f.write("backed up content")
+        self.app_profile.path_states.invalidate(mackup_path)
+        operations = self.app_profile.plan("copy_files_from_mackup_folder")
+        (question,) = [op for op in operations if op.question is not None]
+        assert self.app_profile.get_paths_to_clear(
+            "copy_files_from_mackup_folder",
+            plan.answer_questions(operations, {question: True}),
+        ) == [home_path]
+
+        # The user chose not to replace it
+        assert self.app_profile.get_paths_to_clear(
+            "copy_files_from_mackup_folder",
+            plan.answer_questions(operations, {question: False}),
+        ) == []
+
+    def test_plan_changes_nothing(self):
+        """Planning a backup only reads the files, executing the plan copies."""
+        home_filepath = os.path.join(self.temp_home, ".testfile")
+        mackup_filepath = os.path.join(self.mock_mackup.mackup_folder, ".testfile")
+        with open(home_filepath, "w") as f:
+            f.write("home content")
+        with open(mackup_filepath, "w") as f:
+            f.write("existing backup")
+
+        with patch("mackup.application.utils.confirm") as mock_confirm:
+            operations = self.app_profile.plan("copy_files_to_mackup_folder")
+            mock_confirm.assert_not_called()
+
+        assert [
+            (operation.kind, operation.filename) for operation in operations
+        ] == [
+            (plan.DELETE, ".testfile"),
+            (plan.COPY, ".testfile"),
+            (plan.SKIP, ".testfolder"),
+        ]
+        assert operations[0].question is not None
+        assert operations[2].reason == "not in the home folder"
+        with open(mackup_filepath) as f:
+            assert f.read() == "existing backup"
+
+        with patch("mackup.application.utils.confirm", return_value=True):
+            self.app_profile.execute(operations)
+        with open(mackup_filepath) as f:
+            assert f.read() == "home content"
+
+    def test_execute_skips_the_file_when_declined(self):
+        """Declining a question skips every operation left on its file only."""
+        operations = [
+            plan.Operation(
+                plan.DELETE, ".a", destination="/a", question="Replace?",
+            ),
+            plan.Operation(plan.LINK, ".a", source="/m/a", destination="/a"),
+            plan.Operation(plan.LINK, ".b", source="/m/b", destination="/b"),
+        ]
+
+        with patch("mackup.application.utils.confirm", return_value=False), \
+             patch("mackup.application.utils.delete") as mock_delete, \
+             patch("mackup.application.utils.link") as mock_link:
+            self.app_profile.execute(operations)
+
+            mock_delete.assert_not_called()
+            mock_link.assert_called_once_with("/m/b", "/b", set_modes=True)
+
 
 if __name__ == "__main__":
     unittest.main()
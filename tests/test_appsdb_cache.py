@@ -0,0 +1,164 @@
+"""Tests for the on-disk cache of the custom applications."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import appsdb
+from mackup.appsdb import ApplicationsDatabase, get_custom_apps_cache_path
+
+
+class TestCustomAppsCache(unittest.TestCase):
+    """Test that unchanged custom app configs are not parsed again."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self._original_env = {
+            name: os.environ.get(name)
+            for name in ("HOME", "XDG_CONFIG_HOME", "XDG_CACHE_HOME")
+        }
+        self.home = tempfile.mkdtemp()
+        os.environ["HOME"] = self.home
+        os.environ.pop("XDG_CONFIG_HOME", None)
+        os.environ.pop("XDG_CACHE_HOME", None)
+        self.legacy_apps_dir = os.path.join(self.home, ".mackup")
+        self.xdg_apps_dir = os.path.join(self.home, ".config", "mackup", "applications")
+
+        parse_app_config = appsdb.parse_app_config
+        patcher = patch("mackup.appsdb.parse_app_config")
+        self.mock_parse = patcher.start()
+        self.mock_parse.side_effect = parse_app_config
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Restore environment variables modified during tests."""
+        for name, value in self._original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+        shutil.rmtree(self.home)
+
+    def _write_app(self, apps_dir, app_name, pretty_name):
+        os.makedirs(apps_dir, exist_ok=True)
+        path = os.path.join(apps_dir, f"{app_name}.cfg")
+        with open(path, "w") as f:
+            f.write(f"[application]\nname = {pretty_name}\n")
+        return path
+
+    def _parsed_files(self):
+        return {
+            call.args[0]
+            for call in self.mock_parse.call_args_list
+            if os.path.dirname(call.args[0]) != appsdb.get_stock_apps_dir()
+        }
+
+    def test_cache_path_is_in_xdg_cache_home(self):
+        assert get_custom_apps_cache_path() == os.path.join(
+            self.home, ".cache", "mackup", "custom_applications.json",
+        )
+
+        os.environ["XDG_CACHE_HOME"] = os.path.join(self.home, "cache")
+        assert get_custom_apps_cache_path() == os.path.join(
+            self.home, "cache", "mackup", "custom_applications.json",
+        )
+
+    def test_unchanged_configs_are_not_parsed_again(self):
+        path = self._write_app(self.legacy_apps_dir, "my-app", "My App")
+
+        ApplicationsDatabase(cache=True)
+        assert self._parsed_files() == {path}
+        assert os.path.isfile(get_custom_apps_cache_path())
+
+        self.mock_parse.reset_mock()
+        db = ApplicationsDatabase(cache=True)
+        assert self._parsed_files() == set()
+        assert db.get_name("my-app") == "My App"
+
+    def test_modified_config_is_parsed_again(self):
+        path = self._write_app(self.legacy_apps_dir, "my-app", "My App")
+        ApplicationsDatabase(cache=True)
+
+        self._write_app(self.legacy_apps_dir, "my-app", "My Renamed App")
+        stat_result = os.stat(path)
+        os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9))
+
+        self.mock_parse.reset_mock()
+        db = ApplicationsDatabase(cache=True)
+        assert self._parsed_files() == {path}
+        assert db.get_name("my-app") == "My Renamed App"
+
+    def test_cache_can_be_deleted(self):
+        path = self._write_app(self.legacy_apps_dir, "my-app", "My App")
+        ApplicationsDatabase(cache=True)
+        os.remove(get_custom_apps_cache_path())
+
+        self.mock_parse.reset_mock()
+        db = ApplicationsDatabase(cache=True)
+        assert self._parsed_files() == {path}
+        assert db.get_name("my-app") == "My App"
+
+    def test_corrupted_cache_is_ignored(self):
+        self._write_app(self.legacy_apps_dir, "my-app", "My App")
+        os.makedirs(os.path.dirname(get_custom_apps_cache_path()))
+        with open(get_custom_apps_cache_path(), "w") as f:
+            f.write("{not json")
+
+        db = ApplicationsDatabase(cache=True)
+        assert db.get_name("my-app") == "My App"
+
+    def test_cache_does_not_change_priority(self):
+        """The legacy directory still wins over the XDG one."""
+        legacy_path = self._write_app(self.legacy_apps_dir, "my-app", "Legacy")
+        self._write_app(self.xdg_apps_dir, "my-app", "XDG")
+
+        assert ApplicationsDatabase(cache=True).get_name("my-app") == "Legacy"
+        assert ApplicationsDatabase(cache=True).get_name("my-app") == "Legacy"
+
+        os.remove(legacy_path)
+        assert ApplicationsDatabase(cache=True).get_name("my-app") == "XDG"
+
+    def test_removed_configs_are_forgotten(self):
+        path = self._write_app(self.legacy_apps_dir, "my-app", "My App")
+        ApplicationsDatabase(cache=True)
+        os.remove(path)
+
+        db = ApplicationsDatabase(cache=True)
+        assert "my-app" not in db.get_app_names()
+        with open(get_custom_apps_cache_path()) as f:
+            assert json.load(f)["entries"] == {}
+
+    def test_lazy_database_saves_the_cache_once(self):
+        for i in range(3):
+            self._write_app(self.legacy_apps_dir, f"my-app-{i}", f"My App {i}")
+
+        db = ApplicationsDatabase(lazy=True, cache=True)
+        with patch.object(
+            appsdb.CustomAppsCache, "save", autospec=True,
+            side_effect=appsdb.CustomAppsCache.save,
+        ) as mock_save:
+            for i in range(3):
+                assert db.get_name(f"my-app-{i}") == f"My App {i}"
+            mock_save.assert_not_called()
+
+            db.save_cache()
+            mock_save.assert_called_once()
+
+        self.mock_parse.reset_mock()
+        db = ApplicationsDatabase(lazy=True, cache=True)
+        assert db.get_name("my-app-0") == "My App 0"
+        assert self._parsed_files() == set()
+
+    def test_no_cache_by_default(self):
+        self._write_app(self.legacy_apps_dir, "my-app", "My App")
+
+        ApplicationsDatabase()
+        assert not os.path.exists(get_custom_apps_cache_path())
+
+
+if __name__ == "__main__":
+    unittest.main()
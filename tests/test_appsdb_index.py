@@ -0,0 +1,150 @@
+"""Tests for the precompiled index of the stock applications."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import appsdb
+from mackup.appsdb import ApplicationsDatabase
+from mackup.constants import APPS_INDEX_FILE, APPS_INDEX_FORMAT
+
+
+class TestApplicationsIndex(unittest.TestCase):
+    """Test loading the stock applications from the precompiled index."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        realpath = os.path.dirname(os.path.realpath(__file__))
+        self.fixtures_path = os.path.join(realpath, "fixtures")
+        self._original_home = os.environ.get("HOME")
+        self._original_xdg_config_home = os.environ.get("XDG_CONFIG_HOME")
+        os.environ["HOME"] = self.fixtures_path
+        os.environ.pop("XDG_CONFIG_HOME", None)
+
+        # Write the index in a temp dir instead of the package
+        self.index_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.index_dir, APPS_INDEX_FILE)
+        patcher = patch(
+            "mackup.appsdb.get_stock_index_path", return_value=self.index_path,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Restore environment variables modified during tests."""
+        if self._original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = self._original_home
+
+        if self._original_xdg_config_home is None:
+            os.environ.pop("XDG_CONFIG_HOME", None)
+        else:
+            os.environ["XDG_CONFIG_HOME"] = self._original_xdg_config_home
+
+        shutil.rmtree(self.index_dir)
+
+    def _write_index(self, content):
+        with open(self.index_path, "w") as f:
+            json.dump(content, f)
+
+    def test_index_matches_parsed_configs(self):
+        """The index must give the same database as parsing every .cfg file."""
+        parsed_db = ApplicationsDatabase()
+
+        assert appsdb.write_stock_index() == self.index_path
+        parse_app_config = appsdb.parse_app_config
+        with patch("mackup.appsdb.parse_app_config") as mock_parse:
+            mock_parse.side_effect = parse_app_config
+            indexed_db = ApplicationsDatabase()
+
+        assert indexed_db.apps == parsed_db.apps
+        # Only the custom apps have been parsed
+        for call in mock_parse.call_args_list:
+            assert os.path.dirname(call.args[0]) != appsdb.get_stock_apps_dir()
+
+    def test_index_can_be_written_elsewhere(self):
+        """The build writes the index out of the source tree."""
+        other_path = os.path.join(self.index_dir, "other.json")
+
+        assert appsdb.write_stock_index(other_path) == other_path
+        assert os.path.isfile(other_path)
+        assert not os.path.exists(self.index_path)
+
+    def test_index_is_used_for_stock_apps(self):
+        self._write_index(
+            {
+                "format": APPS_INDEX_FORMAT,
+                "applications": {
+                    "vim": {
+                        "name": "Indexed Vim",
+                        "configuration_files": [".vimrc"],
+                        "xdg_configuration_files": ["vim/vimrc"],
+                    },
+                },
+            },
+        )
+
+        db = ApplicationsDatabase()
+
+        assert db.get_name("vim") == "Indexed Vim"
+        assert db.get_files("vim") == {".vimrc", ".config/vim/vimrc"}
+        # Apps missing from the index are still parsed from their .cfg file
+        assert db.get_name("bash") == "Bash"
+
+    def test_missing_index_falls_back_to_parsing(self):
+        assert not os.path.exists(self.index_path)
+
+        db = ApplicationsDatabase()
+
+        assert db.get_name("vim") == "Vim"
+        assert ".vimrc" in db.get_files("vim")
+
+    def test_index_with_another_format_is_ignored(self):
+        self._write_index(
+            {
+                "format": APPS_INDEX_FORMAT + 1,
+                "applications": {
+                    "vim": {
+                        "name": "Indexed Vim",
+                        "configuration_files": [],
+                        "xdg_configuration_files": [],
+                    },
+                },
+            },
+        )
+
+        db = ApplicationsDatabase()
+
+        assert db.get_name("vim") == "Vim"
+
+    def test_corrupted_index_is_ignored(self):
+        with open(self.index_path, "w") as f:
+            f.write("{not json")
+
+        db = ApplicationsDatabase()
+
+        assert db.get_name("vim") == "Vim"
+
+    def test_custom_app_overrides_index(self):
+        """A custom .cfg file wins over the indexed stock definition."""
+        appsdb.write_stock_index()
+
+        home = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, home)
+        os.environ["HOME"] = home
+        os.makedirs(os.path.join(home, ".mackup"))
+        with open(os.path.join(home, ".mackup", "vim.cfg"), "w") as f:
+            f.write("[application]\nname = My Vim\n\n[configuration_files]\n.myvimrc\n")
+
+        db = ApplicationsDatabase()
+
+        assert db.get_name("vim") == "My Vim"
+        assert db.get_files("vim") == {".myvimrc"}
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Tests for the lazy mode of ApplicationsDatabase."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from mackup import appsdb
+from mackup.appsdb import ApplicationsDatabase
+
+
+class TestApplicationsDatabaseLazy(unittest.TestCase):
+    """Test that the lazy mode only parses the applications it is asked about."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        realpath = os.path.dirname(os.path.realpath(__file__))
+        self.fixtures_path = os.path.join(realpath, "fixtures")
+        self._original_home = os.environ.get("HOME")
+        self._original_xdg_config_home = os.environ.get("XDG_CONFIG_HOME")
+        os.environ["HOME"] = self.fixtures_path
+        os.environ.pop("XDG_CONFIG_HOME", None)
+
+        # Make sure no precompiled index is used, to count the parsed files
+        self.index_dir = tempfile.mkdtemp()
+        patcher = patch(
+            "mackup.appsdb.get_stock_index_path",
+            return_value=os.path.join(self.index_dir, "missing.json"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        parse_app_config = appsdb.parse_app_config
+        patcher = patch("mackup.appsdb.parse_app_config")
+        self.mock_parse = patcher.start()
+        self.mock_parse.side_effect = parse_app_config
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Restore environment variables modified during tests."""
+        if self._original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = self._original_home
+
+        if self._original_xdg_config_home is None:
+            os.environ.pop("XDG_CONFIG_HOME", None)
+        else:
+            os.environ["XDG_CONFIG_HOME"] = self._original_xdg_config_home
+
+        shutil.rmtree(self.index_dir)
+
+    def test_lazy_does_not_parse_on_init(self):
+        db = ApplicationsDatabase(lazy=True)
+
+        assert "vim" in db.get_app_names()
+        assert "legacy-test-app" in db.get_app_names()
+        self.mock_parse.assert_not_called()
+
+    def test_lazy_parses_each_app_once(self):
+        db = ApplicationsDatabase(lazy=True)
+
+        assert db.get_name("vim") == "Vim"
+        assert ".vimrc" in db.get_files("vim")
+        assert db.get_name("vim") == "Vim"
+
+        self.mock_parse.assert_called_once()
+        assert self.mock_parse.call_args.args[0].endswith("vim.cfg")
+
+    def test_lazy_matches_eager(self):
+        eager_db = ApplicationsDatabase()
+        lazy_db = ApplicationsDatabase(lazy=True)
+
+        assert lazy_db.get_app_names() == eager_db.get_app_names()
+        for app_name in eager_db.get_app_names():
+            assert lazy_db.get_name(app_name) == eager_db.get_name(app_name)
+            assert lazy_db.get_files(app_name) == eager_db.get_files(app_name)
+
+    def test_lazy_leaves_out_unreadable_configs(self):
+        access = os.access
+        with patch(
+            "mackup.appsdb.os.access",
+            side_effect=lambda path, mode: (
+                not path.endswith("legacy-test-app.cfg") and access(path, mode)
+            ),
+        ):
+            db = ApplicationsDatabase(lazy=True)
+
+        assert "legacy-test-app" not in db.get_app_names()
+        assert "vim" in db.get_app_names()
+        self.mock_parse.assert_not_called()
+
+    def test_lazy_forgets_apps_that_cannot_be_loaded(self):
+        db = ApplicationsDatabase(lazy=True)
+        self.mock_parse.side_effect = None
+        self.mock_parse.return_value = None
+
+        with pytest.raises(KeyError):
+            db.get_files("vim")
+        assert "vim" not in db.get_app_names()
+
+    def test_lazy_unknown_app(self):
+        db = ApplicationsDatabase(lazy=True)
+
+        with pytest.raises(KeyError):
+            db.get_files("not-an-app")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Tests for reloading the custom applications of ApplicationsDatabase."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import appsdb
+from mackup.appsdb import ApplicationsDatabase
+
+
+class TestApplicationsDatabaseReload(unittest.TestCase):
+    """Test that reload_custom_apps only reloads what may have changed."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self._original_home = os.environ.get("HOME")
+        self._original_xdg_config_home = os.environ.get("XDG_CONFIG_HOME")
+        self.home = tempfile.mkdtemp()
+        os.environ["HOME"] = self.home
+        os.environ.pop("XDG_CONFIG_HOME", None)
+        self.custom_apps_dir = os.path.join(self.home, ".mackup")
+
+    def tearDown(self):
+        """Restore environment variables modified during tests."""
+        if self._original_home is None:
+            os.environ.pop("HOME", None)
+        else:
+            os.environ["HOME"] = self._original_home
+
+        if self._original_xdg_config_home is None:
+            os.environ.pop("XDG_CONFIG_HOME", None)
+        else:
+            os.environ["XDG_CONFIG_HOME"] = self._original_xdg_config_home
+
+        shutil.rmtree(self.home)
+
+    def _write_custom_app(self, app_name, pretty_name):
+        os.makedirs(self.custom_apps_dir, exist_ok=True)
+        with open(os.path.join(self.custom_apps_dir, f"{app_name}.cfg"), "w") as f:
+            f.write(f"[application]\nname = {pretty_name}\n")
+
+    def test_reload_finds_new_custom_apps(self):
+        db = ApplicationsDatabase()
+        assert "my-app" not in db.get_app_names()
+
+        self._write_custom_app("my-app", "My App")
+        db.reload_custom_apps()
+
+        assert db.get_name("my-app") == "My App"
+
+    def test_reload_overrides_stock_app(self):
+        db = ApplicationsDatabase()
+        assert db.get_name("vim") == "Vim"
+
+        self._write_custom_app("vim", "My Vim")
+        db.reload_custom_apps()
+        assert db.get_name("vim") == "My Vim"
+
+        shutil.rmtree(self.custom_apps_dir)
+        db.reload_custom_apps()
+        assert db.get_name("vim") == "Vim"
+
+    def test_reload_keeps_loaded_stock_apps(self):
+        self._write_custom_app("my-app", "My App")
+        db = ApplicationsDatabase()
+
+        parse_app_config = appsdb.parse_app_config
+        with patch("mackup.appsdb.parse_app_config") as mock_parse:
+            mock_parse.side_effect = parse_app_config
+            db.reload_custom_apps()
+
+        mock_parse.assert_called_once()
+        assert mock_parse.call_args.args[0].endswith("my-app.cfg")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests for the benchmarks of Mackup."""
+
+import os
+import unittest
+
+from benchmarks import runner
+from benchmarks.workspace import CatalogSize, Workspace
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_workspace(self):
+        catalog = CatalogSize(apps=2, files=3, depth=2, size=10)
+        workspace = Workspace(catalog)
+        try:
+            files = catalog.get_files("bench-app-0001")
+            assert len(files) == catalog.files
+            assert files[0] == os.path.join(
+                ".bench-app-0001", "level-0", "level-1", "file-0000",
+            )
+            assert os.path.getsize(os.path.join(workspace.home, files[0])) == (
+                catalog.size
+            )
+            assert os.path.isfile(
+                os.path.join(workspace.home, ".mackup", "bench-app-0001.cfg"),
+            )
+            assert os.path.isdir(workspace.storage)
+            assert workspace.get_env()["HOME"] == workspace.home
+        finally:
+            workspace.remove()
+
+        assert not os.path.exists(workspace.root)
+
+    def test_run_backup(self):
+        catalog = CatalogSize(apps=1, files=1, depth=0, size=10)
+        results = runner.run(["backup"], catalog, repeat=1)
+
+        assert results["format"] == runner.RESULTS_FORMAT
+        assert results["catalog"]["apps"] == 1
+        assert results["benchmarks"]["backup"]["median"] > 0
+
+    def test_compare(self):
+        catalog = {"apps": 1, "files": 1, "depth": 0, "size": 10}
+        baseline = {
+            "catalog": catalog,
+            "benchmarks": {"list": {"median": 1.0}, "backup": {"median": 1.0}},
+        }
+        results = {
+            "catalog": catalog,
+            "benchmarks": {
+                "list": {"median": 1.05},
+                "backup": {"median": 1.5},
+                "restore": {"median": 1.0},
+            },
+        }
+
+        lines, regressions = runner.compare(baseline, results, threshold=0.1)
+
+        assert regressions == ["backup"]
+        assert lines[1].endswith("REGRESSION")
+        assert lines[2].endswith("new")
+
+        lines, _ = runner.compare(
+            {**baseline, "catalog": {**catalog, "apps": 2}}, results, 0.1,
+        )
+        assert lines[0].startswith("Warning: the catalogs differ")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import contextlib
 import io
+import json
 import os
 import shutil
 import tempfile
@@ -8,7 +9,9 @@ from unittest.mock import patch
 
 import pytest
 
-from mackup import utils
+from mackup import stats, tracing, trash, utils
+from mackup.appsdb import ApplicationsDatabase
+from mackup.constants import MANIFEST_FILE
 from mackup.main import main
 
 
@@ -25,10 +28,14 @@ class TestCLI(unittest.TestCase):
         # Store original HOME
         self.original_home = os.environ.get("HOME")
         self.original_xdg = os.environ.get("XDG_CONFIG_HOME")
+        self.original_xdg_data = os.environ.get("XDG_DATA_HOME")
+        self.original_xdg_cache = os.environ.get("XDG_CACHE_HOME")
 
         # Set HOME to our test directory
         os.environ["HOME"] = self.test_home
         os.environ["XDG_CONFIG_HOME"] = os.path.join(self.test_home, ".config")
+        os.environ.pop("XDG_DATA_HOME", None)
+        os.environ.pop("XDG_CACHE_HOME", None)
 
         # Create test config file
         self.config_path = os.path.join(self.test_home, ".mackup.cfg")
@@ -81,6 +88,18 @@ class TestCLI(unittest.TestCase):
         else:
             os.environ.pop("XDG_CONFIG_HOME", None)
 
+        # Restore original XDG_DATA_HOME
+        if self.original_xdg_data:
+            os.environ["XDG_DATA_HOME"] = self.original_xdg_data
+        else:
+            os.environ.pop("XDG_DATA_HOME", None)
+
+        # Restore original XDG_CACHE_HOME
+        if self.original_xdg_cache:
+            os.environ["XDG_CACHE_HOME"] = self.original_xdg_cache
+        else:
+            os.environ.pop("XDG_CACHE_HOME", None)
+
         # Clean up temporary directories
         if os.path.exists(self.test_home):
             shutil.rmtree(self.test_home)
@@ -91,6 +110,8 @@ class TestCLI(unittest.TestCase):
         utils.FORCE_YES = False
         utils.FORCE_NO = False
         utils.CAN_RUN_AS_ROOT = False
+        utils.TRASH = None
+        utils.HASH_INDEX = None
 
     def test_backup_creates_mackup_folder(self):
         """Test that mackup backup creates the Mackup folder if it doesn't exist."""
@@ -434,6 +455,444 @@ class TestCLI(unittest.TestCase):
         assert os.path.islink(self.test_file_path)
         assert os.path.samefile(self.test_file_path, mackup_file)
 
+    def test_backup_loads_apps_db_once(self):
+        """The apps db is shared by the CLI and Mackup for the whole run."""
+        with (
+            patch("sys.argv", ["mackup", "backup"]),
+            patch.object(
+                ApplicationsDatabase,
+                "__init__",
+                autospec=True,
+                side_effect=ApplicationsDatabase.__init__,
+            ) as mock_init,
+        ):
+            main()
+
+        assert mock_init.call_count == 1
+        assert os.path.exists(os.path.join(self.mackup_folder, self.test_file_name))
+
+    def test_link_reloads_custom_apps(self):
+        """mackup link picks up custom apps restored with the Mackup config."""
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        os.remove(self.test_file_path)
+
+        # The custom app only exists in the backup of the Mackup config
+        backed_up_apps_dir = os.path.join(self.mackup_folder, ".mackup")
+        shutil.copytree(self.custom_apps_dir, backed_up_apps_dir)
+        shutil.rmtree(self.custom_apps_dir)
+        with open(self.config_path, "a") as f:
+            f.write("mackup\n")
+
+        with patch("sys.argv", ["mackup", "link"]):
+            main()
+
+        assert os.path.islink(self.test_file_path)
+        mackup_file = os.path.join(self.mackup_folder, self.test_file_name)
+        assert os.path.samefile(self.test_file_path, mackup_file)
+
+    def test_link_clears_the_attributes_of_the_mackup_config_in_a_batch(self):
+        """The Mackup config is linked like the other apps, in a batch."""
+        with open(self.config_path, "a") as f:
+            f.write("mackup\n")
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+
+        with (
+            patch("sys.argv", ["mackup", "link"]),
+            patch.object(
+                utils,
+                "batched_attribute_clearing",
+                wraps=utils.batched_attribute_clearing,
+            ) as mock_batch,
+        ):
+            main()
+
+        assert any(
+            self.config_path in batch_call.args[0]
+            for batch_call in mock_batch.call_args_list
+        )
+        assert os.path.islink(self.config_path)
+
+    def _add_test_apps(self, count):
+        """Add custom apps with one file each, and sync all of them."""
+        app_names = []
+        for i in range(count):
+            app_name = f"test-app-{i}"
+            with open(os.path.join(self.test_home, f".testrc-{i}"), "w") as f:
+                f.write(f"test_config={i}\n")
+            with open(os.path.join(self.custom_apps_dir, f"{app_name}.cfg"), "w") as f:
+                f.write(f"[application]\nname = {app_name}\n\n")
+                f.write(f"[configuration_files]\n.testrc-{i}\n")
+            with open(self.config_path, "a") as f:
+                f.write(f"{app_name}\n")
+            app_names.append(app_name)
+        return app_names
+
+    def test_backup_with_jobs_matches_sequential_output(self):
+        """Apps processed concurrently print the same output, in the same order."""
+        self._add_test_apps(8)
+
+        sequential_output = io.StringIO()
+        with (
+            patch("sys.argv", ["mackup", "--verbose", "backup"]),
+            contextlib.redirect_stdout(sequential_output),
+        ):
+            main()
+        shutil.rmtree(self.mackup_folder)
+
+        concurrent_output = io.StringIO()
+        with (
+            patch("sys.argv", ["mackup", "--verbose", "--jobs", "4", "backup"]),
+            contextlib.redirect_stdout(concurrent_output),
+        ):
+            main()
+
+        assert concurrent_output.getvalue() == sequential_output.getvalue()
+        for i in range(8):
+            backed_up_file = os.path.join(self.mackup_folder, f".testrc-{i}")
+            with open(backed_up_file) as f:
+                assert f.read() == f"test_config={i}\n"
+
+    def test_invalid_jobs_exits_with_error(self):
+        """--jobs only accepts a positive number of jobs."""
+        for jobs in ("0", "-2", "many"):
+            with patch("sys.argv", ["mackup", "--jobs", jobs, "backup"]):
+                with pytest.raises(SystemExit) as context:
+                    main()
+
+                assert (
+                    str(context.value) == "Option --jobs must be a positive integer."
+                )
+
+    def test_incremental_backup_skips_unchanged_files(self):
+        """An incremental backup only reports and copies the changed files."""
+        self._add_test_apps(2)
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+
+        # The first incremental run rewrites the files copied without their
+        # modification time
+        with patch("sys.argv", ["mackup", "--incremental", "backup"]):
+            main()
+
+        with open(os.path.join(self.test_home, ".testrc-1"), "w") as f:
+            f.write("test_config=changed\n")
+
+        output = io.StringIO()
+        with (
+            patch("sys.argv", ["mackup", "--incremental", "backup"]),
+            contextlib.redirect_stdout(output),
+        ):
+            main()
+
+        assert output.getvalue() == "Backing up .testrc-1 ...\n"
+        with open(os.path.join(self.mackup_folder, ".testrc-1")) as f:
+            assert f.read() == "test_config=changed\n"
+
+    def test_backup_writes_manifest(self):
+        """Backup records what it copied in the manifest of the Mackup folder."""
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+
+        manifest_path = os.path.join(self.mackup_folder, MANIFEST_FILE)
+        with open(manifest_path) as f:
+            entries = json.load(f)["entries"]
+        assert set(entries) == {self.test_file_name}
+        assert entries[self.test_file_name]["sha256"] == utils.file_hash(
+            self.test_file_path,
+        )
+
+        # Nothing is recorded in dry run mode
+        os.remove(manifest_path)
+        with patch("sys.argv", ["mackup", "--dry-run", "backup"]):
+            main()
+        assert not os.path.exists(manifest_path)
+
+    def test_backup_does_not_hash_unchanged_files_again(self):
+        """A backup reuses the hashes the manifest has of unchanged files."""
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+
+        stderr = io.StringIO()
+        with (
+            patch("sys.argv", ["mackup", "--force", "--stats", "json", "backup"]),
+            contextlib.redirect_stderr(stderr),
+        ):
+            main()
+
+        report = json.loads(stderr.getvalue())
+        assert report["total"]["files_hashed"] == 0
+
+    def test_trace_records_spans(self):
+        """--trace writes where the time went in a Chrome trace event file."""
+        trace_path = os.path.join(self.test_home, "trace.json")
+        with patch("sys.argv", ["mackup", "--trace", trace_path, "backup"]):
+            main()
+
+        with open(trace_path) as f:
+            events = json.load(f)["traceEvents"]
+        spans = {
+            (event["cat"], event["name"]) for event in events if event["ph"] == "X"
+        }
+        assert ("main", "mackup") in spans
+        assert ("config", "Config") in spans
+        assert ("catalog", "ApplicationsDatabase") in spans
+        assert ("app", "copy_files_to_mackup_folder test-app") in spans
+        assert ("utils", "copy") in spans
+        copy_span = next(event for event in events if event["name"] == "copy")
+        assert copy_span["args"]["arg0"] == self.test_file_path
+        assert tracing.TRACER is None
+
+    def test_stats_reports_what_has_been_done(self):
+        """--stats json prints the counters of the run on stderr."""
+        self._add_test_apps(2)
+        stderr = io.StringIO()
+        with (
+            patch("sys.argv", ["mackup", "--stats", "json", "backup"]),
+            contextlib.redirect_stderr(stderr),
+        ):
+            main()
+
+        report = json.loads(stderr.getvalue())
+        test_app = report["applications"]["test-app"]
+        assert test_app["config_files"] == 1
+        assert test_app["files_visited"] == 1
+        assert test_app["bytes_copied"] == len("test_config=value\n")
+        assert test_app["stat_calls"] > 0
+        expected_apps = 3
+        assert len(report["applications"]) == expected_apps
+        assert report["total"]["config_files"] == expected_apps
+        assert stats.STATS is None
+
+    def test_stats_format_must_be_json(self):
+        """--stats only supports json."""
+        with (
+            patch("sys.argv", ["mackup", "--stats", "xml", "backup"]),
+            pytest.raises(SystemExit, match="Option --stats must be json"),
+        ):
+            main()
+
+    def test_undo_puts_back_replaced_files(self):
+        """mackup undo puts back what the last run replaced in the home."""
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        with open(self.test_file_path, "w") as f:
+            f.write("test_config=changed\n")
+        with patch("sys.argv", ["mackup", "--force", "restore"]):
+            main()
+        utils.TRASH = None
+        with open(self.test_file_path) as f:
+            assert f.read() == "test_config=value\n"
+
+        with patch("sys.argv", ["mackup", "undo"]):
+            main()
+        utils.TRASH = None
+        with open(self.test_file_path) as f:
+            assert f.read() == "test_config=changed\n"
+
+        # Undo can be undone
+        with patch("sys.argv", ["mackup", "undo"]):
+            main()
+        utils.TRASH = None
+        with open(self.test_file_path) as f:
+            assert f.read() == "test_config=value\n"
+
+        with patch("sys.argv", ["mackup", "purge"]):
+            main()
+        with (
+            patch("sys.argv", ["mackup", "undo"]),
+            pytest.raises(SystemExit, match="Nothing to undo"),
+        ):
+            main()
+
+    def test_backup_does_not_keep_the_previous_copies(self):
+        """The copies a backup replaces in the Mackup folder are not kept."""
+        for _ in range(2):
+            with patch("sys.argv", ["mackup", "--force", "backup"]):
+                main()
+            utils.TRASH = None
+
+        assert all(not run.get_paths() for run in trash.get_runs())
+
+    def test_read_only_commands_leave_the_trash_alone(self):
+        """Commands that don't delete anything don't purge the trash."""
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        utils.TRASH = None
+
+        for command in (["list"], ["show", self.test_app_name], ["status"], ["diff"]):
+            with (
+                patch("sys.argv", ["mackup", *command]),
+                patch.object(trash, "purge") as mock_purge,
+                contextlib.redirect_stdout(io.StringIO()),
+            ):
+                main()
+            mock_purge.assert_not_called()
+            assert utils.TRASH is None
+
+    def test_no_trash_removes_replaced_files(self):
+        """--no-trash keeps nothing for undo."""
+        for _ in range(2):
+            with patch("sys.argv", ["mackup", "--no-trash", "backup"]):
+                main()
+
+        assert utils.TRASH is None
+        assert not os.path.exists(
+            os.path.join(self.test_home, ".local", "share", "mackup", "trash"),
+        )
+
+    def test_dry_run_writes_the_plan(self):
+        """--dry-run --plan writes what would be done, and does nothing."""
+        plan_path = os.path.join(self.test_home, "plan.json")
+        with patch("sys.argv", ["mackup", "--dry-run", "--plan", plan_path, "backup"]):
+            main()
+
+        assert not os.path.exists(
+            os.path.join(self.mackup_folder, self.test_file_name),
+        )
+        with open(plan_path) as f:
+            data = json.load(f)
+        assert data["actions"] == [
+            {
+                "application": self.test_app_name,
+                "action": "copy_files_to_mackup_folder",
+                "operations": [
+                    {
+                        "kind": "copy",
+                        "filename": self.test_file_name,
+                        "source": self.test_file_path,
+                        "destination": os.path.join(
+                            self.mackup_folder, self.test_file_name,
+                        ),
+                    },
+                ],
+            },
+        ]
+
+    def test_restore_asks_about_every_conflict_at_once(self):
+        """The files to replace are listed, and the user can select them."""
+        second_file_path = os.path.join(self.test_home, ".testrc2")
+        with open(self.custom_app_config, "a") as f:
+            f.write(".testrc2\n")
+        with open(second_file_path, "w") as f:
+            f.write("test_config=value\n")
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        for path in (self.test_file_path, second_file_path):
+            with open(path, "w") as f:
+                f.write("test_config=changed\n")
+
+        utils.FORCE_YES = False
+        with (
+            patch("sys.argv", ["mackup", "restore"]),
+            patch.object(
+                utils, "input", side_effect=["select", "yes", "no"], create=True,
+            ) as mock_input,
+            contextlib.redirect_stdout(io.StringIO()) as output,
+        ):
+            main()
+
+        assert "2 files would be replaced:" in output.getvalue()
+        mock_input.assert_any_call("Do you want to replace them? <Yes|No|Select> ")
+        with open(self.test_file_path) as f:
+            assert f.read() == "test_config=value\n"
+        with open(second_file_path) as f:
+            assert f.read() == "test_config=changed\n"
+
+    def test_forced_restore_does_not_list_the_conflicts(self):
+        """--force answers every question, which are counted for their app."""
+        second_file_path = os.path.join(self.test_home, ".testrc2")
+        with open(self.custom_app_config, "a") as f:
+            f.write(".testrc2\n")
+        with open(second_file_path, "w") as f:
+            f.write("test_config=value\n")
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        for path in (self.test_file_path, second_file_path):
+            with open(path, "w") as f:
+                f.write("test_config=changed\n")
+
+        stderr = io.StringIO()
+        with (
+            patch("sys.argv", ["mackup", "--force", "--stats", "json", "restore"]),
+            contextlib.redirect_stdout(io.StringIO()) as output,
+            contextlib.redirect_stderr(stderr),
+        ):
+            main()
+
+        assert "would be replaced" not in output.getvalue()
+        report = json.loads(stderr.getvalue())
+        expected_confirmations = 2
+        assert (
+            report["applications"][self.test_app_name]["confirmations"]
+            == expected_confirmations
+        )
+        with open(second_file_path) as f:
+            assert f.read() == "test_config=value\n"
+
+    def test_status(self):
+        """mackup status reports the state of each file, and changes nothing."""
+        with open(self.custom_app_config, "a") as f:
+            f.write(".missingrc\n")
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        with open(self.test_file_path, "w") as f:
+            f.write("test_config=changed\n")
+
+        with (
+            patch("sys.argv", ["mackup", "status"]),
+            contextlib.redirect_stdout(io.StringIO()) as output,
+        ):
+            main()
+
+        lines = output.getvalue().splitlines()
+        assert lines[0].split() == ["diverged", self.test_app_name, ".testrc"]
+        assert lines[1] == (
+            "0 linked, 0 synced, 1 diverged, 0 missing in home,"
+            " 0 missing in storage, 0 broken link"
+        )
+        with open(os.path.join(self.mackup_folder, self.test_file_name)) as f:
+            assert f.read() == "test_config=value\n"
+
+    def test_diff(self):
+        """mackup diff shows the local changes a restore would replace."""
+        with patch("sys.argv", ["mackup", "backup"]):
+            main()
+        with open(self.test_file_path, "w") as f:
+            f.write("test_config=changed\n")
+
+        with (
+            patch("sys.argv", ["mackup", "diff", self.test_app_name]),
+            contextlib.redirect_stdout(io.StringIO()) as output,
+        ):
+            main()
+
+        assert output.getvalue().splitlines()[2:] == [
+            "@@ -1 +1 @@",
+            "-test_config=value",
+            "+test_config=changed",
+        ]
+
+    def test_list_and_show_do_not_need_the_storage(self):
+        """The catalog is shown even when the storage provider isn't set up."""
+        with open(self.config_path, "w") as f:
+            f.write("[storage]\nengine = dropbox\n")
+
+        for command in (["list"], ["show", self.test_app_name]):
+            with (
+                patch("sys.argv", ["mackup", *command]),
+                contextlib.redirect_stdout(io.StringIO()) as output,
+            ):
+                main()
+            assert self.test_app_name in output.getvalue()
+
+        with (
+            patch("sys.argv", ["mackup", "backup"]),
+            pytest.raises(SystemExit),
+        ):
+            main()
+
 
 if __name__ == "__main__":
     unittest.main()
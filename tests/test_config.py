@@ -2,6 +2,7 @@ import os
 import os.path
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -207,6 +208,19 @@ class TestConfig(unittest.TestCase):
         with pytest.raises(ConfigError):
             Config("mackup-engine-file_system-no_path.cfg")
 
+    def test_config_storage_path_is_lazy(self):
+        with patch(
+            "mackup.config.get_dropbox_folder_location",
+            return_value="/home/some_user/Dropbox",
+        ) as get_location:
+            cfg = Config("mackup-empty.cfg")
+            assert cfg.engine == ENGINE_DROPBOX
+            get_location.assert_not_called()
+
+            assert cfg.fullpath == "/home/some_user/Dropbox/Mackup"
+            assert cfg.path == "/home/some_user/Dropbox"
+            get_location.assert_called_once_with()
+
     def test_config_engine_unknown(self):
         with pytest.raises(ConfigError):
             Config("mackup-engine-unknown.cfg")
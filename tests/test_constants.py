@@ -1,3 +1,4 @@
+import importlib.metadata
 import unittest
 from unittest.mock import patch
 
@@ -6,12 +7,12 @@ from mackup import constants
 
 class TestConstants(unittest.TestCase):
     def test_get_version_returns_metadata_version(self):
-        with patch("mackup.constants.version", return_value="1.2.3"):
+        with patch("importlib.metadata.version", return_value="1.2.3"):
             assert constants.get_version() == "1.2.3"
 
     def test_get_version_falls_back_when_metadata_missing(self):
         with patch(
-            "mackup.constants.version",
-            side_effect=constants.PackageNotFoundError("mackup"),
+            "importlib.metadata.version",
+            side_effect=importlib.metadata.PackageNotFoundError("mackup"),
         ):
             assert constants.get_version() == "unknown"
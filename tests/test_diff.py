@@ -0,0 +1,103 @@
+"""Tests for the differences between the files and their copies."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import diff
+
+
+class TestDiff(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        self.folder = tempfile.mkdtemp()
+        self.home_path = os.path.join(self.folder, "home", ".testrc")
+        self.mackup_path = os.path.join(self.folder, "Mackup", ".testrc")
+        os.makedirs(os.path.dirname(self.home_path))
+        os.makedirs(os.path.dirname(self.mackup_path))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.folder)
+
+    def _write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mode = "wb" if isinstance(content, bytes) else "w"
+        with open(path, mode) as f:
+            f.write(content)
+
+    def _diff(self):
+        return "".join(diff.diff(self.home_path, self.mackup_path))
+
+    def test_text_files(self):
+        self._write(self.mackup_path, "a\nb\n")
+        self._write(self.home_path, "a\nc")
+
+        assert self._diff() == (
+            f"--- {self.mackup_path}\n"
+            f"+++ {self.home_path}\n"
+            "@@ -1,2 +1,2 @@\n"
+            " a\n"
+            "-b\n"
+            "+c\n"
+            "\\ No newline at end of file\n"
+        )
+
+    def test_binary_and_large_files(self):
+        self._write(self.mackup_path, b"\0\1")
+        self._write(self.home_path, b"\0\2\3")
+        assert self._diff() == (
+            f"Files {self.mackup_path} (2 bytes) and {self.home_path} (3 bytes)"
+            " differ\n"
+        )
+
+        self._write(self.mackup_path, "a\n")
+        self._write(self.home_path, "b\n")
+        with patch.object(diff, "MAX_TEXT_DIFF_SIZE", 1):
+            assert self._diff().startswith(f"Files {self.mackup_path} ")
+
+    def test_same_content(self):
+        self._write(self.mackup_path, "same")
+        self._write(self.home_path, "same")
+        os.utime(self.home_path, ns=(0, 0))
+
+        assert self._diff() == ""
+
+    def test_is_same_content_reads_by_chunks(self):
+        self._write(self.mackup_path, "abcdef")
+        self._write(self.home_path, "abcdeg")
+
+        with patch.object(diff, "COMPARE_CHUNK_SIZE", 2):
+            assert not diff.is_same_content(self.mackup_path, self.home_path)
+            assert diff.is_same_content(
+                self.mackup_path, self.mackup_path, checksum=True,
+            )
+
+    def test_folders(self):
+        self._write(os.path.join(self.mackup_path, "same"), "same")
+        os.makedirs(self.home_path)
+        shutil.copy2(
+            os.path.join(self.mackup_path, "same"),
+            os.path.join(self.home_path, "same"),
+        )
+        self._write(os.path.join(self.mackup_path, "removed"), "removed")
+        self._write(os.path.join(self.home_path, "added"), "added")
+
+        assert self._diff() == (
+            f"Only in the home: {os.path.join(self.home_path, 'added')}\n"
+            "Only in the Mackup folder:"
+            f" {os.path.join(self.mackup_path, 'removed')}\n"
+        )
+
+    def test_missing_and_linked(self):
+        self._write(self.mackup_path, "content")
+        assert self._diff() == f"Only in the Mackup folder: {self.mackup_path}\n"
+
+        os.symlink(self.mackup_path, self.home_path)
+        assert self._diff() == ""
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Tests for the persistent index of the hashes of the files."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import hashindex, utils
+from mackup.hashindex import HashIndex
+
+
+class TestHashIndex(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        self.folder = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.folder, "cache", "hash_index")
+        self.file_path = os.path.join(self.folder, "file")
+        self._write("content")
+        # Files written by the tests are always racily clean otherwise
+        patcher = patch.object(hashindex, "RACY_WINDOW_NS", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.folder)
+
+    def _write(self, content):
+        with open(self.file_path, "w") as f:
+            f.write(content)
+
+    def _sha256(self, content):
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def test_only_hashes_changed_files(self):
+        index = HashIndex(self.index_path)
+        with patch.object(hashindex, "hash_file", wraps=hashindex.hash_file) as mock:
+            assert index.get_hash(self.file_path) == self._sha256("content")
+            assert index.get_hash(self.file_path) == self._sha256("content")
+            mock.assert_called_once()
+
+            mock.reset_mock()
+            self._write("changed content")
+            assert index.get_hash(self.file_path) == self._sha256("changed content")
+            mock.assert_called_once()
+
+    def test_save_and_load(self):
+        index = HashIndex(self.index_path)
+        index.get_hash(self.file_path)
+        index.save()
+        assert os.path.isfile(self.index_path)
+
+        index = HashIndex(self.index_path)
+        with patch.object(hashindex, "hash_file") as mock:
+            assert index.get_hash(self.file_path) == self._sha256("content")
+        mock.assert_not_called()
+
+    def test_nothing_to_save(self):
+        HashIndex(self.index_path).save()
+        assert not os.path.exists(self.index_path)
+
+    def test_corrupt_index_is_ignored(self):
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, "wb") as f:
+            f.write(hashindex.MAGIC + b"garbage")
+
+        index = HashIndex(self.index_path)
+        assert index.get_hash(self.file_path) == self._sha256("content")
+        index.save()
+        assert self.file_path in HashIndex(self.index_path)
+
+    def test_racily_clean_file_is_not_kept(self):
+        index = HashIndex(self.index_path)
+        with patch.object(hashindex, "RACY_WINDOW_NS", 60_000_000_000):
+            index.get_hash(self.file_path)
+        index.save()
+        assert not os.path.exists(self.index_path)
+
+    def test_prunes_unused_entries(self):
+        other_path = os.path.join(self.folder, "other")
+        shutil.copy(self.file_path, other_path)
+        index = HashIndex(self.index_path)
+        index.get_hash(self.file_path)
+        index.get_hash(other_path)
+        index.save()
+
+        index = HashIndex(self.index_path)
+        index.get_hash(self.file_path)
+        self._write("changed content")
+        index.get_hash(self.file_path)
+        with patch.object(hashindex, "MAX_ENTRIES", 1):
+            index.save()
+        index = HashIndex(self.index_path)
+        assert len(index) == 1
+        assert self.file_path in index
+
+    def test_file_hash_uses_the_index(self):
+        index = HashIndex(self.index_path)
+        with patch.object(utils, "HASH_INDEX", index):
+            assert utils.file_hash(self.file_path) == self._sha256("content")
+        assert self.file_path in index
+        assert utils.file_hash(self.file_path) == self._sha256("content")
+
+
+if __name__ == "__main__":
+    unittest.main()
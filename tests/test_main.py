@@ -1,7 +1,59 @@
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+from unittest.mock import patch
 
+import pytest
+
+import mackup
 from mackup import main
 
+# Modules only needed once a command runs, that --help and --version must not
+# import
+HEAVY_MODULES = (
+    "concurrent.futures",
+    "importlib.metadata",
+    "sqlite3",
+    "mackup.appsdb",
+    "mackup.commands",
+    "mackup.utils",
+)
+
+# Modules that mackup list, which only reads the applications, must not import.
+# shutil is left out, importlib.metadata imports it to get the version.
+LIST_HEAVY_MODULES = (
+    "difflib",
+    "subprocess",
+    "mackup.diff",
+    "mackup.status",
+)
+
+# Time mackup.main may take to import, in microseconds. Generous, to not fail
+# on slow machines, but well below what importing everything takes.
+IMPORT_TIME_BUDGET_US = 100_000
+
+
+def _run_python(
+    *args: str, home: str | None = None,
+) -> subprocess.CompletedProcess[str]:
+    """Run Python, importing the mackup package being tested."""
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(mackup.__file__)))
+    env = dict(os.environ)
+    if home is not None:
+        env["HOME"] = home
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (src_dir, env.get("PYTHONPATH")) if path
+    )
+    return subprocess.run(
+        [sys.executable, *args],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
 
 class TestMain(unittest.TestCase):
     def test_main_header(self):
@@ -9,3 +61,58 @@ class TestMain(unittest.TestCase):
 
     def test_main_bold(self):
         assert main.bold("blah") == "\033[1mblah\033[0m"
+
+    def test_version(self):
+        with (
+            patch("sys.argv", ["mackup", "--version"]),
+            patch("importlib.metadata.version", return_value="1.2.3"),
+            patch("sys.stdout") as stdout,
+            pytest.raises(SystemExit),
+        ):
+            main.main()
+
+        stdout.write.assert_any_call("Mackup 1.2.3")
+
+    def test_import_is_light(self):
+        process = _run_python(
+            "-c", "import sys, mackup.main; print('\\n'.join(sys.modules))",
+        )
+
+        modules = set(process.stdout.split())
+        assert "mackup.main" in modules
+        for module in HEAVY_MODULES:
+            assert module not in modules
+
+    def test_list_is_light(self):
+        with tempfile.TemporaryDirectory() as home:
+            process = _run_python(
+                "-c",
+                "import sys; from mackup import main;"
+                " sys.argv = ['mackup', '--root', 'list']; main.main();"
+                " print('\\n'.join(sys.modules), file=sys.stderr)",
+                home=home,
+            )
+
+        assert "Supported applications:" in process.stdout
+        modules = set(process.stderr.split())
+        assert "mackup.commands" in modules
+        for module in LIST_HEAVY_MODULES:
+            assert module not in modules
+
+    def test_import_time(self):
+        process = _run_python("-X", "importtime", "-c", "import mackup.main")
+
+        # Lines look like "import time: <self> | <cumulative> | <module>"
+        cumulative = {
+            fields[2].strip(): int(fields[1])
+            for fields in (
+                line.removeprefix("import time:").split("|")
+                for line in process.stderr.splitlines()
+            )
+            if fields[1].strip().isdigit()
+        }
+        assert cumulative["mackup.main"] < IMPORT_TIME_BUDGET_US
+
+
+if __name__ == "__main__":
+    unittest.main()
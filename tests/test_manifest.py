@@ -0,0 +1,164 @@
+"""Tests for the manifest of the Mackup folder."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import utils
+from mackup.constants import MANIFEST_FILE, MANIFEST_FORMAT
+from mackup.manifest import Manifest
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mackup_folder = tempfile.mkdtemp()
+        self.home = tempfile.mkdtemp()
+
+        self.home_folder = os.path.join(self.home, ".testfolder")
+        os.makedirs(os.path.join(self.home_folder, "subdir"))
+        for name in ("a", os.path.join("subdir", "b")):
+            with open(os.path.join(self.home_folder, name), "w") as f:
+                f.write(name)
+        self.mackup_copy = os.path.join(self.mackup_folder, ".testfolder")
+        utils.sync(self.home_folder, self.mackup_copy)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.mackup_folder)
+        shutil.rmtree(self.home)
+
+    def test_record_and_save(self):
+        manifest = Manifest(self.mackup_folder)
+        manifest.record(".testfolder", self.mackup_copy)
+        manifest.save()
+
+        with open(os.path.join(self.mackup_folder, MANIFEST_FILE)) as f:
+            content = json.load(f)
+        assert content["format"] == MANIFEST_FORMAT
+        assert sorted(content["entries"]) == [
+            ".testfolder",
+            ".testfolder/a",
+            ".testfolder/subdir",
+            ".testfolder/subdir/b",
+        ]
+        assert content["entries"][".testfolder/a"] == {
+            "type": "file",
+            "mode": 0o600,
+            "size": 1,
+            "mtime_ns": os.stat(os.path.join(self.home_folder, "a")).st_mtime_ns,
+            "sha256": utils.file_hash(os.path.join(self.home_folder, "a")),
+        }
+        assert content["entries"][".testfolder/subdir"]["type"] == "folder"
+
+        # Read back by another instance
+        assert Manifest(self.mackup_folder).get(".testfolder/subdir/b") is not None
+
+    def test_is_synced_does_not_read_the_mackup_folder(self):
+        manifest = Manifest(self.mackup_folder)
+        assert manifest.is_synced(".testfolder", self.home_folder) is None
+
+        manifest.record(".testfolder", self.mackup_copy)
+        shutil.rmtree(self.mackup_copy)
+
+        assert manifest.is_synced(".testfolder", self.home_folder)
+        assert manifest.is_synced(".testfolder", self.home_folder, checksum=True)
+
+        # Added, then modified with the same size and modification time
+        new_file = os.path.join(self.home_folder, "new")
+        with open(new_file, "w") as f:
+            f.write("new")
+        assert not manifest.is_synced(".testfolder", self.home_folder)
+        os.remove(new_file)
+
+        a_file = os.path.join(self.home_folder, "a")
+        a_stat = os.stat(a_file)
+        with open(a_file, "w") as f:
+            f.write("A")
+        os.utime(a_file, ns=(a_stat.st_atime_ns, a_stat.st_mtime_ns))
+        assert manifest.is_synced(".testfolder", self.home_folder)
+        assert not manifest.is_synced(".testfolder", self.home_folder, checksum=True)
+
+        # Removed
+        shutil.rmtree(os.path.join(self.home_folder, "subdir"))
+        assert not manifest.is_synced(".testfolder", self.home_folder)
+
+    def test_forget(self):
+        manifest = Manifest(self.mackup_folder)
+        manifest.record(".testfolder", self.mackup_copy)
+        manifest.forget(".testfolder")
+
+        assert manifest.get(".testfolder") is None
+        assert manifest.get(".testfolder/a") is None
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        manifest = Manifest(self.mackup_folder)
+        manifest.record(".testfolder", self.mackup_copy)
+
+        with open(os.path.join(self.home_folder, "a"), "w") as f:
+            f.write("changed")
+        utils.sync(self.home_folder, self.mackup_copy)
+
+        with patch("mackup.manifest.utils.file_hash", return_value="") as mock_hash:
+            manifest.record(".testfolder", self.mackup_copy)
+
+        mock_hash.assert_called_once_with(os.path.join(self.mackup_copy, "a"))
+
+    def test_files_copied_again_are_not_hashed_again(self):
+        manifest = Manifest(self.mackup_folder)
+        manifest.record(".testfolder", self.mackup_copy)
+
+        # Forgotten while the copy is replaced
+        forgotten = manifest.forget(".testfolder")
+        shutil.rmtree(self.mackup_copy)
+        utils.sync(self.home_folder, self.mackup_copy)
+
+        with patch("mackup.manifest.utils.file_hash") as mock_hash:
+            manifest.record(".testfolder", self.mackup_copy, forgotten)
+
+        mock_hash.assert_not_called()
+        assert manifest.get(".testfolder/a")["sha256"] == forgotten[
+            ".testfolder/a"
+        ]["sha256"]
+
+    def test_record_what_sync_wrote(self):
+        shutil.rmtree(self.mackup_copy)
+        result = utils.sync(self.home_folder, self.mackup_copy, record_entries=True)
+
+        manifest = Manifest(self.mackup_folder)
+        with patch("mackup.manifest.os.stat") as mock_stat, \
+             patch("mackup.manifest.os.scandir") as mock_scandir:
+            manifest.record(".testfolder", self.mackup_copy, None, result.entries)
+        mock_stat.assert_not_called()
+        mock_scandir.assert_not_called()
+
+        expected = Manifest(self.mackup_folder)
+        expected.record(".testfolder", self.mackup_copy)
+        for name in (".testfolder", ".testfolder/a", ".testfolder/subdir/b"):
+            assert manifest.get(name) == expected.get(name)
+        assert manifest.is_synced(".testfolder", self.mackup_copy, checksum=False)
+
+    def test_corrupted_manifest_is_ignored(self):
+        with open(os.path.join(self.mackup_folder, MANIFEST_FILE), "w") as f:
+            f.write("{not json")
+
+        manifest = Manifest(self.mackup_folder)
+        assert manifest.get(".testfolder") is None
+
+        manifest.record(".testfolder", self.mackup_copy)
+        manifest.save()
+        assert Manifest(self.mackup_folder).get(".testfolder") is not None
+
+    def test_save_without_changes_does_not_write(self):
+        manifest = Manifest(self.mackup_folder)
+        manifest.forget(".testfolder")
+        manifest.save()
+
+        assert not os.path.exists(os.path.join(self.mackup_folder, MANIFEST_FILE))
+
+
+if __name__ == "__main__":
+    unittest.main()
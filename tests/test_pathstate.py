@@ -0,0 +1,97 @@
+"""Tests for the states of the paths Mackup works on."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from mackup.pathstate import PathState, PathStateCache
+
+
+class TestPathState(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        self.folder = tempfile.mkdtemp()
+        self.file = os.path.join(self.folder, "file")
+        with open(self.file, "w") as f:
+            f.write("content")
+        self.subfolder = os.path.join(self.folder, "subfolder")
+        os.mkdir(self.subfolder)
+        self.file_link = os.path.join(self.folder, "file_link")
+        os.symlink(self.file, self.file_link)
+        self.broken_link = os.path.join(self.folder, "broken_link")
+        os.symlink(os.path.join(self.folder, "missing"), self.broken_link)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.folder)
+
+    def test_state_matches_os_path(self):
+        paths = [
+            self.file,
+            self.subfolder,
+            self.file_link,
+            self.broken_link,
+            os.path.join(self.folder, "missing"),
+            os.path.join(self.file, "not_a_folder"),
+        ]
+        for path in paths:
+            state = PathState.read(path)
+            assert state.lexists == os.path.lexists(path), path
+            assert state.exists == os.path.exists(path), path
+            assert state.is_link == os.path.islink(path), path
+            assert state.is_file == os.path.isfile(path), path
+            assert state.is_dir == os.path.isdir(path), path
+
+    def test_file_type(self):
+        assert PathState.read(self.file).file_type == "file"
+        assert PathState.read(self.file_link).file_type == "file"
+        assert PathState.read(self.subfolder).file_type == "folder"
+        assert PathState.read(self.broken_link).file_type == "link"
+        with pytest.raises(ValueError, match="Unsupported file"):
+            _ = PathState.read(os.path.join(self.folder, "missing")).file_type
+
+    def test_is_same_file(self):
+        file_state = PathState.read(self.file)
+        assert PathState.read(self.file_link).is_same_file(file_state)
+        assert not PathState.read(self.subfolder).is_same_file(file_state)
+        assert not PathState.read(self.broken_link).is_same_file(
+            PathState.read(self.broken_link),
+        )
+
+    def test_only_links_are_read_twice(self):
+        with patch("mackup.pathstate.os.stat", wraps=os.stat) as mock_stat:
+            PathState.read(self.file)
+            PathState.read(self.subfolder)
+            mock_stat.assert_not_called()
+
+            PathState.read(self.file_link)
+            mock_stat.assert_called_once_with(self.file_link)
+
+    def test_cache(self):
+        cache = PathStateCache()
+        file_in_subfolder = os.path.join(self.subfolder, "file")
+        with patch("mackup.pathstate.os.lstat", wraps=os.lstat) as mock_lstat:
+            assert not cache.get(file_in_subfolder).exists
+            assert cache.get(self.subfolder).is_dir
+            assert cache.get(self.file).is_file
+            assert not cache.get(file_in_subfolder).exists
+            expected_calls = 3
+            assert mock_lstat.call_count == expected_calls
+
+        # Everything in a changed folder is read again
+        shutil.rmtree(self.subfolder)
+        cache.invalidate(self.subfolder)
+        with patch("mackup.pathstate.os.lstat", wraps=os.lstat) as mock_lstat:
+            assert not cache.get(self.subfolder).exists
+            assert not cache.get(file_in_subfolder).exists
+            assert cache.get(self.file).is_file
+            expected_calls = 2
+            assert mock_lstat.call_count == expected_calls
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for the plans of the actions."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from mackup import plan
+from mackup.plan import Operation, Plan
+
+
+class TestPlan(unittest.TestCase):
+    def test_operation_to_dict(self):
+        copy = Operation(
+            plan.COPY,
+            ".vimrc",
+            source="/home/.vimrc",
+            destination="/mackup/.vimrc",
+            question="Replace it?",
+            message="Backing up .vimrc ...",
+        )
+        assert copy.to_dict() == {
+            "kind": "copy",
+            "filename": ".vimrc",
+            "source": "/home/.vimrc",
+            "destination": "/mackup/.vimrc",
+            "question": "Replace it?",
+        }
+
+        skip = Operation(plan.SKIP, ".vimrc", reason="up to date")
+        assert skip.to_dict() == {
+            "kind": "skip",
+            "filename": ".vimrc",
+            "reason": "up to date",
+        }
+
+        link = Operation(
+            plan.LINK,
+            ".vimrc",
+            source="/mackup/.vimrc",
+            destination="/home/.vimrc",
+            set_modes=False,
+        )
+        assert link.to_dict()["set_modes"] is False
+
+    def test_get_paths(self):
+        operations = [
+            Operation(plan.DELETE, ".a", destination="/home/.a"),
+            Operation(plan.COPY, ".a", source="/mackup/.a", destination="/home/.a"),
+            Operation(plan.SKIP, ".b", reason="up to date"),
+        ]
+
+        assert plan.get_paths(operations) == {"/home/.a", "/mackup/.a"}
+
+    def test_answer_questions(self):
+        replace_a = Operation(
+            plan.DELETE, ".a", destination="/home/.a", question="Replace .a?",
+        )
+        replace_b = Operation(
+            plan.DELETE, ".b", destination="/home/.b", question="Replace .b?",
+        )
+        link_a = Operation(plan.LINK, ".a", source="/mackup/.a", destination="/home/.a")
+        link_b = Operation(plan.LINK, ".b", source="/mackup/.b", destination="/home/.b")
+
+        answered = plan.answer_questions(
+            [replace_a, link_a, replace_b, link_b], {replace_a: True, replace_b: False},
+        )
+
+        assert answered == [
+            Operation(plan.DELETE, ".a", destination="/home/.a"),
+            link_a,
+            Operation(plan.SKIP, ".b", reason="not replaced"),
+        ]
+
+    def test_save(self):
+        operations = [Operation(plan.SKIP, ".a", reason="up to date")]
+        run_plan = Plan()
+        run_plan.add("app", "link", operations)
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "plan.json")
+            run_plan.save(path)
+            with open(path) as f:
+                data = json.load(f)
+
+        assert data == {
+            "format": plan.PLAN_FORMAT,
+            "actions": [
+                {
+                    "application": "app",
+                    "action": "link",
+                    "operations": [operations[0].to_dict()],
+                },
+            ],
+        }
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Tests for the statistics of a run."""
+
+import io
+import json
+import threading
+import unittest
+
+from mackup import stats
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        stats.STATS = stats.Stats()
+
+    def tearDown(self):
+        """Disable statistics."""
+        stats.STATS = None
+
+    def test_counters_are_kept_per_application(self):
+        stats.add("stat_calls")
+        with stats.application("vim"):
+            stats.add("bytes_copied", 10)
+            stats.add("bytes_copied", 5)
+        with stats.application("git"):
+            stats.add("links_created")
+        with stats.application("vim"):
+            stats.add("links_created")
+
+        report = stats.STATS.get_report()
+
+        assert list(report["applications"]) == ["git", "vim"]
+        vim = report["applications"]["vim"]
+        expected_bytes = 15
+        assert vim["bytes_copied"] == expected_bytes
+        assert vim["links_created"] == 1
+        assert vim["confirmations"] == 0
+        assert vim["wall_time"] >= 0
+
+        total = report["total"]
+        expected_links = 2
+        assert total["bytes_copied"] == expected_bytes
+        assert total["links_created"] == expected_links
+        assert total["stat_calls"] == 1
+        assert total["wall_time"] >= vim["wall_time"]
+        assert set(total) == {*stats.COUNTERS, "wall_time"}
+
+    def test_applications_processed_concurrently(self):
+        def process(app_name):
+            with stats.application(app_name):
+                for _ in range(100):
+                    stats.add("files_visited")
+
+        threads = [
+            threading.Thread(target=process, args=(f"app-{i}",)) for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = stats.STATS.get_report()
+        expected_files = 100
+        assert all(
+            app["files_visited"] == expected_files
+            for app in report["applications"].values()
+        )
+        assert report["total"]["files_visited"] == expected_files * len(threads)
+
+    def test_print_report(self):
+        output = io.StringIO()
+        stats.STATS.print_report(output)
+
+        assert json.loads(output.getvalue())["applications"] == {}
+
+    def test_disabled(self):
+        stats.STATS = None
+
+        with stats.application("vim"):
+            stats.add("files_visited")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for the sync state of the configuration files."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import status
+
+
+class TestStatus(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        self.folder = tempfile.mkdtemp()
+        self.home_path = os.path.join(self.folder, "home", ".testrc")
+        self.mackup_path = os.path.join(self.folder, "Mackup", ".testrc")
+        os.makedirs(os.path.dirname(self.home_path))
+        os.makedirs(os.path.dirname(self.mackup_path))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.folder)
+
+    def _write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
+
+    def _get_status(self):
+        return status.get_status(self.home_path, self.mackup_path)
+
+    def test_absent(self):
+        assert self._get_status() is None
+
+    def test_linked(self):
+        self._write(self.mackup_path, "content")
+        os.symlink(self.mackup_path, self.home_path)
+        assert self._get_status() == status.LINKED
+
+        # Relative links are compared with the Mackup path too
+        os.remove(self.home_path)
+        os.symlink(os.path.join("..", "Mackup", ".testrc"), self.home_path)
+        assert self._get_status() == status.LINKED
+
+    def test_synced_and_diverged(self):
+        self._write(self.home_path, "content")
+        shutil.copy2(self.home_path, self.mackup_path)
+        assert self._get_status() == status.SYNCED
+
+        self._write(self.home_path, "changed content")
+        assert self._get_status() == status.DIVERGED
+
+    def test_same_content_with_another_modification_time(self):
+        self._write(self.home_path, "content")
+        self._write(self.mackup_path, "content")
+        os.utime(self.mackup_path, ns=(0, 0))
+        assert self._get_status() == status.SYNCED
+
+        self._write(self.mackup_path, "CONTENT")
+        os.utime(self.mackup_path, ns=(0, 0))
+        assert self._get_status() == status.DIVERGED
+
+    def test_missing(self):
+        self._write(self.mackup_path, "content")
+        assert self._get_status() == status.MISSING_IN_HOME
+
+        os.remove(self.mackup_path)
+        self._write(self.home_path, "content")
+        assert self._get_status() == status.MISSING_IN_STORAGE
+
+    def test_unreadable(self):
+        self._write(self.home_path, "content")
+        with patch("mackup.status.os.lstat", side_effect=PermissionError):
+            assert self._get_status() is None
+
+    def test_broken_links(self):
+        # To the Mackup file, which is gone
+        os.symlink(self.mackup_path, self.home_path)
+        assert self._get_status() == status.BROKEN_LINK
+
+        # To somewhere else
+        os.remove(self.home_path)
+        os.symlink(os.path.join(self.folder, "missing"), self.home_path)
+        assert self._get_status() == status.BROKEN_LINK
+
+
+if __name__ == "__main__":
+    unittest.main()
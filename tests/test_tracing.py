@@ -0,0 +1,92 @@
+"""Tests for the tracing of where Mackup spends its time."""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import pytest
+
+from mackup import tracing
+
+
+@tracing.traced("test")
+def _traced_function(path: str, count: int) -> str:
+    return path * count
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        tracing.TRACER = tracing.Tracer()
+
+    def tearDown(self):
+        """Disable tracing."""
+        tracing.TRACER = None
+
+    def _get_events(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "trace.json")
+            tracing.TRACER.save(path)
+            with open(path) as f:
+                events: list = json.load(f)["traceEvents"]
+        return events
+
+    def _get_spans(self):
+        return [event for event in self._get_events() if event["ph"] == "X"]
+
+    def test_span(self):
+        with tracing.span("outer", "test", count=2), tracing.span("inner", "test"):
+            pass
+
+        inner, outer = self._get_spans()
+        assert outer["name"] == "outer"
+        assert outer["cat"] == "test"
+        assert outer["args"] == {"count": "2"}
+        assert "args" not in inner
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+    def test_span_records_failures(self):
+        with (
+            pytest.raises(ValueError, match="failed"),
+            tracing.span("failing", "test"),
+        ):
+            raise ValueError("failed")
+
+        assert [span["name"] for span in self._get_spans()] == ["failing"]
+
+    def test_traced(self):
+        assert _traced_function("a", 2) == "aa"
+
+        (span,) = self._get_spans()
+        assert span["name"] == "_traced_function"
+        assert span["args"] == {"arg0": "a"}
+
+    def test_threads_are_named(self):
+        thread = threading.Thread(
+            target=_traced_function, args=("a", 1), name="worker",
+        )
+        thread.start()
+        thread.join()
+        _traced_function("b", 1)
+
+        names = {
+            event["tid"]: event["args"]["name"]
+            for event in self._get_events()
+            if event["ph"] == "M"
+        }
+        assert sorted(names.values()) == sorted(
+            ["worker", threading.current_thread().name],
+        )
+
+    def test_disabled(self):
+        tracing.TRACER = None
+
+        with tracing.span("ignored", "test"):
+            assert _traced_function("a", 1) == "a"
+
+
+if __name__ == "__main__":
+    unittest.main()
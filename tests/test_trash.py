@@ -0,0 +1,130 @@
+"""Tests for the trash of the deleted files and folders."""
+
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mackup import trash, utils
+from mackup.trash import Trash
+
+
+class TestTrash(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures."""
+        self._original_env = {
+            name: os.environ.get(name) for name in ("HOME", "XDG_DATA_HOME")
+        }
+        self.home = tempfile.mkdtemp()
+        os.environ["HOME"] = self.home
+        os.environ.pop("XDG_DATA_HOME", None)
+
+        self.folder = os.path.join(self.home, "folder")
+        os.makedirs(os.path.join(self.folder, "subdir"))
+        self.file = os.path.join(self.folder, "subdir", "file")
+        with open(self.file, "w") as f:
+            f.write("content")
+
+    def tearDown(self):
+        """Restore environment variables modified during tests."""
+        for name, value in self._original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+        utils.TRASH = None
+        shutil.rmtree(self.home)
+
+    def test_trash_is_in_xdg_data_home(self):
+        assert trash.get_trash_dir() == os.path.join(
+            self.home, ".local", "share", "mackup", "trash",
+        )
+
+        os.environ["XDG_DATA_HOME"] = os.path.join(self.home, "data")
+        assert trash.get_trash_dir() == os.path.join(
+            self.home, "data", "mackup", "trash",
+        )
+
+    def test_put_and_restore(self):
+        run = Trash.new_run()
+        assert run.put(self.file)
+        assert run.put(self.folder)
+        assert not os.path.exists(self.folder)
+        assert not run.put(self.folder)
+
+        # The run can be read back
+        run = trash.get_runs()[-1]
+        assert run.get_paths() == [self.file, self.folder]
+
+        # What is in the way goes to another trash
+        os.mkdir(self.folder)
+        other_run = Trash.new_run()
+        assert run.restore(other_run) == [self.folder, self.file]
+
+        with open(self.file) as f:
+            assert f.read() == "content"
+        assert other_run.get_paths() == [self.folder]
+        assert not os.path.exists(run.path)
+
+    def test_trash_is_only_accessible_by_the_user(self):
+        run = Trash.new_run()
+        run.put(self.file)
+
+        for path in (trash.get_trash_dir(), run.path):
+            assert os.stat(path).st_mode & 0o777 == trash.FOLDER_MODE
+
+    def test_delete_uses_the_trash(self):
+        utils.TRASH = Trash.new_run()
+        utils.delete(self.folder)
+
+        assert not os.path.exists(self.folder)
+        assert utils.TRASH.get_paths() == [self.folder]
+
+    def test_ignored_folders_are_not_kept(self):
+        utils.TRASH = Trash.new_run()
+        utils.TRASH.ignore_folder(os.path.join(self.folder, "subdir"))
+        utils.delete(self.file)
+
+        assert not os.path.exists(self.file)
+        assert utils.TRASH.get_paths() == []
+
+    def test_interrupted_index_is_read(self):
+        run = Trash.new_run()
+        run.put(self.file)
+        with open(os.path.join(run.path, trash.INDEX_FILE), "a") as f:
+            f.write('{"path": ')
+
+        assert Trash(run.path).get_paths() == [self.file]
+
+    def test_delete_removes_files_on_other_file_systems(self):
+        utils.TRASH = Trash.new_run()
+        cross_device = OSError(errno.EXDEV, "Invalid cross-device link")
+        with patch("mackup.trash.os.rename", side_effect=cross_device):
+            utils.delete(self.folder)
+
+        assert not os.path.exists(self.folder)
+        assert utils.TRASH.get_paths() == []
+
+    def test_purge_keeps_the_last_runs(self):
+        for i in range(4):
+            run = Trash(os.path.join(trash.get_trash_dir(), f"run-{i}"))
+            with open(os.path.join(self.home, f"file-{i}"), "w") as f:
+                f.write(str(i))
+            run.put(os.path.join(self.home, f"file-{i}"))
+
+        expected_removed = 2
+        assert trash.purge(2) == expected_removed
+        assert [os.path.basename(run.path) for run in trash.get_runs()] == [
+            "run-2",
+            "run-3",
+        ]
+
+        assert trash.purge(0) == expected_removed
+        assert trash.get_runs() == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,16 @@
+import concurrent.futures
+import errno
 import os
+import shutil
 import sqlite3
 import stat
+import struct
+import subprocess
 import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import call, patch
 
 import pytest
 
@@ -33,6 +40,34 @@ class TestMackup(unittest.TestCase):
         with patch.object(utils, "input", return_value="No", create=True):
             assert not utils.confirm("Answer garbage to this question")
 
+    def test_confirm_all(self):
+        for answer, expected in (("Yes", True), ("n", False), ("Select", None)):
+            with patch.object(utils, "input", return_value=answer, create=True):
+                assert utils.confirm_all("Answer this question") is expected
+
+    def test_confirm_all_forced(self):
+        with patch.object(utils, "FORCE_NO", new=True):
+            assert utils.confirm_all("Answer this question") is False
+
+    def test_confirm_asks_one_question_at_a_time(self):
+        asking = threading.Semaphore(1)
+
+        def answer(_question):
+            # Fails if another thread is already asking a question
+            assert asking.acquire(blocking=False)
+            time.sleep(0.01)
+            asking.release()
+            return "Yes"
+
+        with (
+            patch.object(utils, "input", side_effect=answer, create=True),
+            concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor,
+        ):
+            futures = [
+                executor.submit(utils.confirm, f"Question {i}") for i in range(8)
+            ]
+            assert all(future.result() for future in futures)
+
     def test_delete_file(self):
         # Create a tmp file
         with tempfile.NamedTemporaryFile(delete=False) as tfile:
@@ -240,6 +275,248 @@ class TestMackup(unittest.TestCase):
         utils.delete(src_folder)
         utils.delete(dst_folder)
 
+    def test_sync_dir_only_rewrites_changes(self):
+        src_path = tempfile.mkdtemp()
+        dst_path = os.path.join(tempfile.mkdtemp(), "dst")
+        os.makedirs(os.path.join(src_path, "subdir"))
+        for name in ("unchanged", "changed", os.path.join("subdir", "new")):
+            with open(os.path.join(src_path, name), "w") as f:
+                f.write(name)
+        os.symlink("/does/not/exist", os.path.join(src_path, "broken_link"))
+
+        assert not utils.is_synced(src_path, dst_path)
+        utils.sync(src_path, dst_path)
+        assert utils.is_synced(src_path, dst_path)
+        assert not os.path.lexists(os.path.join(dst_path, "broken_link"))
+        assert convert_to_octal(dst_path) == "700"
+        assert convert_to_octal(os.path.join(dst_path, "changed")) == "600"
+
+        # Change the source, and leave a stale file in the destination
+        with open(os.path.join(src_path, "changed"), "w") as f:
+            f.write("new content")
+        os.remove(os.path.join(src_path, "subdir", "new"))
+        with open(os.path.join(dst_path, "stale"), "w") as f:
+            f.write("stale")
+        unchanged_inode = os.stat(os.path.join(dst_path, "unchanged")).st_ino
+
+        assert not utils.is_synced(src_path, dst_path)
+        result = utils.sync(src_path, dst_path)
+
+        # The root folder, subdir and unchanged are skipped
+        assert result == utils.SyncResult(copied=1, skipped=3, removed=2)
+        assert sorted(os.listdir(dst_path)) == ["changed", "subdir", "unchanged"]
+        assert os.listdir(os.path.join(dst_path, "subdir")) == []
+        with open(os.path.join(dst_path, "changed")) as f:
+            assert f.read() == "new content"
+        assert os.stat(os.path.join(dst_path, "unchanged")).st_ino == unchanged_inode
+        assert utils.sync(src_path, dst_path).changed == 0
+
+    def test_sync_file_with_checksum(self):
+        tfpath = tempfile.mkdtemp()
+        srcfile = os.path.join(tfpath, "src")
+        dstfile = os.path.join(tfpath, "dst")
+        with open(srcfile, "w") as f:
+            f.write("content")
+
+        assert utils.sync(srcfile, dstfile) == utils.SyncResult(copied=1)
+        assert utils.is_synced(srcfile, dstfile, checksum=True)
+
+        # Same size and modification time, but another content
+        src_stat = os.stat(srcfile)
+        with open(dstfile, "w") as f:
+            f.write("CONTENT")
+        os.utime(dstfile, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+        assert utils.is_synced(srcfile, dstfile)
+        assert not utils.is_synced(srcfile, dstfile, checksum=True)
+        assert utils.sync(srcfile, dstfile, checksum=True).copied == 1
+        with open(dstfile) as f:
+            assert f.read() == "content"
+
+    def test_copy_does_not_prune(self):
+        src_path = tempfile.mkdtemp()
+        dst_path = tempfile.mkdtemp()
+        for path in (src_path, dst_path):
+            with open(os.path.join(path, "file"), "w") as f:
+                f.write("content")
+        with open(os.path.join(dst_path, "other_file"), "w") as f:
+            f.write("other content")
+
+        assert not utils.is_synced(src_path, dst_path)
+        assert not utils.is_synced(src_path, dst_path, prune=False)
+
+        result = utils.copy(src_path, dst_path)
+
+        # The existing folder is kept, its files are all copied
+        assert result == utils.SyncResult(copied=1, skipped=1)
+        assert sorted(os.listdir(dst_path)) == ["file", "other_file"]
+        assert utils.is_synced(src_path, dst_path, prune=False)
+        assert utils.copy(src_path, dst_path) == utils.SyncResult(copied=1, skipped=1)
+
+    def test_copy_replaces_files_with_the_same_size_and_time(self):
+        tfpath = tempfile.mkdtemp()
+        srcfile = os.path.join(tfpath, "src")
+        dstfile = os.path.join(tfpath, "dst")
+        for path, content in ((srcfile, "content"), (dstfile, "CONTENT")):
+            with open(path, "w") as f:
+                f.write(content)
+            os.utime(path, ns=(0, 0))
+
+        utils.copy(srcfile, dstfile)
+
+        with open(dstfile) as f:
+            assert f.read() == "content"
+        utils.delete(tfpath)
+
+    def test_copy_file_falls_back_on_unsupported_strategies(self):
+        tfpath = tempfile.mkdtemp()
+        srcfile = os.path.join(tfpath, "src")
+        dstfile = os.path.join(tfpath, "dst")
+        content = os.urandom(3 * 1024 * 1024)
+        with open(srcfile, "wb") as f:
+            f.write(content)
+        unsupported = OSError(errno.EOPNOTSUPP, "Operation not supported")
+        cross_device = OSError(errno.EXDEV, "Invalid cross-device link")
+
+        def check_copy(expected_strategy):
+            with open(dstfile, "wb") as f:
+                f.write(b"previous content, longer than nothing")
+            assert utils.copy_file(srcfile, dstfile) == expected_strategy
+            with open(dstfile, "rb") as f:
+                assert f.read() == content
+
+        with (
+            patch.object(utils.platform, "system", return_value="Linux"),
+            patch("mackup.utils._can_ioctl_clone", return_value=True),
+            patch.object(utils.fcntl, "ioctl", side_effect=unsupported),
+        ):
+            check_copy("copy_file_range")
+
+            with patch.object(utils.os, "copy_file_range", side_effect=cross_device):
+                check_copy("sendfile")
+
+                with patch.object(utils.os, "sendfile", side_effect=unsupported):
+                    check_copy("shutil")
+
+        with patch.object(utils.platform, "system", return_value="Darwin"):
+            check_copy("shutil")
+
+    def test_copy_file_does_not_hide_errors(self):
+        tfpath = tempfile.mkdtemp()
+        srcfile = os.path.join(tfpath, "src")
+        with open(srcfile, "w") as f:
+            f.write("content")
+
+        with (
+            patch.object(utils.platform, "system", return_value="Linux"),
+            patch("mackup.utils._can_ioctl_clone", return_value=False),
+            patch.object(
+                utils.os,
+                "copy_file_range",
+                side_effect=OSError(errno.ENOSPC, "No space left on device"),
+            ),
+            pytest.raises(OSError, match="No space left"),
+        ):
+            utils.copy_file(srcfile, os.path.join(tfpath, "dst"))
+
+    def test_sync_records_copy_strategies(self):
+        src_path = tempfile.mkdtemp()
+        dst_path = os.path.join(tempfile.mkdtemp(), "dst")
+        for name in ("a", "b"):
+            with open(os.path.join(src_path, name), "w") as f:
+                f.write(name)
+
+        def reflink(src, dst, mode):
+            shutil.copyfile(src, dst)
+            os.chmod(dst, mode)
+            return "reflink"
+
+        with patch("mackup.utils.copy_file", side_effect=reflink):
+            result = utils.sync(src_path, dst_path)
+
+        assert result.strategies == {"reflink": 2}
+
+    def test_sync_replaces_folder_with_file(self):
+        tfpath = tempfile.mkdtemp()
+        srcfile = os.path.join(tfpath, "src")
+        dstfile = os.path.join(tfpath, "dst")
+        with open(srcfile, "w") as f:
+            f.write("content")
+        os.makedirs(os.path.join(dstfile, "subdir"))
+
+        utils.sync(srcfile, dstfile)
+
+        assert os.path.isfile(dstfile)
+        assert utils.file_hash(srcfile) == utils.file_hash(dstfile)
+
+    def test_move_renames_on_the_same_file_system(self):
+        tfpath = tempfile.mkdtemp()
+        src_folder = os.path.join(tfpath, "src")
+        dst_folder = os.path.join(tfpath, "sub", "dst")
+        os.mkdir(src_folder)
+        src_file = os.path.join(src_folder, "file")
+        with open(src_file, "w") as f:
+            f.write("content")
+        os.chmod(src_file, 0o644)
+        inode = os.stat(src_file).st_ino
+
+        with patch.object(utils, "copy") as mock_copy:
+            utils.move(src_folder, dst_folder)
+            mock_copy.assert_not_called()
+
+        dst_file = os.path.join(dst_folder, "file")
+        assert not os.path.exists(src_folder)
+        assert os.stat(dst_file).st_ino == inode
+        assert convert_to_octal(dst_file) == "600"
+
+        utils.delete(tfpath)
+
+    def test_move_copies_across_file_systems(self):
+        tfpath = tempfile.mkdtemp()
+        src_file = os.path.join(tfpath, "src")
+        dst_file = os.path.join(tfpath, "dst")
+        with open(src_file, "w") as f:
+            f.write("content")
+        with open(dst_file, "w") as f:
+            f.write("previous content")
+
+        cross_device = OSError(errno.EXDEV, "Invalid cross-device link")
+        with patch.object(utils.os, "rename", side_effect=cross_device):
+            utils.move(src_file, dst_file)
+
+        assert not os.path.exists(src_file)
+        with open(dst_file) as f:
+            assert f.read() == "content"
+
+        utils.delete(tfpath)
+
+    def test_move_copies_folders_with_links(self):
+        tfpath = tempfile.mkdtemp()
+        target = os.path.join(tfpath, "target")
+        with open(target, "w") as f:
+            f.write("content")
+        src_folder = os.path.join(tfpath, "src")
+        os.makedirs(os.path.join(src_folder, "subdir"))
+        os.symlink(target, os.path.join(src_folder, "subdir", "link"))
+        dst_folder = os.path.join(tfpath, "dst")
+        os.makedirs(dst_folder)
+        with open(os.path.join(dst_folder, "stale"), "w") as f:
+            f.write("stale")
+
+        with patch.object(utils.os, "rename") as mock_rename:
+            utils.move(src_folder, dst_folder)
+            mock_rename.assert_not_called()
+
+        # dst has been replaced, and like copy(), the link has been followed
+        assert sorted(os.listdir(dst_folder)) == ["subdir"]
+        dst_file = os.path.join(dst_folder, "subdir", "link")
+        assert not os.path.islink(dst_file)
+        with open(dst_file) as f:
+            assert f.read() == "content"
+        assert not os.path.exists(src_folder)
+
+        utils.delete(tfpath)
+
     def test_link_file(self):
         # Create a tmp file
         with tempfile.NamedTemporaryFile(delete=False) as tfile:
@@ -322,6 +599,45 @@ class TestMackup(unittest.TestCase):
         utils.delete(file_name)
         utils.delete(dir_name)
 
+    def test_chmod_skips_entries_with_the_good_mode(self):
+        dir_name = tempfile.mkdtemp()
+        nested_dir = os.path.join(dir_name, "nested")
+        os.mkdir(nested_dir, 0o700)
+        os.chmod(dir_name, 0o700)
+        good_file = os.path.join(nested_dir, "good")
+        bad_file = os.path.join(nested_dir, "bad")
+        for file_name, mode in ((good_file, 0o600), (bad_file, 0o644)):
+            with open(file_name, "w") as f:
+                f.write("content")
+            os.chmod(file_name, mode)
+
+        with patch.object(utils.os, "chmod", wraps=os.chmod) as mock_chmod:
+            utils.chmod(dir_name)
+
+        mock_chmod.assert_called_once_with(bad_file, 0o600)
+        assert convert_to_octal(bad_file) == "600"
+
+        utils.delete(dir_name)
+
+    def test_sync_creates_entries_with_the_good_mode(self):
+        src_path = tempfile.mkdtemp()
+        dst_path = os.path.join(tempfile.mkdtemp(), "dst")
+        os.makedirs(os.path.join(src_path, "subdir"))
+        with open(os.path.join(src_path, "subdir", "file"), "w") as f:
+            f.write("content")
+        os.chmod(os.path.join(src_path, "subdir", "file"), 0o644)
+
+        with (
+            patch.object(utils, "_UMASK", 0o022),
+            patch.object(utils.os, "chmod") as mock_chmod,
+        ):
+            utils.sync(src_path, dst_path)
+            mock_chmod.assert_not_called()
+
+        assert convert_to_octal(dst_path) == "700"
+        assert convert_to_octal(os.path.join(dst_path, "subdir")) == "700"
+        assert convert_to_octal(os.path.join(dst_path, "subdir", "file")) == "600"
+
     def test_error(self):
         test_string = "Hello World"
         with pytest.raises(SystemExit):
@@ -447,3 +763,179 @@ class TestMackup(unittest.TestCase):
             # Try to use the library path on Linux, which shouldn't work
             path = os.path.join(os.environ["HOME"], "Library/")
             assert not utils.can_file_be_synced_on_current_platform(path)
+
+    @pytest.mark.skipif(not hasattr(os, "setxattr"), reason="Linux only")
+    def test_remove_acl_in_process_on_linux(self):
+        # A minimal POSIX ACL: user::rw- user:65534:r-- group::r-- mask::r--
+        # other::r--
+        acl = struct.pack("<I", 2) + b"".join(
+            struct.pack("<HHI", tag, perm, uid)
+            for tag, perm, uid in (
+                (0x01, 6, 0xFFFFFFFF),
+                (0x02, 4, 65534),
+                (0x04, 4, 0xFFFFFFFF),
+                (0x10, 4, 0xFFFFFFFF),
+                (0x20, 4, 0xFFFFFFFF),
+            )
+        )
+
+        with tempfile.TemporaryDirectory() as tfpath:
+            subfolder = os.path.join(tfpath, "subfolder")
+            os.mkdir(subfolder)
+            try:
+                os.setxattr(subfolder, "system.posix_acl_access", acl)
+            except OSError:
+                pytest.skip("The file system does not support POSIX ACLs")
+
+            with (
+                patch.object(
+                    utils.platform,
+                    "system",
+                    return_value=utils.constants.PLATFORM_LINUX,
+                ),
+                patch.object(subprocess, "call") as mock_call,
+            ):
+                utils.remove_acl(tfpath)
+
+            mock_call.assert_not_called()
+            assert "system.posix_acl_access" not in os.listxattr(subfolder)
+
+    @pytest.mark.skipif(not hasattr(os, "setxattr"), reason="Linux only")
+    def test_remove_immutable_attribute_in_process_on_linux(self):
+        with tempfile.TemporaryDirectory() as tfpath:
+            tfile = os.path.join(tfpath, "file")
+            with open(tfile, "w") as f:
+                f.write("content")
+
+            with (
+                patch.object(
+                    utils.platform,
+                    "system",
+                    return_value=utils.constants.PLATFORM_LINUX,
+                ),
+                patch.object(subprocess, "call") as mock_call,
+            ):
+                # Nothing to do, nothing gets spawned
+                utils.remove_immutable_attribute(tfpath)
+                mock_call.assert_not_called()
+
+                try:
+                    subprocess.run(
+                        ["chattr", "+i", tfile], check=True, capture_output=True,
+                    )
+                except (OSError, subprocess.CalledProcessError):
+                    pytest.skip("Can't set the immutable attribute here")
+
+                utils.remove_immutable_attribute(tfpath)
+                mock_call.assert_not_called()
+
+            # The file can be deleted again
+            os.remove(tfile)
+
+    def test_remove_immutable_attribute_reads_and_writes_an_int(self):
+        """The kernel reads and writes the inode flags as an int."""
+        set_flags = []
+
+        def ioctl(fd, request, arg):
+            if request == utils.FS_IOC_GETFLAGS:
+                assert len(arg) == struct.calcsize("i")
+                arg[:] = struct.pack("i", utils.FS_IMMUTABLE_FL | 1)
+            else:
+                set_flags.append(struct.unpack("i", arg)[0])
+
+        with (
+            tempfile.TemporaryDirectory() as tfpath,
+            patch.object(
+                utils.platform,
+                "system",
+                return_value=utils.constants.PLATFORM_LINUX,
+            ),
+            patch("mackup.utils._can_ioctl_inode_flags", return_value=True),
+            patch.object(utils.fcntl, "ioctl", side_effect=ioctl),
+        ):
+            utils.remove_immutable_attribute(tfpath)
+
+        assert set_flags == [1]
+
+    def test_remove_immutable_attribute_falls_back_to_chattr(self):
+        with (
+            patch.object(
+                utils.platform, "system", return_value=utils.constants.PLATFORM_LINUX,
+            ),
+            patch("mackup.utils._can_ioctl_inode_flags", return_value=False),
+            patch.object(utils.os.path, "isfile", return_value=True),
+            patch.object(subprocess, "call") as mock_call,
+        ):
+            utils.remove_immutable_attribute("/some/path")
+
+        mock_call.assert_called_once_with(
+            ["/usr/bin/chattr", "-R", "-f", "-i", "/some/path"],
+        )
+
+    def test_remove_acl_batches_paths_on_darwin(self):
+        paths = [f"/some/path/{i}" for i in range(100)]
+        with (
+            patch.object(
+                utils.platform, "system", return_value=utils.constants.PLATFORM_DARWIN,
+            ),
+            patch.object(utils.os.path, "isfile", return_value=True),
+            patch.object(subprocess, "call") as mock_call,
+        ):
+            utils.remove_acl(*paths)
+
+        mock_call.assert_called_once_with(["/bin/chmod", "-R", "-N", *paths])
+
+    def test_remove_immutable_attribute_splits_long_command_lines(self):
+        paths = [f"/some/path/{i:04}" for i in range(1000)]
+        max_size = 4096
+        with (
+            patch.object(
+                utils.platform, "system", return_value=utils.constants.PLATFORM_LINUX,
+            ),
+            patch("mackup.utils._can_ioctl_inode_flags", return_value=False),
+            patch.object(utils.os.path, "isfile", return_value=True),
+            patch.object(utils.os, "sysconf", return_value=2 * max_size),
+            patch.object(subprocess, "call") as mock_call,
+        ):
+            utils.remove_immutable_attribute(*paths)
+
+        assert mock_call.call_count > 1
+        batched_paths = []
+        for batch_call in mock_call.call_args_list:
+            command = batch_call.args[0]
+            assert command[:4] == ["/usr/bin/chattr", "-R", "-f", "-i"]
+            # Each arg, its NUL terminator and its pointer in argv
+            assert sum(len(arg) + 1 + 8 for arg in command) <= max_size
+            batched_paths.extend(command[4:])
+        assert batched_paths == paths
+
+    def test_batched_attribute_clearing_skips_cleared_paths(self):
+        tfpath = tempfile.mkdtemp()
+        tfile = os.path.join(tfpath, "file")
+        with open(tfile, "w") as f:
+            f.write("content")
+
+        with (
+            patch.object(utils, "remove_acl") as mock_remove_acl,
+            patch.object(utils, "remove_immutable_attribute") as mock_remove_immutable,
+        ):
+            with utils.batched_attribute_clearing([tfpath, "/does/not/exist"]):
+                mock_remove_acl.assert_called_once_with(tfpath)
+                mock_remove_immutable.assert_called_once_with(tfpath)
+
+                # Already cleared, with the folder containing it
+                utils.delete(tfile)
+                utils.delete(tfpath)
+                assert mock_remove_acl.call_count == 1
+                assert mock_remove_immutable.call_count == 1
+
+            # Out of the batch, every delete clears the attributes again
+            os.mkdir(tfpath)
+            utils.delete(tfpath)
+            assert mock_remove_acl.call_args_list == [call(tfpath), call(tfpath)]
+            assert mock_remove_immutable.call_args_list == [
+                call(tfpath),
+                call(tfpath),
+            ]
+
+        assert not os.path.exists(tfpath)